@@ -0,0 +1,95 @@
+"""Checks `normalize_pdf_markdown` against the old inline clean-up in `create_pdf` and times both.
+
+    python benchmarks/bench_pdf_markdown.py [--repeat N] [--fuzz N]
+
+Every report in benchmarks/corpus/ (plus `--fuzz` randomly spliced variants of them)
+must come out byte-identical; the script exits non-zero on the first mismatch.
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lucror.pdf_markdown import normalize_pdf_markdown  # noqa: E402
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+
+
+def legacy_normalize(markdown_content):
+    """The clean-up exactly as `create_pdf` ran it before the normalizer existed."""
+    markdown_content = re.sub(
+        r'(?i)^[\s\*]*Key Management.*?Contact.*?$',
+        '\n\n### Key Management & Contact',
+        markdown_content,
+        flags=re.MULTILINE
+    )
+    target_titles = ["President & CEO", "CEO", "CFO", "President"]
+    for title in target_titles:
+        pattern = fr'(?i)(?:\\n|^|[\s\*•-])+\**{re.escape(title)}\**\s*:'
+        replacement = f'\n* **{title}:**'
+        markdown_content = re.sub(pattern, replacement, markdown_content)
+    markdown_content = re.sub(
+        r'(?i)(?:\\n|^|[\s\*•-])+\**Investor\s*Relations\**\s*:',
+        '\n* **Investor Relations:**',
+        markdown_content
+    )
+    markdown_content = re.sub(
+        r'(?i)(\*\*Investor Relations:\*\*)\s*\n+[\s\*•-]*([^\n]*@)',
+        r'\1 \2',
+        markdown_content
+    )
+    markdown_content = markdown_content.replace("****", "**")
+    markdown_content = re.sub(r'(?m)^\s*\*\s*\*\s*$', '', markdown_content)
+    markdown_content = re.sub(r'(?i)(?<!\n)\s*\*?\s*\*\*?Strengths:?\**', '\n\n**Strengths:**\n', markdown_content)
+    markdown_content = re.sub(r'(?i)(?<!\n)\s*\*?\s*\*\*?Weaknesses:?\**', '\n\n**Weaknesses:**\n', markdown_content)
+    return markdown_content
+
+
+def load_corpus():
+    corpus = {}
+    for name in sorted(os.listdir(CORPUS_DIR)):
+        if name.endswith(".md"):
+            with open(os.path.join(CORPUS_DIR, name), encoding="utf-8") as f:
+                corpus[name] = f.read()
+    return corpus
+
+
+def fuzz_variants(corpus, count, seed=0):
+    """Reports stitched together from random line ranges of the corpus, to hit odd rule interactions."""
+    rng = random.Random(seed)
+    lines = [line for text in corpus.values() for line in text.split("\n")]
+    for i in range(count):
+        start = rng.randrange(len(lines))
+        chunk = lines[start:start + rng.randint(1, 40)]
+        rng.shuffle(chunk)
+        yield f"fuzz-{i}", rng.choice(["\n", "\n\n", " ", ""]).join(chunk)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--repeat", type=int, default=200, help="timing iterations per report")
+    parser.add_argument("--fuzz", type=int, default=2000, help="random variants checked for identical output")
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    for name, text in list(corpus.items()) + list(fuzz_variants(corpus, args.fuzz)):
+        if normalize_pdf_markdown(text) != legacy_normalize(text):
+            print(f"MISMATCH: {name}")
+            return 1
+    print(f"{len(corpus)} corpus reports + {args.fuzz} fuzzed variants: output identical")
+
+    print(f"{'report':<34}{'legacy ms':>12}{'new ms':>12}{'speedup':>10}")
+    for name, text in corpus.items():
+        legacy = timeit.timeit(lambda: legacy_normalize(text), number=args.repeat) / args.repeat * 1000
+        new = timeit.timeit(lambda: normalize_pdf_markdown(text), number=args.repeat) / args.repeat * 1000
+        print(f"{name:<34}{legacy:>12.4f}{new:>12.4f}{legacy / new:>9.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
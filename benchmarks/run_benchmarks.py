@@ -0,0 +1,208 @@
+"""Micro-benchmarks for the parsing and export hot paths, with a results history.
+
+    python benchmarks/run_benchmarks.py                  # run and compare with history
+    python benchmarks/run_benchmarks.py --save           # ...and append this run to the history
+    python benchmarks/run_benchmarks.py -k excel --quick
+    python benchmarks/run_benchmarks.py --save --fail-on-regression   # for CI / pre-deploy
+
+Runs offline on synthetic reports (benchmarks/synthetic.py) of increasing size:
+more table rows, longer appendices, more tickers. The company logo lookup is
+stubbed, so nothing touches the network. Each case reports the best time per
+call over several rounds (the least noisy statistic on a shared machine); a case
+is a regression when it is slower than `--threshold` times the median of its
+last `--window` saved runs from the same machine.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import timeit
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from lucror import core  # noqa: E402
+from lucror.history import ReportHistory  # noqa: E402
+from lucror.metrics import NET_LEVERAGE, complete_financial_summaries, recompute_dependents  # noqa: E402
+from lucror.report_parser import AuditIndex, parse_report  # noqa: E402
+from synthetic import make_report  # noqa: E402
+
+DEFAULT_HISTORY = os.path.join(ROOT, "benchmarks", "results", "history.jsonl")
+
+TABLE_ROWS = [10, 100, 1000]
+APPENDIX_LINES = [50, 500, 5000]
+PORTFOLIO_TICKERS = [10, 100]
+DERIVE_TICKERS = [1, 100]
+PDF_ROWS = [10, 100]
+HISTORY_REPORTS = [100, 1000]
+
+
+def build_cases(backend, workdir):
+    """name -> zero-argument callable. Report texts (and history datasets under `workdir`) are built up front."""
+    cases = {}
+
+    for rows in TABLE_ROWS:
+        text = make_report(rows=rows)
+        table = parse_report(text).table
+        item, year = table.items[len(table.items) // 2], table.years[-1]
+
+        def parse_cold(text=text):
+            # parse_report is memoized per text; clear it to time the actual parse
+            parse_report.cache_clear()
+            return core.parse_markdown_table(text)
+
+        cases[f"parse_markdown_table[rows={rows}]"] = parse_cold
+        # The app edits an already-parsed report, so the document is served from the cache here
+        cases[f"update_markdown_table_value[rows={rows}]"] = (
+            lambda text=text, item=item, year=year: core.update_markdown_table_value(text, item, year, "1,234")
+        )
+        cases[f"create_excel[rows={rows}]"] = lambda text=text: core.create_excel(text, "SYN")
+
+    for lines in APPENDIX_LINES:
+        doc = parse_report(make_report(rows=20, appendix_lines=lines))
+        cases[f"audit_trail_scan[appendix={lines}]"] = (
+            lambda doc=doc: [AuditIndex(doc.rationale_text).lookup(item) for item in doc.table.items]
+        )
+
+    for count in PORTFOLIO_TICKERS:
+        reports = {f"T{i:03d}": make_report(ticker=f"T{i:03d}", rows=12) for i in range(count)}
+        for text in reports.values():
+            parse_report(text)
+        cases[f"create_portfolio_excel[tickers={count}]"] = lambda reports=reports: core.create_portfolio_excel(reports)
+
+    for count in DERIVE_TICKERS:
+        reports = {f"T{i:03d}": make_report(ticker=f"T{i:03d}") for i in range(count)}
+        for text in reports.values():
+            parse_report(text)
+        cases[f"derive_rows[tickers={count}]"] = lambda reports=reports: complete_financial_summaries(reports)
+
+    # A correction-panel edit: one raw cell changed, only its dependents recomputed
+    text = core.update_markdown_table_value(complete_financial_summaries({"": make_report()})[""],
+                                            "EBITDA", parse_report(make_report()).table.years[-1], "1,234")
+    parse_report(text)
+    cases["recompute_dependents[edit=EBITDA]"] = lambda text=text: recompute_dependents(text, ["EBITDA"])
+
+    # A screening query over the Parquet history: one report per ticker, one file each
+    for count in HISTORY_REPORTS:
+        root = os.path.join(workdir, f"history-{count}")
+        history = ReportHistory(root)
+        for i in range(count):
+            text = make_report(ticker=f"T{i:04d}", rows=12)
+            history.record(f"T{i:04d}", complete_financial_summaries({"": text})[""], created_at=1.7e9 + i)
+        year = parse_report(make_report(rows=12)).table.years[-1]
+        cases[f"history_find[reports={count}]"] = (
+            lambda history=history, year=year: history.find(NET_LEVERAGE, year, above=3)
+        )
+        # Includes listing the dataset's files, as on the first query of a process
+        cases[f"history_find_cold[reports={count}]"] = (
+            lambda root=root, year=year: ReportHistory(root).find(NET_LEVERAGE, year, above=3)
+        )
+
+    for rows in PDF_ROWS:
+        text = make_report(rows=rows)
+        cases[f"create_pdf[rows={rows}]"] = lambda text=text: backend.create_pdf(text, "SYN")
+
+    return cases
+
+
+def time_case(fn, min_time, rounds):
+    """Best seconds per call over `rounds` rounds of at least `min_time` seconds each."""
+    fn() # warm-up (imports, PDF worker start-up)
+    timer = timeit.Timer(fn)
+    number, elapsed = timer.autorange()
+    number = max(1, int(number * min_time / max(elapsed, 1e-9)))
+    return min(timer.repeat(repeat=rounds, number=number)) / number
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def load_history(path, machine):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        runs = [json.loads(line) for line in f if line.strip()]
+    return [run for run in runs if run.get("machine") == machine]
+
+
+def baselines(history, window):
+    """case -> median of its last `window` saved timings."""
+    per_case = {}
+    for run in history[-window:]:
+        for case, seconds in run["results"].items():
+            per_case.setdefault(case, []).append(seconds)
+    return {case: statistics.median(values) for case, values in per_case.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("-k", dest="filter", help="only cases whose name contains this text")
+    parser.add_argument("--quick", action="store_true", help="shorter rounds (noisier numbers)")
+    parser.add_argument("--save", action="store_true", help="append this run to the history file")
+    parser.add_argument("--history", default=DEFAULT_HISTORY, help="JSON-lines history file")
+    parser.add_argument("--window", type=int, default=5, help="saved runs the baseline is taken from")
+    parser.add_argument("--threshold", type=float, default=1.25, help="slowdown factor reported as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit 1 if any case regressed")
+    args = parser.parse_args()
+
+    machine = f"{platform.node()} {platform.machine()} py{platform.python_version()}"
+    baseline = baselines(load_history(args.history, machine), args.window)
+
+    # No trace log or history: their file writes would be part of the timings (and land in the working directory)
+    backend = core.ReportBackend(api_key="offline", asset_store_file=":memory:", trace_log_file=None, history_dir=None)
+    backend.get_company_logo_src = lambda ticker: "" # stubbed logo/domain lookup, no network
+    min_time, rounds = (0.05, 3) if args.quick else (0.2, 5)
+
+    results, regressions = {}, []
+    workdir = tempfile.mkdtemp(prefix="lucror-bench-")
+    try:
+        cases = build_cases(backend, workdir)
+        print(f"{'case':<44}{'best':>12}{'baseline':>12}{'change':>9}")
+        for name, fn in cases.items():
+            if args.filter and args.filter not in name:
+                continue
+            seconds = results[name] = time_case(fn, min_time, rounds)
+            previous = baseline.get(name)
+            change = f"{seconds / previous:>8.2f}x" if previous else f"{'new':>9}"
+            flag = ""
+            if previous and seconds > previous * args.threshold:
+                regressions.append(name)
+                flag = "  << REGRESSION"
+            baseline_ms = f"{previous * 1000:>10.3f}ms" if previous else f"{'-':>12}"
+            print(f"{name:<44}{seconds * 1000:>10.3f}ms{baseline_ms}{change}{flag}")
+    finally:
+        backend.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.history), exist_ok=True)
+        with open(args.history, "a", encoding="utf-8") as f:
+            f.write(json.dumps({
+                "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "commit": git_commit(),
+                "machine": machine,
+                "results": results,
+            }) + "\n")
+        print(f"Saved to {args.history}")
+
+    if regressions:
+        print(f"{len(regressions)} regression(s) over {args.threshold}x: {', '.join(regressions)}")
+        return 1 if args.fail_on_regression else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
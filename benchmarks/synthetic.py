@@ -0,0 +1,94 @@
+"""Synthetic reports in the format the prompt asks for, sized for benchmarks."""
+
+import random
+
+BASE_ITEMS = [
+    "Revenue",
+    "EBITDA",
+    "EBITDA Margin",
+    "Net cash provided by operating activities (OCF)",
+    "(-) Acquisition of PP&E and intangible assets",
+    "FOCF",
+    "Finance debt",
+    "Lease liabilities",
+    "Adjusted cash and cash equivalents",
+    "Net Debt",
+    "Net Leverage (Net Debt/EBITDA)",
+    "Coverage (FOCF/Net Debt)",
+]
+
+
+def _cell(rng, item):
+    name = item.lower()
+    if rng.random() < 0.05:
+        return rng.choice(["N/A", "-"])
+    if "margin" in name:
+        return f"{rng.uniform(2, 40):.1f}%"
+    if "leverage" in name or "coverage" in name:
+        return f"{rng.uniform(0, 6):.2f}x"
+    value = rng.randint(10, 250_000)
+    return f"({value:,})" if rng.random() < 0.15 else f"{value:,}"
+
+
+def make_report(ticker="SYN", rows=len(BASE_ITEMS), years=3, appendix_lines=30, seed=0):
+    """A full report: ratings, description, Key Management, a Financial Summary with
+    `rows` rows and `years` year columns, Key Credit Drivers and an Appendix with
+    one citation per row plus `appendix_lines` lines of reasoning.
+    """
+    rng = random.Random(f"{ticker}-{rows}-{years}-{appendix_lines}-{seed}")
+    items = [BASE_ITEMS[i] if i < len(BASE_ITEMS) else f"Segment {i - len(BASE_ITEMS) + 1} revenue"
+             for i in range(rows)]
+    year_labels = [f"FY{2025 - years + i}" for i in range(years)]
+
+    lines = [
+        f"# **{ticker} Holdings plc**",
+        "",
+        "| Agency | Rating |",
+        "| :--- | :--- |",
+        "| **Moody's:** | Ba1 (stable) |",
+        "| **S&P:** | BBB- (positive) |",
+        "| **Fitch:** | BB+ (stable) |",
+        "",
+        "*Source: Latest Rating Action Commentaries (Oct 2025).*",
+        "",
+        "### Description",
+        f"{ticker} Holdings is a diversified industrial group with operations in Europe, the Americas and Asia.",
+        "",
+        "*Source: Company Profile, FY2024 Annual Report.*",
+        "",
+        "**Key Management & Contact:**",
+        "* **CEO:** Jane Doe",
+        "* **CFO:** John Roe",
+        f"* **Investor Relations:** Email : ir@{ticker.lower()}.com",
+        "",
+        "### Financial Summary",
+        "*In USD mn*",
+        "",
+        "| Item | " + " | ".join(year_labels) + " |",
+        "| :--- | " + " | ".join(":---" for _ in year_labels) + " |",
+    ]
+    for item in items:
+        lines.append(f"| **{item}** | " + " | ".join(_cell(rng, item) for _ in year_labels) + " |")
+    lines += [
+        "",
+        "*Source: Audited Financial Statements, Form 10-K FY2022-FY2024.*",
+        "",
+        "### Key Credit Drivers",
+        "**Strengths:**",
+        "* **Scale:** Leading market shares in its core segments.",
+        "**Weaknesses:**",
+        "* **Cyclicality:** Earnings track industrial production.",
+        "",
+        "*Source: Company investor presentation.*",
+        "",
+        "### Appendix",
+        "**Data Source Dictionary**",
+    ]
+    for item in items:
+        lines.append(f"* **{item}**: Source Document: FY2024 Form 10-K, Page {rng.randint(40, 200)}, "
+                     f"Raw Value: {_cell(rng, item)}, Logic: Extracted from the consolidated statements.")
+    for i in range(appendix_lines):
+        item = rng.choice(items)
+        lines.append(f"Reasoning {i}: the {item} figure was cross-checked against the earnings release "
+                     f"and assigned to {rng.choice(year_labels)} based on the stated fiscal year end.")
+    return "\n".join(lines) + "\n"
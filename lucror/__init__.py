@@ -0,0 +1 @@
+"""Backend helpers for the Lucror Financial Analyst tear sheet app."""
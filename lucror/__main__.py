@@ -0,0 +1,7 @@
+import sys
+
+from lucror.cli import main
+
+# Guarded: PDF worker processes (spawn) re-import the main module
+if __name__ == "__main__":
+    sys.exit(main())
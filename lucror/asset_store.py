@@ -0,0 +1,145 @@
+"""Persistent cache of company metadata (website domain) and logo bytes, keyed by ticker."""
+
+import base64
+import threading
+import time
+
+from lucror.storage import LRUCache, connect
+from lucror.tracing import stage
+
+DEFAULT_TTL_SECONDS = 7 * 24 * 60 * 60
+# Lookups that found nothing are retried sooner than good ones
+MISS_TTL_SECONDS = 60 * 60
+LOGO_URL = "https://logo.clearbit.com/{domain}"
+LOGO_TIMEOUT_SECONDS = 5
+
+
+def fetch_company_domain(ticker):
+    """Looks up the official website via yfinance; returns the bare domain or None."""
+    import yfinance as yf
+
+    url = yf.Ticker(ticker).info.get('website')
+    if not url:
+        return None
+    # Clean URL to get just the domain (e.g., tesla.com)
+    return url.replace("https://", "").replace("http://", "").replace("www.", "").split('/')[0]
+
+
+def fetch_logo(domain):
+    """Downloads the Clearbit logo; returns (bytes, mime type) or (None, None)."""
+    import urllib.request
+
+    request = urllib.request.Request(LOGO_URL.format(domain=domain), headers={"User-Agent": "Mozilla/5.0"})
+    with urllib.request.urlopen(request, timeout=LOGO_TIMEOUT_SECONDS) as response:
+        mime = response.headers.get_content_type()
+        if not mime.startswith("image/"):
+            return None, None
+        return response.read(), mime
+
+
+class CompanyAssetStore:
+    """Ticker -> {domain, logo_bytes, logo_mime, fetched_at, ttl} with a bounded LRU in front of SQLite.
+
+    Entries past their TTL are refreshed on access. If the refresh fails (offline,
+    rate-limited) the stale entry keeps being served and is not retried for
+    MISS_TTL_SECONDS, so a warm ticker never waits on the network to render.
+    """
+
+    def __init__(self, path, ttl_seconds=DEFAULT_TTL_SECONDS, memory_size=256,
+                 fetch_domain=fetch_company_domain, fetch_logo=fetch_logo):
+        self.ttl_seconds = ttl_seconds
+        self._fetch_domain = fetch_domain
+        self._fetch_logo = fetch_logo
+        self._memory = LRUCache(memory_size)
+        self._lock = threading.Lock()
+        self._conn = connect(path)
+        with self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS company_assets (
+                    ticker TEXT PRIMARY KEY,
+                    domain TEXT NOT NULL,
+                    logo_bytes BLOB,
+                    logo_mime TEXT,
+                    fetched_at REAL NOT NULL,
+                    ttl REAL NOT NULL
+                )
+                """
+            )
+
+    def get(self, ticker):
+        ticker = ticker.upper()
+        entry = self._memory.get(ticker)
+        if entry is None:
+            entry = self._load(ticker)
+            if entry is not None:
+                self._memory.put(ticker, entry)
+
+        if entry is not None and entry["fetched_at"] + entry["ttl"] > time.time():
+            return entry
+
+        fresh = self._fetch(ticker, stale=entry)
+        if fresh is None:
+            # Keep the stale entry, but back off before trying the network again
+            fresh = dict(entry, fetched_at=time.time(), ttl=MISS_TTL_SECONDS)
+        self._save(fresh)
+        self._memory.put(ticker, fresh)
+        return fresh
+
+    def get_domain(self, ticker):
+        return self.get(ticker)["domain"]
+
+    def get_logo_data_uri(self, ticker):
+        """The logo as a base64 data URI (as used for the Lucror logo in the PDF), or ""."""
+        entry = self.get(ticker)
+        if not entry["logo_bytes"]:
+            return ""
+        return f"data:{entry['logo_mime']};base64,{base64.b64encode(entry['logo_bytes']).decode()}"
+
+    def invalidate(self, ticker):
+        ticker = ticker.upper()
+        self._memory.pop(ticker)
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM company_assets WHERE ticker = ?", (ticker,))
+
+    def _fetch(self, ticker, stale=None):
+        try:
+            with stage("domain_lookup"):
+                domain = self._fetch_domain(ticker)
+        except Exception:
+            domain = None
+        if domain is None and stale is not None:
+            # Offline or rate-limited: keep serving what we have
+            return None
+
+        found = domain is not None
+        domain = domain or f"{ticker.lower()}.com"
+        try:
+            with stage("logo_download"):
+                logo_bytes, logo_mime = self._fetch_logo(domain)
+        except Exception:
+            logo_bytes, logo_mime = None, None
+        if logo_bytes is None and stale is not None and stale["logo_bytes"] and stale["domain"] == domain:
+            logo_bytes, logo_mime = stale["logo_bytes"], stale["logo_mime"]
+
+        return {
+            "ticker": ticker,
+            "domain": domain,
+            "logo_bytes": logo_bytes,
+            "logo_mime": logo_mime,
+            "fetched_at": time.time(),
+            "ttl": self.ttl_seconds if found and logo_bytes else MISS_TTL_SECONDS,
+        }
+
+    def _load(self, ticker):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM company_assets WHERE ticker = ?", (ticker,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def _save(self, entry):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO company_assets VALUES (?, ?, ?, ?, ?, ?)",
+                (entry["ticker"], entry["domain"], entry["logo_bytes"], entry["logo_mime"],
+                 entry["fetched_at"], entry["ttl"]),
+            )
@@ -0,0 +1,95 @@
+"""Portfolio mode: run report generation for many tickers on a bounded thread pool."""
+
+import csv
+import io
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+DEFAULT_MAX_WORKERS = 4
+
+
+def parse_ticker_list(text):
+    """Splits free text ("F, TSLA\\nHOG") into unique upper-case tickers, keeping order."""
+    tickers = []
+    for token in re.split(r"[\s,;]+", text or ""):
+        token = token.strip().upper()
+        if token and token not in tickers:
+            tickers.append(token)
+    return tickers
+
+
+def tickers_from_csv(data):
+    """Reads tickers from CSV bytes/text, using a "ticker"/"symbol" column or else the first column."""
+    if isinstance(data, bytes):
+        data = data.decode("utf-8-sig")
+    rows = [row for row in csv.reader(io.StringIO(data)) if row]
+    if not rows:
+        return []
+
+    header = [h.strip().lower() for h in rows[0]]
+    column = 0
+    for name in ("ticker", "symbol"):
+        if name in header:
+            column = header.index(name)
+            rows = rows[1:]
+            break
+
+    return parse_ticker_list(" ".join(row[column] for row in rows if len(row) > column))
+
+
+class BatchResult:
+    """Outcome of one ticker in a batch run."""
+
+    def __init__(self, ticker, result=None, error=None, seconds=0.0):
+        self.ticker = ticker
+        self.result = result
+        self.error = error
+        self.seconds = seconds
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+def run_batch(tickers, worker, max_workers=DEFAULT_MAX_WORKERS, on_status=None, poll_interval=0.5):
+    """Runs `worker(ticker, set_status)` for every ticker, at most `max_workers` at a time.
+
+    Yields a BatchResult as each ticker finishes (completion order, not input order).
+    `worker` may call `set_status(message)` to report progress; `on_status(statuses)`
+    receives a snapshot of every ticker's status and is invoked from the consuming
+    thread, so it is safe to update Streamlit elements from it. A worker that raises
+    or returns an "Error: ..." string is reported as a failure without stopping the rest.
+    """
+    statuses = {ticker: "queued" for ticker in tickers}
+    lock = threading.Lock()
+
+    def set_status(ticker, message):
+        with lock:
+            statuses[ticker] = message
+
+    def run_one(ticker):
+        set_status(ticker, "running")
+        started = time.perf_counter()
+        try:
+            result = worker(ticker, lambda message: set_status(ticker, message))
+        except Exception as e:
+            return BatchResult(ticker, error=str(e), seconds=time.perf_counter() - started)
+        elapsed = time.perf_counter() - started
+        if isinstance(result, str) and result.startswith("Error"):
+            return BatchResult(ticker, error=result, seconds=elapsed)
+        return BatchResult(ticker, result=result, seconds=elapsed)
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="batch") as pool:
+        pending = {pool.submit(run_one, ticker) for ticker in tickers}
+        while pending:
+            done, pending = wait(pending, timeout=poll_interval, return_when=FIRST_COMPLETED)
+            for future in done:
+                outcome = future.result()
+                set_status(outcome.ticker, "done" if outcome.ok else "failed")
+                yield outcome
+            if on_status:
+                with lock:
+                    snapshot = dict(statuses)
+                on_status(snapshot)
@@ -0,0 +1,159 @@
+"""Command line report generation: `python -m lucror F TSLA --format pdf xlsx`.
+
+Runs without Streamlit (for cron jobs and workers) and shares the report cache,
+corrections, company assets and ingested filings with the app when started from
+the same directory.
+"""
+
+import argparse
+import os
+import sys
+
+from lucror.batch import DEFAULT_MAX_WORKERS, parse_ticker_list, run_batch, tickers_from_csv
+
+FORMATS = ("md", "pdf", "xlsx")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m lucror", description="Generate Lucror credit reports.")
+    parser.add_argument("tickers", nargs="*", help="tickers to report on (e.g. F TSLA HOG)")
+    parser.add_argument("-f", "--file", help="CSV or text file with more tickers (\"ticker\" column or first column)")
+    parser.add_argument("-o", "--output-dir", default=".", help="where to write the files (default: current directory)")
+    parser.add_argument("--format", nargs="+", choices=FORMATS, default=list(FORMATS), dest="formats",
+                        help="outputs to write per ticker (default: all)")
+    parser.add_argument("--portfolio", metavar="XLSX", help="also write one workbook with every ticker's Financial Summary")
+    parser.add_argument("--force-refresh", action="store_true", help="ignore cached reports")
+    parser.add_argument("-j", "--workers", type=int, default=DEFAULT_MAX_WORKERS, help="concurrent report requests")
+    parser.add_argument("-q", "--quiet", action="store_true", help="only print errors")
+    parser.add_argument("--ingest", nargs="+", default=[], metavar="[TICKER=]FILE",
+                        help="index downloaded 10-K/20-F filings (HTML, XBRL or text) first; the ticker can be "
+                             "left out for EDGAR document names such as f-20241231.htm")
+    parser.add_argument("--offline", action="store_true",
+                        help="answer with canned sample reports instead of calling Gemini (nothing is cached or stored)")
+    return parser
+
+
+def read_tickers(args):
+    tickers = parse_ticker_list(" ".join(args.tickers))
+    if args.file:
+        with open(args.file, "rb") as f:
+            data = f.read()
+        from_file = tickers_from_csv(data) if args.file.lower().endswith(".csv") else parse_ticker_list(data.decode("utf-8-sig"))
+        tickers += [t for t in from_file if t not in tickers]
+    return tickers
+
+
+def ingest_filings(backend, specs, log):
+    """Indexes each "[TICKER=]FILE"; returns False if any of them failed."""
+    ok = True
+    for spec in specs:
+        ticker, sep, path = spec.partition("=")
+        if not sep or os.path.exists(spec):
+            ticker, path = "", spec
+        try:
+            ticker, count = backend.ingest_filing(path, ticker=ticker or None)
+        except (OSError, ValueError) as e:
+            print(f"{path}: Error: {e}", file=sys.stderr)
+            ok = False
+            continue
+        if not count:
+            print(f"{path}: no statement lines found", file=sys.stderr)
+            ok = False
+            continue
+        log(f"{path}: {count} statement lines indexed for {ticker}")
+    return ok
+
+
+def write_outputs(backend, ticker, report_text, formats, output_dir):
+    """Writes the requested files for one report; returns the paths written."""
+    outputs = {
+        "md": (f"{ticker}_Credit_Report.md", lambda: report_text.encode("utf-8")),
+        "pdf": (f"{ticker}_Credit_Report.pdf", lambda: backend.create_pdf(report_text, ticker)),
+        "xlsx": (f"{ticker}_Financials.xlsx", lambda: backend.create_excel(report_text, ticker)),
+    }
+    written = []
+    for fmt in formats:
+        file_name, build = outputs[fmt]
+        data = build()
+        if data is None:
+            raise ValueError(f"could not build {fmt} (no Financial Summary table or PDF conversion error)")
+        path = os.path.join(output_dir, file_name)
+        with open(path, "wb") as f:
+            f.write(data)
+        written.append(path)
+    return written
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    tickers = read_tickers(args)
+    if not tickers and not args.ingest:
+        print("No tickers given.", file=sys.stderr)
+        return 2
+
+    # Imported here so `--help` and argument errors stay instant
+    from lucror import core
+
+    if args.offline:
+        from lucror.fake_genai import FakeGenaiClient
+
+        # Nothing from a sample run may end up next to real reports: every store stays in memory
+        backend = core.ReportBackend(
+            client=FakeGenaiClient(), feedback_file=None, feedback_db_file=":memory:", report_cache_file=":memory:",
+            asset_store_file=":memory:", job_store_file=":memory:", filings_file=":memory:", history_dir=None,
+            trace_log_file=None,
+        )
+    else:
+        backend = core.ReportBackend()
+
+    def log(message):
+        if not args.quiet:
+            print(message, file=sys.stderr)
+
+    if args.ingest:
+        ingested = ingest_filings(backend, args.ingest, log)
+        if not tickers:
+            backend.close()
+            return 0 if ingested else 1
+    if not args.offline and not backend.api_key:
+        print(f"Set {core.API_KEY_ENV} to your Gemini API key.", file=sys.stderr)
+        return 2
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    reports = {}
+    failed = []
+    try:
+        for outcome in run_batch(
+            tickers,
+            lambda t, set_status: backend.get_company_report(t, force_refresh=args.force_refresh, on_retry=set_status),
+            max_workers=args.workers,
+        ):
+            if not outcome.ok:
+                print(f"{outcome.ticker}: {outcome.error}", file=sys.stderr)
+                failed.append(outcome.ticker)
+                continue
+            report_text = outcome.result["report_text"]
+            source = "cache" if outcome.result["from_cache"] else f"generated in {outcome.seconds:.0f}s"
+            if outcome.result["corrections_applied"]:
+                source += f", {len(outcome.result['corrections_applied'])} stored corrections applied"
+            try:
+                paths = write_outputs(backend, outcome.ticker, report_text, args.formats, args.output_dir)
+            except Exception as e:
+                print(f"{outcome.ticker}: Error: {e}", file=sys.stderr)
+                failed.append(outcome.ticker)
+                continue
+            reports[outcome.ticker] = report_text
+            log(f"{outcome.ticker} ({source}): {', '.join(paths) or 'no outputs requested'}")
+
+        if args.portfolio and reports:
+            data = core.create_portfolio_excel({t: reports[t] for t in tickers if t in reports})
+            if data is None:
+                print("Portfolio workbook: no Financial Summary tables found.", file=sys.stderr)
+            else:
+                with open(args.portfolio, "wb") as f:
+                    f.write(data)
+                log(f"Portfolio workbook: {args.portfolio}")
+    finally:
+        backend.close()
+
+    return 1 if failed else 0
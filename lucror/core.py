@@ -0,0 +1,1013 @@
+"""Report backend without Streamlit: prompt, generation, report cache, parsing and exports.
+
+Shared by the Streamlit app (ts.py) and the command line (`python -m lucror`).
+Heavy dependencies (google-genai, pandas, markdown, xhtml2pdf, yfinance) are
+imported on first use, so importing this module stays cheap.
+"""
+
+import hashlib
+import io
+import os
+import threading
+import time
+
+from lucror.asset_store import CompanyAssetStore
+from lucror.feedback_store import CorrectionsStore
+from lucror.filings import FilingsStore
+from lucror.history import ReportHistory
+from lucror.jobs import JobQueue
+from lucror.metrics import complete_financial_summary, recompute_dependents, row_id
+from lucror.pdf_markdown import normalize_pdf_markdown
+from lucror.prompt_cache import PromptCache, is_cache_miss
+from lucror.report_cache import ReportCache, make_cache_key
+from lucror.report_parser import RATINGS_SECTION, normalize_item_name, parse_report, split_sections
+from lucror.retry import PRIMARY_MODEL, RetryPolicy, call_with_retry, run_sync
+from lucror.singleflight import SingleFlight
+from lucror.tracing import TraceLog, annotate, record_usage, stage, trace
+
+# --- CONFIGURATION ---
+API_KEY_ENV = "GENAI_API_KEY"
+MODEL_NAME = PRIMARY_MODEL # Updated to latest stable available
+
+# Legacy JSON store, migrated into FEEDBACK_DB_FILE on first start
+FEEDBACK_FILE = "feedback_store.json"
+FEEDBACK_DB_FILE = "feedback_store.sqlite3"
+REPORT_CACHE_FILE = "report_cache.sqlite3"
+ASSET_STORE_FILE = "company_assets.sqlite3"
+JOB_STORE_FILE = "report_jobs.sqlite3"
+FILINGS_STORE_FILE = "filings.sqlite3"
+# Filings uploaded in the app are kept here (the index points at the files)
+FILINGS_DIR = "filings"
+# Parquet dataset of every generated Financial Summary (see lucror.history); None disables it
+HISTORY_DIR = "report_history"
+LUCROR_LOGO_FILE = "lucror_logo.png"
+# One JSON line per report request / export (stages, timings, token counts)
+TRACE_LOG_FILE = "report_traces.jsonl"
+# Lifetime of the server-side cache of REPORT_PROMPT_PREFIX (extended while in use); None disables it
+PROMPT_CACHE_TTL_SECONDS = 60 * 60
+
+# --- PROMPT TEMPLATE ---
+# UPDATED PROMPT: Updated with specific boss requirements for Financial Summary
+# Static prefix: identical for every ticker, so Gemini can keep it as cached content (see prompt_cache.py).
+# Any edit changes REPORT_PROMPT_VERSION, which retires the old server-side cache and the cached reports.
+REPORT_PROMPT_PREFIX = """
+    You are a professional Financial Credit Analyst.
+    Your goal is to produce a deep-dive company credit report that matches the EXACT format below.
+
+    ### INSTRUCTIONS:
+    1. **Search Strategy (CRITICAL):**
+        
+        - **Primary Source (Boss’s Orders):**
+          Search specifically for **"[TICKER] Investor Relations"** to locate the company’s official investor relations website.
+          Use this site as the anchor for all financial documents.
+        
+        - **Regulatory Filings (MANDATORY – DO NOT SKIP):**
+          Identify the company’s primary annual regulatory filing.
+          - U.S. issuers: **Form 10-K**
+          - Foreign private issuers / ADRs: **Form 20-F**
+          Use ONLY these filings for audited financial statement data.
+        
+        - **Historical Financial Data (CRUCIAL):**
+          - Search for **"[TICKER] Form 10-K (FY2022)" OR "[TICKER] Form 20-F (FY2022)"**
+          - Search for **"[TICKER] Form 10-K (FY2023)" OR "[TICKER] Form 20-F (FY2023)"**
+          - Search for **"[TICKER] Form 10-K (FY2024)" OR "[TICKER] Form 20-F (FY2024)"**
+          Use the company’s primary annual filing for each fiscal year.
+          Do NOT rely on documents labeled only as “Annual Report” unless they explicitly contain the audited financial statements.
+        
+        - **Fiscal Year Verification (NON-NEGOTIABLE):**
+          First, identify the company’s fiscal year end from the filing.
+          Assign data to FY2022 / FY2023 / FY2024 strictly based on the stated fiscal year,
+          NOT the calendar year or publication date.
+        
+       - **EBITDA Source Rule (NON-NEGOTIABLE):**
+          For each year (FY2022/FY2023/FY2024), you MUST extract EBITDA/Adjusted EBITDA from the SAME annual filing
+          (Form 10-K or Form 20-F) that you used for Revenue for that year.
+          Search WITHIN that filing for: "Adjusted EBITDA", "EBITDA", "Performance measures", "Non-GAAP measures".
+        
+          ONLY if the annual filing does NOT disclose an explicit EBITDA/Adjusted EBITDA figure,
+          then use an OFFICIAL company IR earnings release / investor presentation as a fallback.
+        
+          DO NOT use third-party aggregators (Macrotrends, Yahoo Finance, StockAnalysis, etc.) for EBITDA.
+          If you cannot find it in official sources, output "N/A".
+
+        
+        - **Cash Flow & Capex (STATEMENT-LEVEL DATA ONLY):**
+          Extract the following strictly from the **Consolidated Statement of Cash Flows**:
+        - **Net cash provided by operating activities (OCF):** Extract the value strictly from the detailed **"Consolidated Statement of Cash Flows"** (usually near the end of the report).
+      
+          *ANTI-HALLUCINATION RULES:*
+          1. **Anchor Check:** The correct table MUST contain rows for **"Depreciation, depletion and amortization"** and **"Foreign exchange, indexation and finance charges"**. If the table does not list these specific adjustments, IT IS THE WRONG TABLE.
+          2. **Ignore Highlights:** Do NOT use data from "Financial Highlights", "Selected Financial Data", "Key Figures", or "MD&A" sections. These are often adjusted/non-GAAP.
+          3. **Value Match:** The value you extract must be the bottom-line total labeled "Net cash provided by operating activities".
+          - **Capex**, defined as **"Acquisition of PP&E and intangible assets"** Search for this in the same table as **Net cash provided by operating activities (OCF):**
+
+        
+        - **Credit Ratings:**
+          Search for **"[TICKER] Moody’s credit rating"**, **"[TICKER] S&P credit rating"**, and **"[TICKER] Fitch credit rating"**.
+          Use the most recent rating action press releases (2024–2025).
+        
+        - **Management & Investor Relations Contact:**
+          Search for:
+          - **"[TICKER] CEO"**
+          - **"[TICKER] CFO"**
+          - **"[TICKER] Investor Relations contact"**
+          Prefer the official company or investor relations website.
+
+
+    2.  **Calculations & Definitions (STRICT):**
+        -   **Revenue:** Extract the exact **"Sales revenues"** or **"Net operating revenues"** line strictly from the **Consolidated Statement of Income** table.
+            * **CRITICAL:** Do NOT use numbers from the "Financial Highlights", "Key Figures", or "Gross Revenue" sections. Use the GAAP/IFRS table value only.
+        - **EBITDA (STRICT DOCUMENT CONSISTENCY RULE):**
+          First, search for **"Adjusted EBITDA" explicitly within the SAME annual regulatory filing
+          (Form 10-K or Form 20-F) used to extract Revenue for that fiscal year.**
+        
+          If an "Adjusted EBITDA" or "EBITDA" table exists in that filing (including notes,
+          segment information, or performance measures sections),
+          you MUST use that value.
+        
+          ONLY if the annual filing does NOT contain an explicit Adjusted EBITDA figure,
+          then search for a separate "Adjusted EBITDA reconciliation" in earnings releases
+          or investor presentations.
+        
+          DO NOT calculate EBITDA manually if an explicit value exists in the annual filing.
+
+        -   **Net cash provided by operating activities (OCF):** Extract the exact **"Net cash provided by operating activities"** (or "Net cash from operations") line directly from the **Consolidated Statement of Cash Flows**. 
+            *DO NOT adjust for interest. Use the raw figure from the statement.*
+
+        -   **(-) Acquisition of PP&E and intangible assets:** Extract the cash used for **"Purchase of property, plant and equipment"** (Capex) AND **"Purchase of intangible assets"** from the Investing section of the Cash Flow Statement.
+            *Sum these values if reported separately.*
+
+        -   **Finance debt, Lease liabilities, Adjusted cash and cash equivalents (STRICT – Petrobras / screenshot definition):**
+            Extract the three components of Net Debt as defined in the FY2024 20-F Net Debt reconciliation:
+            1) **Finance debt:** current + non-current finance debt (borrowings), excluding leases.
+            2) **Lease liabilities:** current + non-current lease liabilities (IFRS 16).
+            3) **Adjusted cash and cash equivalents:** the "Adjusted cash and cash equivalents" line of the same reconciliation.
+
+            CRITICAL:
+            - Take all three from the SAME Gross Debt - Adjusted Cash reconciliation section of the filing.
+            - For FY2022 and FY2023: use the SAME definitions, from that year's filing.
+            - If a component is not reported for a year, output "N/A" for that cell. Do NOT estimate it.
+
+    2.  **Derived rows (DO NOT OUTPUT):**
+        -   EBITDA Margin, FOCF, Net Debt, Net Leverage and Coverage are computed by our system from the rows above.
+            Do NOT calculate them and do NOT include them in the table or the Appendix.
+        **IMPORTANT:** EBITDA must be taken from an explicitly reported "EBITDA" or "Adjusted EBITDA" figure in an official filing.
+        Do NOT compute EBITDA as Operating Income + D&A unless you explicitly label it as an estimate and only if no reported EBITDA exists.
+
+        
+    
+    3.  **Format:** Output strictly in Markdown. Follow the One-Shot Example structure exactly.
+        
+    4.  **Audit Trail (CRITICAL):** -   AFTER the main report, output a section header called `### Appendix`.
+        -   Inside the Appendix, you MUST generate a structured list titled **"Data Source Dictionary"**.
+        -   **CRITICAL:** You must generate a bullet point for **EVERY SINGLE ROW** in the table. Do not skip *any* row.
+        -   Format:
+            * **[Exact Row Name]**: Source: [Document Name/Page] OR Logic: [Formula used]. Raw Value: [Value].
+            * **[Item Name]**: Source Document: [Name], Page: [Page #], Raw Value: [Value], Logic: [Explanation].
+
+        -   Example:
+
+            * **Revenue**: Source Document: Ford 2024 10-K, Page: 45, Raw Value: 158,000, Logic: Sum of Automotive and Credit revenue.
+
+            * **FFO**: Source Document: Q3 Earnings Release, Page: 8, Raw Value: Calculated, Logic: Net Income (200) + D&A (150).
+    
+    5.  **Rationale (Internal):** AFTER the main report, output a section header called `Appendix`. INCLUDE IT IN THE NEXT PAGE. In this section, detail your thought process, reasoning for credit drivers, and how you located each data point (with URLs). This is for internal use and should NOT appear in the main report.
+        -   In this section, you must provide a **"Financial Data Audit"**.
+        -   For every year (FY23, FY24, LTM) in the Financial Summary, you must state:
+            * **Exact Document Name:** (e.g., "Ford 2024 10-K" - https://investor.ford.com/...)
+            * **Page Number/Table Name:** (e.g., "Consolidated Statement of Operations, Page 45")
+            * **Raw Figure Used:** (e.g., "I saw Revenue = 158,000 in the PDF, so I used 158,000")
+            * **Reasoning:** Explain why you assigned it to that specific column (e.g., "The report says 'Fiscal Year Ended Dec 31, 2024', so this goes in the FY2024 column").
+        -   **This is to prevent year-shifting errors.**
+
+    6.  **Transparency & Footnotes (NEW REQUIREMENT):**
+        -   **After EVERY section** (Ratings, Description, Financial Summary, Key Credit Drivers), you MUST include a small footnote  starting with "*Source:*" briefly describing where that specific data was found. (Leave one line, for tables of Ratings and Financial Summary, do NOT include "Source" in the table)
+        -   **Financial Summary Specificity:** The footnote directly below the Financial Summary table (LEAVE ONE LINE JUST AFTER THE TABLE, DO NOT INCLUDE "Source" (the footnote) IN THE TABLE,) MUST clarify if the figures are from **Audited Financial Statements**, an **Earnings Release**, or **Management Accounts**. This is crucial for replication.
+        -   **Ratings Specificity:** The footnote below the Ratings table MUST specify the exact document and date where the ratings were sourced. LEAVE ONE LINE AFTER THE TABLE, BEFORE THE SOURCE DESCRIPTION
+    7. **Data Freshness:** Use ONLY the most recent data available (2024/2025). Do NOT use outdated financials or ratings.
+    8. **Clean Format:** In the section of "Key Credit Drivers", use bullet points for clarity.
+    9. **No Citation Tags:** DO NOT include any text like "" or "[previous search]" or "cite" or "(previous search)" in your output.
+    10. USE BULLET POINTS IN THE "KEY MANAGEMENTS AND CONTACT" SECTION
+    
+
+    ### ONE-SHOT EXAMPLE (STRICTLY FOLLOW THIS TABLE STRUCTURE):
+    Input: JLR
+    Output:
+    # **Jaguar Land Rover Automotive plc**
+
+    | Agency | Rating |
+    | :--- | :--- |
+    | **Moody's:** | Ba1 (stable) |
+    | **S&P:** | BBB- (positive) |
+    | **Fitch:** | BB- (stable) |
+
+    *Source: Latest Rating Action Commentaries from Moody's and S&P (Oct 2025).*
+
+    ### Description
+    Jaguar Land Rover (JLR) is a luxury automaker...
+
+    *Source: Company Profile, FY2024 Annual Report.*
+
+    **Key Management & Contact:**
+    * **CEO:** Adrian Mardell
+    * **CFO:** Richard Molyneux
+    * **Investor Relations:** Email : investor@jaguarlandrover.com
+
+
+
+    ### Financial Summary
+    *In GBP mn*
+
+    | Item | FY2022 | FY2023 | FY2024 |
+    | :--- | :--- | :--- | :--- |
+    | **Revenue** | 18,320 | 22,809 | 28,995 |
+    | **EBITDA** | 2,050 | 2,500 | 3,400 |
+    | **Net cash provided by operating activities (OCF)** | 1,100 | 1,500 | 2,000 |
+    | **(-) Acquisition of PP&E and intangible assets** | (1,000) | (1,200) | (1,300) |
+    | **Finance debt** | 5,600 | 5,500 | 5,300 |
+    | **Lease liabilities** | 400 | 450 | 500 |
+    | **Adjusted cash and cash equivalents** | 1,500 | 1,750 | 2,000 |
+
+    *Source: Figures for FY23/24 derived from Audited Financial Statements; LTM figures derived from Q3 2025 Earnings Release (Management Accounts).*
+
+    ### Key Credit Drivers
+    **Premium brand positioning:** ...
+    *Source: Market analysis and JLR November 2025 Debt Investor Presentation.*
+
+    ### Appendix
+    **Data Source Dictionary**
+    * **Revenue**: Source Document: FY2024 Annual Report, Page 88, Raw Value: 28,995, Logic: Extracted directly from Consolidated Income Statement.
+    * **EBITDA**: Source Document: Investor Presentation Slide 12, Raw Value: 3,400, Logic: Reported Adjusted EBITDA.
+    * **FFO**: Source Document: 10-K Cash Flow Stmt, Raw Value: Calculated, Logic: Net Income (1,200) + D&A (1,000).
+
+"""
+
+# Per-ticker suffix, sent with every request
+REPORT_PROMPT_SUFFIX_TEMPLATE = """
+    {feedback_injection}
+    {filing_context}
+    ### YOUR TASK:
+    Now, generate the report for the following ticker using the latest available live data.
+    [TICKER] in the instructions above stands for {ticker}.
+    Input: {ticker}
+    Output:
+    """
+
+REPORT_PROMPT_TEMPLATE = REPORT_PROMPT_PREFIX + REPORT_PROMPT_SUFFIX_TEMPLATE
+REPORT_PROMPT_VERSION = hashlib.sha256(REPORT_PROMPT_PREFIX.encode("utf-8")).hexdigest()[:12]
+
+
+def build_feedback_injection(corrections):
+    """The "USER CORRECTIONS" block for a ticker's stored corrections ("" if none)."""
+    if not corrections:
+        return ""
+    lines = ["\n### USER CORRECTIONS (MANDATORY TO APPLY):"]
+    for k, v in corrections.items():
+        lines.append(
+            f"- {k} must equal {v['correct_value']} "
+            f"(Corrected by analyst on {v['timestamp']}. Reason: {v['comment']})"
+        )
+    return "\n".join(lines)
+
+
+def build_report_suffix(ticker, corrections=None, filing_context=""):
+    """The per-ticker part of the prompt (corrections, local filing data and the task), sent after the static prefix."""
+    return REPORT_PROMPT_SUFFIX_TEMPLATE.format(
+        ticker=ticker, feedback_injection=build_feedback_injection(corrections), filing_context=filing_context
+    )
+
+
+def build_report_prompt(ticker, corrections=None, filing_context=""):
+    """The full prompt, for calls made without the cached prefix."""
+    return REPORT_PROMPT_PREFIX + build_report_suffix(ticker, corrections, filing_context)
+
+
+# --- SECTION PROMPT (targeted refresh of one section) ---
+def _prompt_block(start, end):
+    """The part of REPORT_PROMPT_PREFIX from `start` up to `end`, so both prompts share one set of rules."""
+    begin = REPORT_PROMPT_PREFIX.find(start)
+    finish = REPORT_PROMPT_PREFIX.find(end, begin)
+    if begin == -1 or finish == -1:
+        raise ValueError(f"REPORT_PROMPT_PREFIX no longer contains {start!r} ... {end!r}")
+    # Whole lines, indentation included
+    begin = REPORT_PROMPT_PREFIX.rfind("\n", 0, begin) + 1
+    return REPORT_PROMPT_PREFIX[begin:finish].rstrip()
+
+
+SECTION_RULES = {
+    RATINGS_SECTION: (
+        _prompt_block("- **Credit Ratings:**", "- **Management & Investor Relations Contact:**")
+        + "\n        - Start with the company name as a title (`# **Company Name**`), then the `| Agency | Rating |` table."
+    ),
+    "Description": (
+        "        - A short business description, then **Key Management & Contact:** as bullet points (CEO, CFO, Investor Relations).\n"
+        + _prompt_block("- **Management & Investor Relations Contact:**", "2.  **Calculations & Definitions (STRICT):**")
+    ),
+    "Financial Summary": (
+        _prompt_block("- **Regulatory Filings (MANDATORY – DO NOT SKIP):**", "- **Credit Ratings:**")
+        + "\n\n" + _prompt_block("2.  **Calculations & Definitions (STRICT):**", "3.  **Format:**")
+    ),
+    "Key Credit Drivers": (
+        "        - Strengths and weaknesses as bullet points with a bold lead-in (e.g. `* **Scale:** ...`), based on the latest\n"
+        "          filings, rating action commentaries and investor presentations."
+    ),
+}
+
+SECTION_OUTPUT = {
+    RATINGS_SECTION: "The title line, the ratings table, one empty line, the *Source:* footnote. Nothing else.",
+    "Description": "The `### Description` section (with Key Management & Contact) and its *Source:* footnote. Nothing else.",
+    "Financial Summary": (
+        "The `### Financial Summary` section (currency line, table with the same year columns, one empty line,\n"
+        "    the *Source:* footnote). Then a `### Appendix` header and a **Data Source Dictionary** with one bullet per\n"
+        "    table row: * **[Exact Row Name]**: Source Document: [Name], Page: [Page #], Raw Value: [Value], Logic: [Explanation]."
+    ),
+    "Key Credit Drivers": "The `### Key Credit Drivers` section and its *Source:* footnote. Nothing else.",
+}
+
+SECTION_PROMPT_TEMPLATE = """
+    You are a professional Financial Credit Analyst updating ONE section of an existing credit report on {ticker}.
+    Use Google Search and the latest available live data (2024/2025). [TICKER] in the rules below stands for {ticker}.
+
+    ### RULES FOR THE "{section}" SECTION:
+{rules}
+
+    ### GENERAL RULES:
+    - Output strictly in Markdown, with the same structure as the current section below.
+    - End the section with a small footnote starting with "*Source:*" (leave one empty line after a table).
+    - Do NOT output any other section, any preamble, or citation tags like "[previous search]" or "cite".
+    {feedback_injection}
+    ### CURRENT SECTION (for the format only; its data may be stale or wrong):
+{current_section}
+
+    ### OUTPUT:
+    {output}
+    """
+
+
+def build_section_prompt(ticker, section, report_text, corrections=None, filing_context=""):
+    """Focused prompt regenerating `section` of `report_text` (only Financial Summary uses corrections and filings)."""
+    from lucror.sections import without_derived_rows
+
+    current = split_sections(report_text).get(section, "(missing)")
+    if section == "Financial Summary":
+        current = without_derived_rows(current)
+    return SECTION_PROMPT_TEMPLATE.format(
+        ticker=ticker,
+        section=section,
+        rules=SECTION_RULES[section],
+        feedback_injection=(build_feedback_injection(corrections) + filing_context) if section == "Financial Summary" else "",
+        current_section=current.strip(),
+        output=SECTION_OUTPUT[section],
+    )
+
+
+# --- MARKDOWN TABLE HELPERS ---
+def parse_markdown_table(markdown_content):
+
+    """Parses the Financial Summary markdown table into a Pandas DataFrame."""
+
+    doc = parse_report(markdown_content)
+    if doc.table is None:
+        return None, None, None
+    return doc.table.to_dataframe(), doc.pre_table_text, doc.post_table_text
+
+def update_markdown_table_value(markdown_text, item, year, new_value):
+    # Row and column positions come from the cached document, no re-scan of the text
+    table = parse_report(markdown_text).table
+    if table is None or year not in table.headers or item not in table.row_index:
+        return markdown_text
+
+    lines = markdown_text.split("\n")
+    year_position = table.headers.index(year)
+    line_no = table.line_numbers[table.row_index[item]]
+
+    # Remove first and last empty cell
+    cells = lines[line_no].split("|")[1:-1]
+
+    if year_position < len(cells):
+        cells[year_position] = str(new_value)
+
+        # Reconstruct correctly with pipes (stripped, so repeated edits do not pad the cells)
+        lines[line_no] = "| " + " | ".join(cell.strip() for cell in cells) + " |"
+
+    return "\n".join(lines)
+
+
+def apply_corrections(markdown_text, corrections):
+    """Writes a ticker's stored corrections into the Financial Summary, cell by cell.
+
+    Same cell logic as `update_markdown_table_value`; an item is matched by its
+    exact row name, else by its canonical row or normalized name ("**Capex**"
+    finds "(-) Acquisition of PP&E and intangible assets").
+    Returns `(text, applied)`, `applied` listing {"item", "year", "previous",
+    "value"} for every cell a correction changed; corrections whose row or year
+    is not in the table, or whose value is already there, are skipped. Derived rows fed by a corrected row
+    are recomputed (`recompute_dependents`) unless they were corrected themselves.
+    """
+    applied = []
+    for key, correction in (corrections or {}).items():
+        # Keys are f"{item}_{year}"; item names may contain underscores, years don't
+        item, _, year = key.rpartition("_")
+        table = parse_report(markdown_text).table
+        if table is None or year not in table.headers:
+            continue
+        match = row_id(item) or normalize_item_name(item)
+        row = item if item in table.row_index else next(
+            (name for name in table.row_index if (row_id(name) or normalize_item_name(name)) == match), None
+        )
+        if row is None:
+            continue
+        value = str(correction["correct_value"])
+        previous = table.rows[table.row_index[row]][table.headers.index(year)]
+        if previous.strip() == value.strip():
+            # Already there (e.g. a report generated with the correction in its prompt)
+            continue
+        markdown_text = update_markdown_table_value(markdown_text, row, year, value)
+        applied.append({"item": row, "year": year, "previous": previous, "value": value})
+    if applied:
+        markdown_text, _recomputed = recompute_dependents(markdown_text, [cell["item"] for cell in applied])
+    return markdown_text, applied
+
+
+# --- EXPORTS ---
+def create_excel(markdown_content, ticker=None):
+    """Extracts Financial Summary table and converts to formatted Excel (None if there is no table)."""
+    from lucror.excel_export import write_financial_workbook
+    from lucror.financial_numbers import clean_financial_frame
+
+    # 1. LOCATE AND PARSE THE TABLE (shared, cached document)
+    with stage("parse"):
+        table = parse_report(markdown_content).table
+    if table is None: return None
+
+    # 2. PROCESS MARKDOWN INTO DATAFRAME
+    # 3. CLEAN DATA (String -> Number), whole frame at once; Item names are kept as-is
+    with stage("clean_numbers", rows=len(table.rows)):
+        df, _units = clean_financial_frame(table.to_dataframe())
+
+    # 4. WRITE TO EXCEL WITH FORMATTING (row formats classified once, whole rows written)
+    output = io.BytesIO()
+    with stage("excel_write"):
+        write_financial_workbook(output, {'Financial Summary': df})
+    return output.getvalue()
+
+def create_portfolio_excel(reports):
+    """One Financial Summary sheet per ticker; rows are flushed as they are written, so memory stays flat."""
+    from lucror.excel_export import write_financial_workbook
+    from lucror.financial_numbers import clean_financial_frame
+
+    sheets = {}
+    for ticker, markdown_content in reports.items():
+        table = parse_report(markdown_content).table
+        if table is not None:
+            sheets[ticker], _units = clean_financial_frame(table.to_dataframe())
+    if not sheets: return None
+    output = io.BytesIO()
+    write_financial_workbook(output, sheets, constant_memory=True)
+    return output.getvalue()
+
+def markdown_to_pdf_html(markdown_content):
+    """The report body as HTML, after the PDF clean-up rules (header, titles, Investor Relations, ...)."""
+    import markdown
+
+    with stage("pdf_markdown_normalize"):
+        markdown_content = normalize_pdf_markdown(markdown_content)
+    with stage("markdown_to_html"):
+        return markdown.markdown(markdown_content, extensions=['tables'])
+
+
+# --- GENERATION ---
+def report_tools():
+    """Tools for report generation (Google Search grounding)."""
+    from google.genai import types
+
+    return [types.Tool(google_search=types.GoogleSearch())]
+
+
+async def stream_report_response(client, model, prompt, config, on_text):
+    """Streams a generation, calling `on_text(text_so_far)` per chunk.
+
+    Returns a GenerateContentResponse carrying the full text and the grounding
+    metadata (sent with the final chunks), same shape as `generate_content`.
+    """
+    from google.genai import types
+
+    text_parts = []
+    grounding_metadata = None
+    last_chunk = None
+    started = time.perf_counter()
+    async for chunk in await client.aio.models.generate_content_stream(
+        model=model,
+        contents=prompt,
+        config=config
+    ):
+        if last_chunk is None:
+            annotate(first_chunk_seconds=round(time.perf_counter() - started, 3))
+        last_chunk = chunk
+        if chunk.text:
+            text_parts.append(chunk.text)
+            on_text("".join(text_parts))
+        if chunk.candidates and chunk.candidates[0].grounding_metadata:
+            grounding_metadata = chunk.candidates[0].grounding_metadata
+
+    return types.GenerateContentResponse(
+        candidates=[
+            types.Candidate(
+                content=types.Content(role="model", parts=[types.Part(text="".join(text_parts))]),
+                grounding_metadata=grounding_metadata
+            )
+        ],
+        usage_metadata=last_chunk.usage_metadata if last_chunk else None,
+        model_version=last_chunk.model_version if last_chunk else None
+    )
+
+
+def report_to_json(report):
+    """A `get_company_report` result as JSON-serializable data (for the job store)."""
+    metadata = report["grounding_metadata"]
+    return dict(report, grounding_metadata=metadata.model_dump(mode="json", exclude_none=True) if metadata else None)
+
+
+def report_from_json(data):
+    from google.genai import types
+
+    metadata = data["grounding_metadata"]
+    return dict(data, grounding_metadata=types.GroundingMetadata.model_validate(metadata) if metadata else None)
+
+
+class ReportBackend:
+    """Owns the long-lived resources (Gemini client, stores, PDF workers) and the report workflow.
+
+    Resources are created on first use and are safe to share between threads
+    (batch workers). The API key defaults to the GENAI_API_KEY environment variable.
+    """
+
+    def __init__(self, api_key=None, feedback_file=FEEDBACK_FILE, feedback_db_file=FEEDBACK_DB_FILE,
+                 report_cache_file=REPORT_CACHE_FILE, asset_store_file=ASSET_STORE_FILE,
+                 job_store_file=JOB_STORE_FILE, filings_file=FILINGS_STORE_FILE,
+                 filings_dir=FILINGS_DIR, history_dir=HISTORY_DIR, logo_file=LUCROR_LOGO_FILE, trace_log_file=TRACE_LOG_FILE, retry_policy=None,
+                 prompt_cache_ttl=PROMPT_CACHE_TTL_SECONDS, client=None):
+        self.api_key = api_key or os.environ.get(API_KEY_ENV)
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.prompt_cache_ttl = prompt_cache_ttl
+        self.feedback_file = feedback_file
+        self.feedback_db_file = feedback_db_file
+        self.report_cache_file = report_cache_file
+        self.asset_store_file = asset_store_file
+        self.job_store_file = job_store_file
+        self.filings_file = filings_file
+        self.filings_dir = filings_dir
+        self.history_dir = history_dir
+        self.logo_file = os.path.abspath(logo_file)
+        # Finished request records; pass trace_log_file=None to keep them in memory only
+        self.trace_log = TraceLog(trace_log_file)
+        # Identical report requests in flight at the same time share one Gemini call
+        self.inflight = SingleFlight()
+        self._lock = threading.Lock()
+        self._resources = {}
+        if client is not None:
+            # e.g. lucror.fake_genai.FakeGenaiClient for offline runs
+            self._resources["client"] = client
+
+    def _resource(self, name, factory):
+        resource = self._resources.get(name)
+        if resource is None:
+            with self._lock:
+                resource = self._resources.get(name)
+                if resource is None:
+                    resource = self._resources[name] = factory()
+        return resource
+
+    @property
+    def client(self):
+        def make_client():
+            from google import genai
+
+            if not self.api_key:
+                raise RuntimeError(f"No Gemini API key: set {API_KEY_ENV}")
+            return genai.Client(api_key=self.api_key)
+        return self._resource("client", make_client)
+
+    @property
+    def prompt_cache(self):
+        """Server-side cache of the static prompt prefix (None when disabled)."""
+        if not self.prompt_cache_ttl:
+            return None
+        return self._resource("prompt_cache", lambda: PromptCache(
+            REPORT_PROMPT_PREFIX, REPORT_PROMPT_VERSION, tools=report_tools(), ttl_seconds=self.prompt_cache_ttl))
+
+    @property
+    def corrections(self):
+        return self._resource("corrections", lambda: CorrectionsStore(self.feedback_db_file, legacy_json_path=self.feedback_file))
+
+    @property
+    def report_cache(self):
+        return self._resource("report_cache", lambda: ReportCache(self.report_cache_file))
+
+    @property
+    def assets(self):
+        return self._resource("assets", lambda: CompanyAssetStore(self.asset_store_file))
+
+    @property
+    def filings(self):
+        """Statement lines of the filings ingested from disk (see lucror.filings)."""
+        return self._resource("filings", lambda: FilingsStore(self.filings_file))
+
+    @property
+    def history(self):
+        """Financial Summaries of past reports, queryable without the markdown (None when disabled)."""
+        if self.history_dir is None:
+            return None
+        return self._resource("history", lambda: ReportHistory(self.history_dir))
+
+    @property
+    def jobs(self):
+        """Background report jobs (workers start on first use)."""
+        return self._resource("jobs", lambda: JobQueue(self.job_store_file, self._run_report_job))
+
+    @property
+    def pdf_pool(self):
+        def make_pool():
+            from lucror.pdf_pool import PdfRenderPool
+
+            return PdfRenderPool(self.logo_file)
+        return self._resource("pdf_pool", make_pool)
+
+    def close(self):
+        """Stops the PDF and job workers; stores and client need no explicit shutdown."""
+        pool = self._resources.pop("pdf_pool", None)
+        if pool is not None:
+            pool.shutdown()
+        jobs = self._resources.pop("jobs", None)
+        if jobs is not None:
+            jobs.close()
+
+    # --- FEEDBACK ---
+    def store_feedback(self, ticker, item, year, value, comment):
+        self.corrections.store(ticker, item, year, value, comment)
+
+    def get_feedback_corrections(self, ticker):
+        return self.corrections.get_ticker(ticker)
+
+    def build_report_prompt(self, ticker):
+        return build_report_prompt(ticker, self.get_feedback_corrections(ticker), self.get_filing_context(ticker))
+
+    # --- LOCAL FILINGS ---
+    def ingest_filing(self, path, ticker=None, form=None):
+        """Indexes a downloaded 10-K / 20-F; returns `(ticker, statement lines found)`.
+
+        The ticker's cached reports are dropped, so the next one is written from the filing.
+        """
+        ticker, count = self.filings.ingest(path, ticker=ticker, form=form)
+        if count:
+            self.report_cache.invalidate_ticker(ticker)
+        return ticker, count
+
+    def store_filing(self, file_name, data, ticker=None, form=None):
+        """Saves an uploaded filing under `filings_dir` and indexes it, like `ingest_filing`."""
+        os.makedirs(self.filings_dir, exist_ok=True)
+        path = os.path.join(self.filings_dir, os.path.basename(file_name))
+        with open(path, "wb") as f:
+            f.write(data)
+        return self.ingest_filing(path, ticker=ticker, form=form)
+
+    def get_filing_context(self, ticker):
+        """The ticker's indexed statement lines as a prompt block ("" if no filing is on file)."""
+        with stage("filings_lookup") as attrs:
+            context = self.filings.context(ticker)
+            attrs["found"] = bool(context)
+        return context
+
+    # --- COMPANY ASSETS ---
+    def get_company_domain(self, ticker):
+        """Official website domain (cached per ticker) to ensure the logo is accurate."""
+        return self.assets.get_domain(ticker)
+
+    def get_company_logo_src(self, ticker):
+        """Cached company logo as a base64 data URI ("" if there is none)."""
+        return self.assets.get_logo_data_uri(ticker)
+
+    # --- REPORTS ---
+    def generate_company_report(self, ticker, on_retry=None, on_text=None):
+        """Calls Gemini (with Google Search) for a fresh report.
+
+        Returns the response, or an "Error: ..." string. `on_retry(message)` is told
+        about retries, `on_text(text_so_far)` turns on streaming. Blocking wrapper
+        around `generate_company_report_async`.
+        """
+        with trace("generate", self.trace_log, ticker=ticker):
+            return run_sync(self.generate_company_report_async(ticker, on_retry=on_retry, on_text=on_text))
+
+    async def generate_company_report_async(self, ticker, on_retry=None, on_text=None):
+        """Async generation under `self.retry_policy`.
+
+        Overloaded (5xx), rate-limited (429) and timed-out calls are retried with
+        full-jitter backoff inside the policy's latency budget, falling back to the
+        faster model when the budget runs low or the primary model's (process-wide)
+        circuit breaker is open (`response.model_version` tells which one answered).
+        The static prompt prefix is referenced from the model's cached content when
+        there is one; otherwise (or if the cache vanished) the full prompt is sent.
+        """
+        with stage("build_prompt"):
+            suffix = build_report_suffix(ticker, self.get_feedback_corrections(ticker), self.get_filing_context(ticker))
+        return await self._generate_async(suffix, REPORT_PROMPT_PREFIX, on_retry=on_retry, on_text=on_text)
+
+    async def _generate_async(self, prompt, cached_prefix=None, on_retry=None, on_text=None):
+        """One grounded generation of `prompt` under the retry policy.
+
+        With `cached_prefix` (REPORT_PROMPT_PREFIX) the prompt is what follows the
+        prefix, which is taken from the prompt cache when it is available.
+        """
+        from google.genai import types
+
+        client = self.client
+        prompt_cache = self.prompt_cache if cached_prefix is not None else None
+        suffix = prompt
+        attempts = 0
+
+        async def call_model(model, cache_name):
+            if cache_name:
+                # Tools and the instructions come from the cache
+                prompt, config = suffix, types.GenerateContentConfig(cached_content=cache_name)
+            else:
+                prompt, config = (cached_prefix or "") + suffix, types.GenerateContentConfig(tools=report_tools())
+            if on_text:
+                # Streaming mode: the caller renders the text while it arrives
+                return await stream_report_response(client, model, prompt, config, on_text)
+            return await client.aio.models.generate_content(
+                model=model,
+                contents=prompt,
+                config=config
+            )
+
+        async def attempt(model):
+            nonlocal attempts
+            attempts += 1
+            annotate(attempts=attempts, model=model)
+            cache_name = None
+            if prompt_cache is not None:
+                with stage("prompt_cache", model=model) as cache_attrs:
+                    cache_name = await prompt_cache.cache_name_async(client, model)
+                    cache_attrs["cached"] = bool(cache_name)
+            with stage("gemini_call", model=model, attempt=attempts, streamed=bool(on_text)):
+                try:
+                    response = await call_model(model, cache_name)
+                except Exception as e:
+                    if not (cache_name and is_cache_miss(e)):
+                        raise
+                    # Expired or deleted under us: answer uncached now, recreate it next time
+                    prompt_cache.invalidate(model)
+                    response = await call_model(model, None)
+            record_usage(response, model=model, attempt=attempts)
+            # Streamed responses may lack it; callers use it to tell a fallback-model answer
+            response.model_version = response.model_version or model
+            return response
+
+        async def wait(delay):
+            import asyncio
+
+            with stage("retry_wait", seconds=round(delay, 2)):
+                await asyncio.sleep(delay)
+
+        try:
+            response, model = await call_with_retry(
+                attempt,
+                self.retry_policy,
+                primary_model=MODEL_NAME,
+                on_retry=(lambda message, info: on_retry(message)) if on_retry else None,
+                sleep=wait,
+            )
+        except Exception as e:
+            annotate(error=str(e)[:500])
+            return f"Error: {e}"
+        annotate(model=model)
+        return response
+
+    def get_company_report(self, ticker, force_refresh=False, on_retry=None, on_text=None):
+        """Returns the cached report for `ticker` or generates (and caches) a new one.
+
+        The result is a dict with `report_text`, `grounding_metadata`, `from_cache`,
+        `created_at`, `model` and `corrections_applied` (see `apply_corrections`), or
+        an "Error: ..." string like `generate_company_report`.
+
+        Reports are cached as the model wrote them and the ticker's stored
+        corrections are applied whenever one is served, so a new correction shows
+        up at once instead of requiring a new generation.
+        """
+        with trace("report", self.trace_log, ticker=ticker, force_refresh=force_refresh):
+            cache = self.report_cache
+            with stage("cache_lookup"):
+                key = make_cache_key(ticker, REPORT_PROMPT_TEMPLATE)
+                entry = None if force_refresh else cache.get(key)
+
+            if entry is not None:
+                from google.genai import types
+
+                annotate(from_cache=True)
+                metadata = entry["grounding_metadata"]
+                return self._with_corrections(ticker, {
+                    "report_text": entry["report_text"],
+                    "grounding_metadata": types.GroundingMetadata.model_validate(metadata) if metadata else None,
+                    "from_cache": True,
+                    "created_at": entry["created_at"],
+                    "model": None,
+                })
+
+            annotate(from_cache=False)
+
+            def waiting():
+                annotate(coalesced=True)
+                if on_retry:
+                    on_retry(f"⏳ A report for {ticker} is already being generated; waiting for it.")
+
+            # Keyed like the cache (ticker + prompt): concurrent requests for the
+            # same report wait for the first one's call instead of paying for their own
+            with stage("generate_or_wait"):
+                report, _shared = self.inflight.do(
+                    key, lambda: self._generate_and_store(ticker, key, on_retry, on_text), on_wait=waiting
+                )
+            if isinstance(report, str):
+                annotate(error=report[:500])
+                return report
+            return self._with_corrections(ticker, dict(report))
+
+    def _with_corrections(self, ticker, report):
+        """`report` with the ticker's stored corrections written into its Financial Summary."""
+        with stage("apply_corrections") as attrs:
+            report["report_text"], report["corrections_applied"] = apply_corrections(
+                report["report_text"], self.get_feedback_corrections(ticker)
+            )
+            attrs["cells"] = len(report["corrections_applied"])
+        return report
+
+    def _generate_and_store(self, ticker, key, on_retry=None, on_text=None):
+        response_obj = self.generate_company_report(ticker, on_retry=on_retry, on_text=on_text)
+        if isinstance(response_obj, str):
+            return response_obj
+
+        try:
+            metadata = response_obj.candidates[0].grounding_metadata
+        except:
+            metadata = None
+
+        # The model only extracts the raw inputs; margins, FOCF, Net Debt and ratios are computed here
+        with stage("derive_rows"):
+            report_text = complete_financial_summary(response_obj.text)
+
+        fallback = self.retry_policy.fallback_model
+        answered_by_fallback = bool(fallback) and fallback in (response_obj.model_version or "")
+        # A fallback-model report is served once but not cached, so the next request tries the full model again
+        with stage("cache_store", skipped=answered_by_fallback):
+            if not answered_by_fallback:
+                self.report_cache.put(
+                    key,
+                    ticker,
+                    report_text,
+                    metadata.model_dump(mode="json", exclude_none=True) if metadata else None
+                )
+        self._record_history(ticker, report_text, response_obj.model_version)
+        return {
+            "report_text": report_text,
+            "grounding_metadata": metadata,
+            "from_cache": False,
+            "created_at": time.time(),
+            # May be the fallback model when the primary one was overloaded
+            "model": response_obj.model_version,
+        }
+
+    def _record_history(self, ticker, report_text, model):
+        """Appends the report's Financial Summary to the history; a failure there never fails the report."""
+        if self.history is None:
+            return
+        with stage("history") as attrs:
+            try:
+                attrs["cells"] = self.history.record(ticker, report_text, model=model)
+            except Exception as e:
+                annotate(error=f"{type(e).__name__}: {e}")
+
+    def regenerate_section(self, ticker, report_text, section, on_retry=None, on_text=None):
+        """Refreshes one section of `report_text` with a focused prompt; the other sections are kept as they are.
+
+        `section` is one of REPORT_SECTIONS; a new Financial Summary also replaces
+        its rows' Data Source Dictionary entries and gets its derived rows
+        recomputed. Returns a dict like `get_company_report`'s (`report_text` is the
+        whole spliced report, `grounding_metadata` covers the new section only) or
+        an "Error: ..." string. When `report_text` is the cached report (as served,
+        with the stored corrections applied, or not) the section is spliced into
+        the cached text and the cache is updated; corrections are only ever
+        applied to the copy returned.
+        """
+        from lucror.sections import (
+            FINANCIAL_SUMMARY, parse_section_response, replace_appendix_entries, splice_section,
+        )
+
+        with trace("section_refresh", self.trace_log, ticker=ticker, section=section):
+            if section not in SECTION_RULES:
+                return f"Error: unknown section {section!r}"
+            with stage("build_prompt"):
+                prompt = build_section_prompt(ticker, section, report_text, self.get_feedback_corrections(ticker),
+                                              self.get_filing_context(ticker) if section == "Financial Summary" else "")
+            with stage("generate"):
+                # No cached prefix: the section prompt is small and does not share it
+                response_obj = run_sync(self._generate_async(prompt, on_retry=on_retry, on_text=on_text))
+            if isinstance(response_obj, str):
+                return response_obj
+
+            try:
+                metadata = response_obj.candidates[0].grounding_metadata
+            except:
+                metadata = None
+
+            # The cache holds the model's text and corrections are applied when serving, so a refresh of
+            # the cached report (shown with its corrections) is spliced into the cached text itself
+            key = make_cache_key(ticker, REPORT_PROMPT_TEMPLATE)
+            entry = self.report_cache.get(key)
+            cached = entry is not None and report_text in (
+                entry["report_text"], self._with_corrections(ticker, dict(entry))["report_text"]
+            )
+            base_text = entry["report_text"] if cached else report_text
+
+            with stage("splice"):
+                try:
+                    section_text, entries = parse_section_response(section, response_obj.text or "")
+                    new_text = splice_section(base_text, section, section_text)
+                except ValueError as e:
+                    annotate(error=str(e))
+                    return f"Error: could not refresh the {section} section ({e})."
+                if section == FINANCIAL_SUMMARY:
+                    new_text = complete_financial_summary(replace_appendix_entries(new_text, entries))
+
+            fallback = self.retry_policy.fallback_model
+            answered_by_fallback = bool(fallback) and fallback in (response_obj.model_version or "")
+            with stage("cache_store"):
+                # Only a refresh of the cached report itself replaces it (sources of the full run are kept)
+                updated = cached and not answered_by_fallback
+                if updated:
+                    self.report_cache.put(key, ticker, new_text, entry["grounding_metadata"])
+                annotate(cache_updated=updated)
+            if section == FINANCIAL_SUMMARY:
+                self._record_history(ticker, new_text, response_obj.model_version)
+
+            return self._with_corrections(ticker, {
+                "report_text": new_text,
+                "section": section,
+                "grounding_metadata": metadata,
+                "from_cache": False,
+                "created_at": time.time(),
+                "model": response_obj.model_version,
+            })
+
+    # --- BACKGROUND JOBS ---
+    def _run_report_job(self, job, set_status, on_text):
+        section = job.params.get("section")
+        if section:
+            report = self.regenerate_section(job.ticker, job.params["report_text"], section, on_retry=set_status)
+            return report if isinstance(report, str) else report_to_json(report)
+        report = self.get_company_report(
+            job.ticker, force_refresh=job.params.get("force_refresh", False), on_retry=set_status,
+            on_text=on_text if job.params.get("stream") else None
+        )
+        return report if isinstance(report, str) else report_to_json(report)
+
+    def submit_report(self, ticker, force_refresh=False, stream=False):
+        """Queues `get_company_report` on a background worker; returns the job id.
+
+        `stream=True` keeps the partial text available from `jobs.partial_text(job_id)`.
+        """
+        return self.jobs.submit(ticker, force_refresh=force_refresh, stream=stream)
+
+    def submit_section_refresh(self, ticker, report_text, section):
+        """Queues `regenerate_section` on a background worker; returns the job id."""
+        return self.jobs.submit(ticker, section=section, report_text=report_text)
+
+    def get_report_job(self, job_id):
+        """The job (None if unknown); a finished job's `result` is a report dict like `get_company_report`'s."""
+        job = self.jobs.get(job_id)
+        if job is not None and job.result is not None:
+            job.result = self._with_corrections(job.ticker, report_from_json(job.result))
+        return job
+
+    def latest_report_job(self, ticker):
+        """The most recent finished report job for `ticker`, with its report (None if there is none)."""
+        job = self.jobs.latest(ticker)
+        if job is not None:
+            # Corrections stored since the job finished apply as well
+            job.result = self._with_corrections(job.ticker, report_from_json(job.result))
+        return job
+
+    # --- EXPORTS ---
+    def create_excel(self, markdown_content, ticker):
+        with trace("excel_export", self.trace_log, ticker=ticker):
+            return create_excel(markdown_content, ticker)
+
+    def create_pdf(self, markdown_content, ticker, timeout=None):
+        """PDF bytes (None if xhtml2pdf reports an error); raises PdfRenderError on timeout or worker failure."""
+        with trace("pdf_export", self.trace_log, ticker=ticker):
+            # 1. Get Company Logo (cached bytes, embedded the same way as the Lucror logo)
+            with stage("company_assets"):
+                company_img_src = self.get_company_logo_src(ticker)
+
+            # 2. Clean up and convert to HTML here, render in a worker process
+            html_text = markdown_to_pdf_html(markdown_content)
+            with stage("pdf_render"):
+                return self.pdf_pool.render(html_text, company_img_src, timeout=timeout)
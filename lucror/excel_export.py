@@ -0,0 +1,100 @@
+"""Formatted Excel output for cleaned Financial Summary frames."""
+
+import re
+
+ROW_AMOUNT = "amount"
+ROW_PERCENT = "percent"
+ROW_MULTIPLE = "multiple"
+
+BASE_FONT = {'font_name': 'Arial', 'font_size': 10}
+FORMATS = {
+    "header": {'bold': True, 'bottom': 2, 'bg_color': '#F2F2F2', **BASE_FONT},
+    "item": {'bold': True, **BASE_FONT},
+    # Number formats
+    ROW_AMOUNT: {'num_format': '#,##0;(#,##0)', **BASE_FONT},
+    ROW_PERCENT: {'num_format': '0.0%', **BASE_FONT},
+    ROW_MULTIPLE: {'num_format': '0.00"x"', **BASE_FONT},
+    "text": dict(BASE_FONT),
+}
+
+ITEM_COLUMN_WIDTH = 30
+DATA_COLUMN_WIDTH = 15
+
+_INVALID_SHEET_CHARS = re.compile(r"[\[\]:*?/\\]")
+
+
+def classify_rows(items):
+    """Number format per row, decided once from the item name.
+
+    "EBITDA Margin" / anything with "%" -> percent, "Net Leverage" / "Coverage" -> multiple,
+    everything else -> amount.
+    """
+    import pandas as pd
+
+    names = pd.Series(list(items), dtype=object).astype(str).str.lower()
+    kinds = pd.Series(ROW_AMOUNT, index=names.index, dtype=object)
+    kinds[names.str.contains("leverage|coverage", regex=True)] = ROW_MULTIPLE
+    kinds[names.str.contains("margin", regex=False) | names.str.contains("%", regex=False)] = ROW_PERCENT
+    return kinds.tolist()
+
+
+def sheet_name(name, taken=()):
+    """Excel-safe, unique sheet name (31 chars max, no []:*?/\\)."""
+    base = _INVALID_SHEET_CHARS.sub("_", str(name)).strip("'")[:31] or "Sheet"
+    candidate, n = base, 1
+    while candidate.lower() in {t.lower() for t in taken}:
+        n += 1
+        suffix = f" ({n})"
+        candidate = base[:31 - len(suffix)] + suffix
+    return candidate
+
+
+def write_financial_workbook(target, sheets, constant_memory=False):
+    """Writes one formatted sheet per cleaned frame.
+
+    `target` is a path or a binary file object, `sheets` maps sheet name -> frame
+    (Item names first, values as returned by `clean_financial_frame`). Rows are
+    classified once and written whole with shared, precomputed formats, strictly
+    top to bottom, so `constant_memory=True` can flush each row to disk and keep
+    memory flat for workbooks with hundreds of sheets.
+    """
+    import xlsxwriter
+
+    workbook = xlsxwriter.Workbook(target, {
+        'constant_memory': constant_memory,
+        'in_memory': not constant_memory,
+        # A NaN/inf cell becomes an Excel error value instead of failing the export
+        'nan_inf_to_errors': True,
+    })
+    formats = {name: workbook.add_format(spec) for name, spec in FORMATS.items()}
+    try:
+        written = []
+        for name, df in sheets.items():
+            worksheet = workbook.add_worksheet(sheet_name(name, written))
+            written.append(worksheet.get_name())
+            _write_sheet(worksheet, df, formats)
+    finally:
+        workbook.close()
+
+
+def _write_sheet(worksheet, df, formats):
+    columns = [str(c) for c in df.columns]
+
+    # Apply Column Widths
+    worksheet.set_column(0, 0, ITEM_COLUMN_WIDTH) # Item Column
+    if len(columns) > 1:
+        worksheet.set_column(1, len(columns) - 1, DATA_COLUMN_WIDTH) # Data Columns
+
+    # Apply Header Format
+    worksheet.write_row(0, 0, columns, formats["header"])
+
+    items = df.iloc[:, 0].tolist()
+    values = df.iloc[:, 1:].to_numpy(dtype=object).tolist()
+    for row_idx, (item, kind, row) in enumerate(zip(items, classify_rows(items), values), start=1):
+        worksheet.write(row_idx, 0, item, formats["item"])
+        if all(isinstance(val, (int, float)) for val in row):
+            worksheet.write_row(row_idx, 1, row, formats[kind])
+            continue
+        # Mixed row ("N/A" next to numbers): numbers keep the row format, text gets the plain one
+        for col_idx, val in enumerate(row, start=1):
+            worksheet.write(row_idx, col_idx, val, formats[kind] if isinstance(val, (int, float)) else formats["text"])
@@ -0,0 +1,301 @@
+"""An offline stand-in for `google.genai.Client`, for trying the report pipeline without an API key.
+
+Covers what lucror uses: `models.generate_content`, `generate_content_stream`
+and `caches.create/get/list/update/delete`, both sync and under `.aio`, and
+`models.count_tokens`. Cached
+contents expire after their TTL; requests that reference one report its tokens
+as `cached_content_token_count`, as the real API does. Every call is appended
+to `client.calls`. Answers come from `respond(ticker, prompt)`, a canned report
+with the raw Financial Summary rows by default.
+"""
+
+import itertools
+import re
+import threading
+import time
+from datetime import datetime, timezone
+
+FAKE_MODEL_PREFIX = "offline-sample/"
+TICKER_RE = re.compile(r"Input:\s*(\S+)\s*Output:\s*$")
+
+
+def estimate_tokens(text):
+    # ~4 characters a token, runs of whitespace (the prompt's indentation) counting as one
+    return max(1, len(" ".join(text.split())) // 4)
+
+
+def canned_report(ticker, prompt=None):
+    """A small, well-formed report in the format the prompt asks for."""
+    return f"""# **{ticker} Inc.**
+
+| Agency | Rating |
+| :--- | :--- |
+| **Moody's:** | Baa2 (stable) |
+| **S&P:** | BBB (stable) |
+| **Fitch:** | BBB (stable) |
+
+*Source: Offline sample data.*
+
+### Description
+{ticker} is a sample company used for offline runs.
+
+*Source: Offline sample data.*
+
+**Key Management & Contact:**
+* **CEO:** Jane Doe
+* **CFO:** John Roe
+* **Investor Relations:** Email : ir@example.com
+
+### Financial Summary
+*In USD mn*
+
+| Item | FY2022 | FY2023 | FY2024 |
+| :--- | :--- | :--- | :--- |
+| **Revenue** | 18,320 | 22,809 | 28,995 |
+| **EBITDA** | 2,050 | 2,500 | 3,400 |
+| **Net cash provided by operating activities (OCF)** | 1,100 | 1,500 | 2,000 |
+| **(-) Acquisition of PP&E and intangible assets** | (1,000) | (1,200) | (1,300) |
+| **Finance debt** | 5,600 | 5,500 | 5,300 |
+| **Lease liabilities** | 400 | 450 | 500 |
+| **Adjusted cash and cash equivalents** | 1,500 | 1,750 | 2,000 |
+
+*Source: Offline sample data (not audited).*
+
+### Key Credit Drivers
+**Strengths:**
+* **Sample:** Offline placeholder.
+
+*Source: Offline sample data.*
+
+### Appendix
+**Data Source Dictionary**
+* **Revenue**: Source Document: Offline sample, Raw Value: 28,995, Logic: Canned value.
+"""
+
+
+def _not_found(name):
+    from google.genai import errors
+
+    return errors.ClientError(404, {"error": {"code": 404, "message": f"CachedContent not found: {name}",
+                                              "status": "NOT_FOUND"}})
+
+
+def _prompt_text(contents):
+    if isinstance(contents, str):
+        return contents
+    parts = []
+    for content in contents if isinstance(contents, list) else [contents]:
+        if isinstance(content, str):
+            parts.append(content)
+        else:
+            parts.extend(part.text or "" for part in content.parts or [])
+    return "".join(parts)
+
+
+class _State:
+    def __init__(self, respond, min_cache_tokens, clock):
+        self.respond = respond
+        self.min_cache_tokens = min_cache_tokens
+        self.clock = clock
+        self.calls = []
+        self.caches = {}
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+
+
+class _Models:
+    def __init__(self, state):
+        self._state = state
+
+    def _response(self, model, contents, config):
+        from google.genai import types
+
+        state = self._state
+        prompt = _prompt_text(contents)
+        cached_tokens = 0
+        cached_name = getattr(config, "cached_content", None)
+        with state.lock:
+            state.calls.append(("generate_content", model, cached_name))
+            if cached_name:
+                cached = state.caches.get(cached_name)
+                if cached is None or cached.expire_time.timestamp() <= state.clock():
+                    state.caches.pop(cached_name, None)
+                    raise _not_found(cached_name)
+                cached_tokens = cached.usage_metadata.total_token_count
+        ticker = TICKER_RE.search(prompt.strip() + "\n")
+        text = state.respond(ticker.group(1) if ticker else "SAMPLE", prompt)
+        output_tokens = estimate_tokens(text)
+        prompt_tokens = estimate_tokens(prompt) + cached_tokens
+        return types.GenerateContentResponse(
+            candidates=[types.Candidate(content=types.Content(role="model", parts=[types.Part(text=text)]))],
+            usage_metadata=types.GenerateContentResponseUsageMetadata(
+                prompt_token_count=prompt_tokens,
+                cached_content_token_count=cached_tokens or None,
+                candidates_token_count=output_tokens,
+                total_token_count=prompt_tokens + output_tokens,
+            ),
+            # Never the real model's name, so sample answers cannot pass for Gemini output
+            model_version=f"{FAKE_MODEL_PREFIX}{model}",
+        )
+
+    def generate_content(self, *, model, contents, config=None):
+        return self._response(model, contents, config)
+
+    def count_tokens(self, *, model, contents, config=None):
+        from google.genai import types
+
+        with self._state.lock:
+            self._state.calls.append(("count_tokens", model, None))
+        return types.CountTokensResponse(total_tokens=estimate_tokens(_prompt_text(contents)))
+
+    def generate_content_stream(self, *, model, contents, config=None):
+        from google.genai import types
+
+        response = self._response(model, contents, config)
+        lines = response.text.splitlines(keepends=True)
+        for i, line in enumerate(lines):
+            last = i == len(lines) - 1
+            yield types.GenerateContentResponse(
+                candidates=[types.Candidate(content=types.Content(role="model", parts=[types.Part(text=line)]))],
+                usage_metadata=response.usage_metadata if last else None,
+                model_version=response.model_version,
+            )
+
+
+class _Caches:
+    def __init__(self, state):
+        self._state = state
+
+    def _ttl_seconds(self, config):
+        ttl = getattr(config, "ttl", None) or "3600s"
+        return float(ttl.rstrip("s"))
+
+    def create(self, *, model, config=None):
+        from google.genai import errors, types
+
+        state = self._state
+        text = _prompt_text(config.contents or []) + (_prompt_text(config.system_instruction)
+                                                       if config.system_instruction else "")
+        tokens = estimate_tokens(text)
+        minimum = state.min_cache_tokens
+        if minimum is None:
+            from lucror.prompt_cache import MIN_CACHE_TOKENS
+
+            minimum = MIN_CACHE_TOKENS.get(model, 0)
+        with state.lock:
+            state.calls.append(("caches.create", model, config.display_name))
+            if tokens < minimum:
+                raise errors.ClientError(400, {"error": {
+                    "code": 400, "status": "INVALID_ARGUMENT",
+                    "message": f"Cached content is too small. total_token_count={tokens}, "
+                               f"min_total_token_count={minimum}"}})
+            now = state.clock()
+            cached = types.CachedContent(
+                name=f"cachedContents/fake{next(state.ids)}",
+                display_name=config.display_name,
+                model=f"models/{model}",
+                create_time=datetime.fromtimestamp(now, timezone.utc),
+                update_time=datetime.fromtimestamp(now, timezone.utc),
+                expire_time=datetime.fromtimestamp(now + self._ttl_seconds(config), timezone.utc),
+                usage_metadata=types.CachedContentUsageMetadata(total_token_count=tokens),
+            )
+            state.caches[cached.name] = cached
+            return cached
+
+    def _live(self, name):
+        cached = self._state.caches.get(name)
+        if cached is None or cached.expire_time.timestamp() <= self._state.clock():
+            self._state.caches.pop(name, None)
+            raise _not_found(name)
+        return cached
+
+    def get(self, *, name, config=None):
+        with self._state.lock:
+            self._state.calls.append(("caches.get", None, name))
+            return self._live(name)
+
+    def list(self, *, config=None):
+        with self._state.lock:
+            self._state.calls.append(("caches.list", None, None))
+            now = self._state.clock()
+            return [c for c in self._state.caches.values() if c.expire_time.timestamp() > now]
+
+    def update(self, *, name, config=None):
+        state = self._state
+        with state.lock:
+            state.calls.append(("caches.update", None, name))
+            cached = self._live(name)
+            now = state.clock()
+            cached = cached.model_copy(update={
+                "update_time": datetime.fromtimestamp(now, timezone.utc),
+                "expire_time": datetime.fromtimestamp(now + self._ttl_seconds(config), timezone.utc),
+            })
+            state.caches[name] = cached
+            return cached
+
+    def delete(self, *, name, config=None):
+        with self._state.lock:
+            self._state.calls.append(("caches.delete", None, name))
+            self._live(name)
+            del self._state.caches[name]
+
+
+class _AsyncModels:
+    def __init__(self, models):
+        self._models = models
+
+    async def generate_content(self, **kwargs):
+        return self._models.generate_content(**kwargs)
+
+    async def generate_content_stream(self, **kwargs):
+        chunks = list(self._models.generate_content_stream(**kwargs))
+
+        async def stream():
+            for chunk in chunks:
+                yield chunk
+        return stream()
+
+
+class _AsyncCaches:
+    def __init__(self, caches):
+        self._caches = caches
+
+    async def create(self, **kwargs):
+        return self._caches.create(**kwargs)
+
+    async def get(self, **kwargs):
+        return self._caches.get(**kwargs)
+
+    async def list(self, **kwargs):
+        return self._caches.list(**kwargs)
+
+    async def update(self, **kwargs):
+        return self._caches.update(**kwargs)
+
+    async def delete(self, **kwargs):
+        return self._caches.delete(**kwargs)
+
+
+class _Aio:
+    def __init__(self, models, caches):
+        self.models = _AsyncModels(models)
+        self.caches = _AsyncCaches(caches)
+
+
+class FakeGenaiClient:
+    """Offline `genai.Client` look-alike; see the module docstring.
+
+    `min_cache_tokens` mimics the API's minimum cached-content size (creating a
+    smaller cache fails with a 400); by default it is the real model's
+    (prompt_cache.MIN_CACHE_TOKENS). `clock` drives cache expiry in tests.
+    """
+
+    def __init__(self, respond=canned_report, min_cache_tokens=None, clock=time.time):
+        self._state = _State(respond, min_cache_tokens, clock)
+        self.models = _Models(self._state)
+        self.caches = _Caches(self._state)
+        self.aio = _Aio(self.models, self.caches)
+
+    @property
+    def calls(self):
+        return self._state.calls
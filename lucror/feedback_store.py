@@ -0,0 +1,111 @@
+"""Analyst corrections ("permanent feedback"), stored in SQLite and indexed by ticker, item and year."""
+
+import json
+import os
+import threading
+from datetime import datetime
+
+from lucror.storage import LRUCache, connect
+
+
+class CorrectionsStore:
+    """Transactional replacement for the old feedback_store.json.
+
+    Each write touches a single row, so concurrent sessions can no longer
+    overwrite each other's corrections. Per-ticker reads come from an LRU
+    that is invalidated on every write, under the same lock as the reads
+    that fill it. `get_ticker` returns the same shape the JSON file had:
+    {"<item>_<year>": {"correct_value", "comment", "timestamp"}}.
+    """
+
+    def __init__(self, path, legacy_json_path=None, memory_size=256):
+        self._memory = LRUCache(memory_size)
+        self._lock = threading.Lock()
+        self._conn = connect(path)
+        with self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS corrections (
+                    ticker TEXT NOT NULL,
+                    item TEXT NOT NULL,
+                    year TEXT NOT NULL,
+                    correct_value TEXT NOT NULL,
+                    comment TEXT,
+                    timestamp TEXT NOT NULL,
+                    PRIMARY KEY (ticker, item, year)
+                )
+                """
+            )
+        if legacy_json_path and os.path.exists(legacy_json_path):
+            self.migrate_json(legacy_json_path)
+
+    def store(self, ticker, item, year, value, comment):
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M")
+        with self._lock, self._conn:
+            # Upsert (not INSERT OR REPLACE) keeps the rowid, so corrections keep their original order
+            self._conn.execute(
+                """
+                INSERT INTO corrections VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (ticker, item, year) DO UPDATE SET
+                    correct_value = excluded.correct_value,
+                    comment = excluded.comment,
+                    timestamp = excluded.timestamp
+                """,
+                (ticker, item, year, value, comment, timestamp),
+            )
+            self._memory.pop(ticker)
+
+    def get_ticker(self, ticker):
+        cached = self._memory.get(ticker)
+        if cached is not None:
+            return dict(cached)
+
+        # Read and cached under the lock writers invalidate under, so a write in between
+        # cannot be followed by this (older) read landing in the LRU
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM corrections WHERE ticker = ? ORDER BY rowid", (ticker,)
+            ).fetchall()
+            corrections = {
+                f"{row['item']}_{row['year']}": {
+                    "correct_value": row["correct_value"],
+                    "comment": row["comment"],
+                    "timestamp": row["timestamp"],
+                }
+                for row in rows
+            }
+            self._memory.put(ticker, corrections)
+        return dict(corrections)
+
+    def clear_ticker(self, ticker):
+        """Deletes every correction for `ticker`; returns False if there were none."""
+        with self._lock, self._conn:
+            deleted = self._conn.execute("DELETE FROM corrections WHERE ticker = ?", (ticker,)).rowcount
+            self._memory.pop(ticker)
+        return deleted > 0
+
+    def migrate_json(self, json_path):
+        """One-time import of a legacy feedback_store.json; the file is renamed afterwards."""
+        try:
+            with open(json_path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return 0
+
+        rows = []
+        for ticker, entries in data.items():
+            for key, entry in entries.items():
+                # Keys were f"{item}_{year}"; item names may contain underscores, years don't
+                item, _, year = key.rpartition("_")
+                rows.append((ticker, item, year, str(entry.get("correct_value", "")),
+                             entry.get("comment", ""), entry.get("timestamp", "")))
+
+        with self._lock, self._conn:
+            # Entries already in the database win, so re-running the migration is harmless
+            self._conn.executemany("INSERT OR IGNORE INTO corrections VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self._memory.clear()
+        try:
+            os.replace(json_path, json_path + ".migrated")
+        except OSError:
+            pass
+        return len(rows)
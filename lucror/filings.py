@@ -0,0 +1,569 @@
+"""Local store of downloaded 10-K / 20-F filings, indexed by ticker, fiscal year and statement line.
+
+Filings are ingested from disk (EDGAR HTML or inline XBRL, XBRL instances, or
+plain text). Large documents are memory-mapped and scanned with byte-level
+regular expressions, so only the statement tables themselves are ever decoded.
+The indexed lines (income statement, cash flow statement and the balance-sheet
+debt, lease and cash lines) live in SQLite: a report pulls them in
+milliseconds and hands them to the model as grounded context, instead of
+having it search the web for the same filings on every run.
+
+Inline XBRL tags are used when the filing has them (exact concepts, no table
+guessing); otherwise the consolidated statement tables are read by their
+headings. Values are stored in millions, with the sign shown in the filing.
+"""
+
+import hashlib
+import html
+import mmap
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import date
+
+from lucror.metrics import CAPEX, FINANCE_DEBT, LEASE_LIABILITIES, OCF, REVENUE
+from lucror.storage import LRUCache, connect
+
+# Documents at least this large are memory-mapped rather than read
+MMAP_THRESHOLD_BYTES = 1024 * 1024
+# How far after a statement heading its table may start
+TABLE_SEARCH_BYTES = 64 * 1024
+# Plain-text statements: how much text after the heading is scanned
+TEXT_STATEMENT_BYTES = 32 * 1024
+DEFAULT_FISCAL_YEARS = ("FY2022", "FY2023", "FY2024")
+
+# --- STATEMENTS AND LINES ---
+INCOME_STATEMENT = "income_statement"
+CASH_FLOW_STATEMENT = "cash_flow_statement"
+BALANCE_SHEET = "balance_sheet"
+
+# Indexed for the prompt context only (not Financial Summary rows)
+OPERATING_INCOME = "operating_income"
+DEPRECIATION = "depreciation_amortization"
+CASH = "cash"
+
+LINE_LABELS = {
+    REVENUE: "Revenue",
+    OPERATING_INCOME: "Operating income",
+    OCF: "Net cash provided by operating activities (OCF)",
+    DEPRECIATION: "Depreciation and amortization",
+    CAPEX: "(-) Acquisition of PP&E and intangible assets",
+    CASH: "Cash and cash equivalents",
+    FINANCE_DEBT: "Finance debt",
+    LEASE_LIABILITIES: "Lease liabilities",
+}
+
+# Rows whose components are added up (Capex = PP&E + intangibles, debt = current + non-current)
+SUMMED_ROWS = (CAPEX, FINANCE_DEBT, LEASE_LIABILITIES)
+# Rows `raw_inputs` returns; EBITDA and adjusted cash are not statement lines
+RAW_INPUT_ROWS = (REVENUE, OCF, CAPEX, FINANCE_DEBT, LEASE_LIABILITIES)
+
+_SEP = rb"(?:\s|&nbsp;|&#160;|&#xa0;|<[^>]{0,300}>)+"
+STATEMENT_HEADINGS = {
+    INCOME_STATEMENT: re.compile(
+        rb"consolidated" + _SEP + rb"statements?" + _SEP + rb"of" + _SEP
+        + rb"(?:operations|income|earnings|profit" + _SEP + rb"or" + _SEP + rb"loss)", re.IGNORECASE),
+    CASH_FLOW_STATEMENT: re.compile(
+        rb"consolidated" + _SEP + rb"statements?" + _SEP + rb"of" + _SEP + rb"cash" + _SEP + rb"flows?", re.IGNORECASE),
+    BALANCE_SHEET: re.compile(
+        rb"consolidated" + _SEP + rb"(?:balance" + _SEP + rb"sheets?|statements?" + _SEP + rb"of" + _SEP
+        + rb"financial" + _SEP + rb"position)", re.IGNORECASE),
+}
+
+# statement -> [(row, component, label pattern)], best match first within a (row, component)
+LINE_PATTERNS = {
+    INCOME_STATEMENT: [
+        (REVENUE, "total", r"total (net )?(revenues?|sales( and revenues)?|net sales|operating revenues)"),
+        (REVENUE, "total", r"(net )?(revenues?|sales|sales revenues|net operating revenues|sales and revenues)"),
+        (OPERATING_INCOME, "total", r"(operating (income|profit)|income from operations)( \(loss\))?"),
+    ],
+    CASH_FLOW_STATEMENT: [
+        (OCF, "total", r"net cash\b.*\boperating activities"),
+        (OCF, "total", r"cash flows? (provided by|from|generated (by|from)) operating activities"),
+        (DEPRECIATION, "total", r"depreciation\b.*\bamorti[sz]ation.*"),
+        (CAPEX, "ppe", r"(capital (expenditures|spending)|(purchases?|acquisitions?|additions?|payments?|investments?) "
+                       r"(of|to|for|in) (property|pp&e|fixed assets|plant|tangible)).*"),
+        (CAPEX, "intangibles", r"(purchases?|acquisitions?|additions?|payments?|investments?) (of|to|for|in) "
+                               r"intangible.*"),
+    ],
+    BALANCE_SHEET: [
+        (CASH, "total", r"cash and cash equivalents"),
+        (FINANCE_DEBT, "debt", r"(short-term|long-term|current|non-?current)? ?(portion of )?(finance )?"
+                               r"(debt|borrowings|notes payable)( payable within one year)?(,? (net|less|excluding).*)?"),
+        (FINANCE_DEBT, "debt", r"current portion of long-term (debt|borrowings).*"),
+        (LEASE_LIABILITIES, "lease", r"(current |non-?current )?(operating |finance )?lease liabilit(y|ies)"
+                                     r"(,? (current|non-?current).*)?"),
+    ],
+}
+_COMPILED_PATTERNS = {
+    statement: [(row, component, re.compile(pattern + "$")) for row, component, pattern in patterns]
+    for statement, patterns in LINE_PATTERNS.items()
+}
+
+# Inline XBRL / XBRL concepts -> (statement, row, component); debt and leases keep current and non-current apart
+XBRL_CONCEPTS = {
+    "us-gaap:Revenues": (INCOME_STATEMENT, REVENUE, "total"),
+    "us-gaap:RevenueFromContractWithCustomerExcludingAssessedTax": (INCOME_STATEMENT, REVENUE, "total"),
+    "ifrs-full:Revenue": (INCOME_STATEMENT, REVENUE, "total"),
+    "us-gaap:OperatingIncomeLoss": (INCOME_STATEMENT, OPERATING_INCOME, "total"),
+    "ifrs-full:ProfitLossFromOperatingActivities": (INCOME_STATEMENT, OPERATING_INCOME, "total"),
+    "us-gaap:NetCashProvidedByUsedInOperatingActivities": (CASH_FLOW_STATEMENT, OCF, "total"),
+    "ifrs-full:CashFlowsFromUsedInOperatingActivities": (CASH_FLOW_STATEMENT, OCF, "total"),
+    "us-gaap:DepreciationDepletionAndAmortization": (CASH_FLOW_STATEMENT, DEPRECIATION, "total"),
+    "ifrs-full:DepreciationAndAmortisationExpense": (CASH_FLOW_STATEMENT, DEPRECIATION, "total"),
+    "us-gaap:PaymentsToAcquirePropertyPlantAndEquipment": (CASH_FLOW_STATEMENT, CAPEX, "ppe"),
+    "ifrs-full:PurchaseOfPropertyPlantAndEquipmentClassifiedAsInvestingActivities": (CASH_FLOW_STATEMENT, CAPEX, "ppe"),
+    "us-gaap:PaymentsToAcquireIntangibleAssets": (CASH_FLOW_STATEMENT, CAPEX, "intangibles"),
+    "ifrs-full:PurchaseOfIntangibleAssetsClassifiedAsInvestingActivities": (CASH_FLOW_STATEMENT, CAPEX, "intangibles"),
+    "us-gaap:CashAndCashEquivalentsAtCarryingValue": (BALANCE_SHEET, CASH, "total"),
+    "ifrs-full:CashAndCashEquivalents": (BALANCE_SHEET, CASH, "total"),
+    "us-gaap:DebtCurrent": (BALANCE_SHEET, FINANCE_DEBT, "debt_current"),
+    "us-gaap:LongTermDebtNoncurrent": (BALANCE_SHEET, FINANCE_DEBT, "debt_noncurrent"),
+    "ifrs-full:CurrentBorrowingsAndCurrentPortionOfNoncurrentBorrowings": (BALANCE_SHEET, FINANCE_DEBT, "debt_current"),
+    "ifrs-full:NoncurrentPortionOfNoncurrentBorrowings": (BALANCE_SHEET, FINANCE_DEBT, "debt_noncurrent"),
+    "us-gaap:OperatingLeaseLiabilityCurrent": (BALANCE_SHEET, LEASE_LIABILITIES, "operating_current"),
+    "us-gaap:OperatingLeaseLiabilityNoncurrent": (BALANCE_SHEET, LEASE_LIABILITIES, "operating_noncurrent"),
+    "us-gaap:FinanceLeaseLiabilityCurrent": (BALANCE_SHEET, LEASE_LIABILITIES, "finance_current"),
+    "us-gaap:FinanceLeaseLiabilityNoncurrent": (BALANCE_SHEET, LEASE_LIABILITIES, "finance_noncurrent"),
+    "ifrs-full:CurrentLeaseLiabilities": (BALANCE_SHEET, LEASE_LIABILITIES, "lease_current"),
+    "ifrs-full:NoncurrentLeaseLiabilities": (BALANCE_SHEET, LEASE_LIABILITIES, "lease_noncurrent"),
+}
+# Cash outflows are tagged as positive amounts; the statements show them negative
+_OUTFLOW_ROWS = (CAPEX,)
+
+_CONCEPT_ALTERNATION = b"|".join(re.escape(name.encode()) for name in XBRL_CONCEPTS)
+IX_FACT_RE = re.compile(rb"<ix:nonFraction\b([^>]*\bname=\"(?:" + _CONCEPT_ALTERNATION + rb")\"[^>]*)>(.*?)</ix:nonFraction>",
+                        re.IGNORECASE | re.DOTALL)
+XBRL_FACT_RE = re.compile(rb"<(" + _CONCEPT_ALTERNATION + rb")\b([^>]*)>([^<]*)</\1>")
+CONTEXT_RE = re.compile(rb"<(?:xbrli:)?context\b[^>]*\bid=\"([^\"]+)\"[^>]*>(.*?)</(?:xbrli:)?context>",
+                        re.IGNORECASE | re.DOTALL)
+ATTRIBUTE_RE = re.compile(rb"([\w:.-]+)\s*=\s*\"([^\"]*)\"")
+DATE_RE = re.compile(rb"<(?:xbrli:)?(startDate|endDate|instant)>\s*(\d{4})-(\d{2})-(\d{2})\s*<", re.IGNORECASE)
+
+TABLE_ROW_RE = re.compile(rb"<tr\b.*?</tr>", re.IGNORECASE | re.DOTALL)
+TABLE_CELL_RE = re.compile(rb"<t[dh]\b[^>]*>(.*?)</t[dh]>", re.IGNORECASE | re.DOTALL)
+TAG_RE = re.compile(r"<[^>]+>")
+SCALE_RE = re.compile(rb"in\s+(thousands|millions|billions)", re.IGNORECASE)
+YEAR_RE = re.compile(r"^(?:fy\s?)?((?:19|20)\d{2})$", re.IGNORECASE)
+AMOUNT_RE = re.compile(r"^\(?-?\$?\s*\(?[\d,]+(?:\.\d+)?\)?$")
+# EDGAR names primary documents "<ticker>-<period end>.htm", e.g. f-20241231.htm
+EDGAR_NAME_RE = re.compile(r"^([a-z][a-z.]*)-(\d{4})(\d{4})(?:x10k|x20f)?\.(?:htm|html|xml|txt)$", re.IGNORECASE)
+
+_SCALES = {b"thousands": 1e-3, b"millions": 1.0, b"billions": 1e3}
+
+
+@dataclass
+class StatementLine:
+    ticker: str
+    fiscal_year: str
+    statement: str
+    row: str
+    component: str
+    label: str
+    value: float
+    source: str
+    offset: int
+
+
+# --- READING ---
+@contextmanager
+def open_document(path):
+    """The file's bytes: memory-mapped when it is large (slicing then only copies the slice)."""
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < MMAP_THRESHOLD_BYTES:
+            yield f.read()
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped
+
+
+def parse_amount(text):
+    """Statement cell -> float ("(1,300)" -> -1300.0, "—" -> 0.0), None if it is not an amount."""
+    text = text.strip().replace("$", "").replace(" ", "")
+    if text in ("—", "–", "-"):
+        return 0.0
+    if not AMOUNT_RE.match(text) or not any(c.isdigit() for c in text):
+        return None
+    negative = text.startswith(("(", "-")) or text.endswith(")")
+    value = float(text.strip("()-").replace(",", ""))
+    return -value if negative else value
+
+
+def _normalize_label(text):
+    text = html.unescape(text).replace("’", "'").replace("\xa0", " ").lower()
+    # Footnote markers and note references: "(a)", "[1]", "(Note 4)"
+    text = re.sub(r"\((?:[a-z]|\d{1,2}|notes? [\w ,&-]+)\)|\s*\[\d+\]|[:*]", "", text)
+    return re.sub(r"\s+", " ", text).strip(" ,")
+
+
+def _cell_text(raw):
+    return re.sub(r"\s+", " ", html.unescape(TAG_RE.sub(" ", raw.decode("utf-8", "replace")))).strip()
+
+
+def _merge_cells(cells):
+    """EDGAR tables put "$", ")" and "%" in cells of their own; fold them back into the amounts."""
+    merged = []
+    for cell in cells:
+        if cell in ("", "$"):
+            continue
+        if cell in (")", "%", ")%") and merged:
+            merged[-1] += cell
+        else:
+            merged.append(cell)
+    return merged
+
+
+def _fiscal_year(year):
+    return f"FY{year}"
+
+
+# --- STATEMENT TABLES ---
+def _match_line(statement, label):
+    for priority, (row, component, pattern) in enumerate(_COMPILED_PATTERNS[statement]):
+        if pattern.match(label):
+            return row, component, priority
+    return None
+
+
+def _read_table(statement, rows, scale):
+    """[(offset, cells)] of one statement table -> [(row, component, label, year, value, offset)].
+
+    The first row made of years gives the columns. Within a (row, component)
+    the best-ranked pattern wins; balance-sheet lines count as current while
+    between "Current liabilities" and its total, unless the label says otherwise.
+    """
+    years = None
+    best = {}
+    in_current = False
+    for offset, cells in rows:
+        cells = _merge_cells(cells)
+        if not cells:
+            continue
+        if years is None:
+            found = [YEAR_RE.match(cell.replace(",", "")) for cell in cells]
+            if any(found) and all(m or parse_amount(c) is None for m, c in zip(found, cells)):
+                years = [_fiscal_year(m.group(1)) for m in found if m]
+            continue
+        label = _normalize_label(cells[0])
+        if label in ("current liabilities", "current liabilities and equity"):
+            in_current = True
+        elif label.startswith("total current liabilities"):
+            in_current = False
+        amounts = [parse_amount(cell) for cell in cells[1:]]
+        amounts = [a for a in amounts if a is not None]
+        if len(amounts) < len(years):
+            continue
+        match = _match_line(statement, label)
+        if match is None:
+            continue
+        row, component, priority = match
+        if statement == BALANCE_SHEET and row in (FINANCE_DEBT, LEASE_LIABILITIES):
+            current = ("current" in label and "non-current" not in label and "noncurrent" not in label) \
+                or "short-term" in label or "within one year" in label or in_current
+            component = f"{component}_{'current' if current else 'noncurrent'}"
+            key = (row, component, label)
+        else:
+            key = (row, component)
+        if key in best and best[key][0] <= priority:
+            continue
+        values = amounts[-len(years):]
+        best[key] = (priority, [(row, component, cells[0], year, value * scale, offset)
+                                for year, value in zip(years, values)])
+    return [line for _priority, lines in best.values() for line in lines]
+
+
+def _html_tables(buf, statement):
+    """Lines of the first table after a `statement` heading that yields any (the table of contents yields none)."""
+    for heading in STATEMENT_HEADINGS[statement].finditer(buf):
+        start = buf.find(b"<table", heading.end(), heading.end() + TABLE_SEARCH_BYTES)
+        if start == -1:
+            continue
+        end = buf.find(b"</table>", start)
+        end = len(buf) if end == -1 else end
+        scale_match = SCALE_RE.search(buf, heading.start(), start)
+        scale = _SCALES[scale_match.group(1).lower()] if scale_match else 1.0
+        table = buf[start:end]
+        rows = [(start + row.start(), [_cell_text(cell) for cell in TABLE_CELL_RE.findall(row.group())])
+                for row in TABLE_ROW_RE.finditer(table)]
+        lines = _read_table(statement, rows, scale)
+        if lines:
+            return lines
+    return []
+
+
+def _text_tables(buf, statement):
+    """Plain-text statements: columns are separated by runs of spaces."""
+    for heading in STATEMENT_HEADINGS[statement].finditer(buf):
+        end = min(len(buf), heading.end() + TEXT_STATEMENT_BYTES)
+        scale_match = SCALE_RE.search(buf, heading.start(), end)
+        scale = _SCALES[scale_match.group(1).lower()] if scale_match else 1.0
+        rows = []
+        offset = heading.end()
+        for line in buf[heading.end():end].split(b"\n"):
+            rows.append((offset, re.split(r"\s{2,}|\t", line.decode("utf-8", "replace").strip())))
+            offset += len(line) + 1
+        lines = _read_table(statement, rows, scale)
+        if lines:
+            return lines
+    return []
+
+
+# --- XBRL ---
+def _attributes(raw):
+    return {name.decode().lower(): value.decode() for name, value in ATTRIBUTE_RE.findall(raw)}
+
+
+def _annual_contexts(buf):
+    """Context id -> fiscal year, for consolidated (no dimension) annual periods and instants."""
+    contexts = {}
+    for match in CONTEXT_RE.finditer(buf):
+        body = match.group(2)
+        if b"segment" in body.lower() or b"scenario" in body.lower():
+            continue
+        dates = {kind.decode().lower(): date(int(y), int(m), int(d)) for kind, y, m, d in DATE_RE.findall(body)}
+        end = dates.get("enddate") or dates.get("instant")
+        if end is None:
+            continue
+        if "startdate" in dates and (end - dates["startdate"]).days < 300:
+            continue
+        contexts[match.group(1).decode()] = _fiscal_year(end.year)
+    return contexts
+
+
+def _xbrl_value(attributes, text):
+    value = parse_amount(text) if text.strip() else None
+    if value is None:
+        return None
+    value *= 10 ** int(attributes.get("scale", "0") or 0)
+    if attributes.get("sign") == "-":
+        value = -value
+    return value / 1e6
+
+
+def _xbrl_facts(buf):
+    """Facts of the indexed concepts, from inline XBRL (HTML) or an XBRL instance."""
+    contexts = _annual_contexts(buf)
+    if not contexts:
+        return []
+    facts = {}
+    for match in IX_FACT_RE.finditer(buf):
+        attributes = _attributes(match.group(1))
+        facts.setdefault((attributes.get("name"), attributes.get("contextref")),
+                         (attributes, _cell_text(match.group(2)), match.start()))
+    if not facts:
+        for match in XBRL_FACT_RE.finditer(buf):
+            attributes = _attributes(match.group(2))
+            facts.setdefault((match.group(1).decode(), attributes.get("contextref")),
+                             (attributes, match.group(3).decode(), match.start()))
+
+    lines = []
+    for (name, context), (attributes, text, offset) in facts.items():
+        year = contexts.get(context)
+        value = _xbrl_value(attributes, text)
+        if year is None or value is None:
+            continue
+        statement, row, component = XBRL_CONCEPTS[name]
+        if row in _OUTFLOW_ROWS:
+            value = -abs(value)
+        lines.append((statement, row, component, name, year, value, offset))
+    return lines
+
+
+def extract_statement_lines(buf):
+    """(statement, row, component, label, fiscal year, value in millions, byte offset) of one document."""
+    facts = _xbrl_facts(buf)
+    if any(row in RAW_INPUT_ROWS for _statement, row, *_rest in facts):
+        return facts
+    head = buf[:65536].lower()
+    read = _html_tables if b"<table" in head or b"<html" in head else _text_tables
+    return [(statement, *line) for statement in STATEMENT_HEADINGS for line in read(buf, statement)]
+
+
+def edgar_document_info(path):
+    """(ticker, fiscal year) from an EDGAR primary document name (f-20241231.htm -> ("F", "FY2024")), else (None, None)."""
+    match = EDGAR_NAME_RE.match(os.path.basename(path))
+    if match is None:
+        return None, None
+    return match.group(1).upper(), _fiscal_year(match.group(2))
+
+
+def _format_amount(value):
+    text = f"{abs(value):,.0f}" if abs(value - round(value)) < 0.05 else f"{abs(value):,.1f}"
+    return f"({text})" if value < 0 else text
+
+
+class FilingsStore:
+    """Ticker -> indexed statement lines of the filings ingested from disk (SQLite, LRU in front).
+
+    Re-ingesting a file replaces its lines; when several filings cover the same
+    fiscal year (a 10-K also shows the two prior years) the newest filing wins,
+    as restated figures should.
+    """
+
+    def __init__(self, path, memory_size=128):
+        self._memory = LRUCache(memory_size)
+        self._lock = threading.Lock()
+        self._conn = connect(path)
+        with self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS filings (
+                    filing_id TEXT PRIMARY KEY,
+                    ticker TEXT NOT NULL,
+                    form TEXT,
+                    fiscal_year TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    ingested_at REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS statement_lines (
+                    filing_id TEXT NOT NULL,
+                    ticker TEXT NOT NULL,
+                    fiscal_year TEXT NOT NULL,
+                    statement TEXT NOT NULL,
+                    row TEXT NOT NULL,
+                    component TEXT NOT NULL,
+                    label TEXT NOT NULL,
+                    value REAL NOT NULL,
+                    offset INTEGER NOT NULL
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_lines_ticker ON statement_lines (ticker, fiscal_year)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_lines_filing ON statement_lines (filing_id)")
+
+    def ingest(self, path, ticker=None, form=None):
+        """Indexes one filing; returns `(ticker, number of statement lines found)` (nothing is stored if 0).
+
+        `ticker` defaults to the one in an EDGAR document name. Raises ValueError
+        when there is none.
+        """
+        name_ticker, name_year = edgar_document_info(path)
+        ticker = (ticker or name_ticker or "").upper()
+        if not ticker:
+            raise ValueError(f"no ticker given for {path} (and the file name is not an EDGAR document name)")
+
+        digest = hashlib.sha256()
+        with open_document(path) as buf:
+            digest.update(buf)
+            lines = extract_statement_lines(buf)
+            size = len(buf)
+        if not lines:
+            return ticker, 0
+        filing_id = digest.hexdigest()
+        fiscal_year = name_year or max(line[4] for line in lines)
+        source = os.path.basename(path)
+
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM statement_lines WHERE filing_id = ?", (filing_id,))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO filings VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (filing_id, ticker, form, fiscal_year, source, size, time.time()),
+            )
+            self._conn.executemany(
+                "INSERT INTO statement_lines VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(filing_id, ticker, year, statement, row, component, label, value, offset)
+                 for statement, row, component, label, year, value, offset in lines],
+            )
+            self._memory.pop(ticker)
+        return ticker, len(lines)
+
+    def lines(self, ticker, fiscal_years=None):
+        """StatementLines of `ticker` (one filing per fiscal year and line: the newest), statement order."""
+        ticker = ticker.upper()
+        cached = self._memory.get(ticker)
+        if cached is None:
+            with self._lock:
+                rows = self._conn.execute(
+                    """
+                    SELECT l.*, f.path AS source FROM statement_lines l JOIN filings f USING (filing_id)
+                    WHERE l.ticker = ? ORDER BY f.fiscal_year DESC, f.ingested_at DESC, l.offset
+                    """,
+                    (ticker,),
+                ).fetchall()
+                cached, seen = [], set()
+                for row in rows:
+                    key = (row["fiscal_year"], row["row"], row["component"], row["label"])
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    cached.append(StatementLine(ticker, row["fiscal_year"], row["statement"], row["row"],
+                                                row["component"], row["label"], row["value"], row["source"],
+                                                row["offset"]))
+                # Under the lock `ingest` invalidates under, so an older read never replaces a newer one
+                self._memory.put(ticker, cached)
+        if fiscal_years is None:
+            return list(cached)
+        return [line for line in cached if line.fiscal_year in fiscal_years]
+
+    def raw_inputs(self, ticker, fiscal_years=DEFAULT_FISCAL_YEARS):
+        """{row id: {fiscal year: value in millions}} for the Financial Summary inputs the statements show.
+
+        Components are added up (Capex = PP&E + intangibles, debt and leases =
+        current + non-current), and so are the lines of a component ("Short-term
+        borrowings" + "Current portion of long-term debt"). A component is taken
+        from one filing only, the newest that has it; other rows are one line.
+        """
+        values, sources, counted = {}, {}, set()
+        for line in self.lines(ticker, fiscal_years):
+            if line.row not in RAW_INPUT_ROWS:
+                continue
+            summed = line.row in SUMMED_ROWS
+            key = (line.row, line.fiscal_year, line.component if summed else None)
+            # lines() is newest filing first
+            if sources.setdefault(key, line.source) != line.source:
+                continue
+            if not summed and key in counted:
+                continue
+            counted.add(key)
+            row = values.setdefault(line.row, {})
+            row[line.fiscal_year] = row.get(line.fiscal_year, 0.0) + line.value
+        return values
+
+    def context(self, ticker, fiscal_years=DEFAULT_FISCAL_YEARS):
+        """Prompt block with the ticker's indexed lines ("" when no filing is on file)."""
+        lines = self.lines(ticker, fiscal_years)
+        if not lines:
+            return ""
+        grouped = {}
+        for line in lines:
+            label = line.label
+            if line.component.endswith("_current"):
+                label += ", current"
+            elif line.component.endswith("_noncurrent"):
+                label += ", non-current"
+            grouped.setdefault((line.row, label, line.statement, line.source), {})[line.fiscal_year] = line.value
+        out = [
+            "\n### LOCAL FILING DATA (MANDATORY TO USE):",
+            "These lines were read from the company's own annual filings (values in millions, in the "
+            "filing's currency, signs as shown).",
+            "Use them for the Financial Summary instead of searching for these figures, and cite the file "
+            "as the Source Document. Search only for what is not listed here (e.g. EBITDA).",
+        ]
+        for (row, label, statement, source), by_year in sorted(grouped.items(), key=lambda item: list(LINE_LABELS).index(item[0][0])):
+            cells = "; ".join(f"{year}: {_format_amount(by_year[year])}" for year in fiscal_years if year in by_year)
+            out.append(f"- {LINE_LABELS[row]} — \"{label}\" ({statement.replace('_', ' ')}, {source}): {cells}")
+        # Rows made of several lines, added up once here rather than by the model
+        totals = self.raw_inputs(ticker, fiscal_years)
+        for row in SUMMED_ROWS:
+            if row in totals:
+                cells = "; ".join(f"{year}: {_format_amount(totals[row][year])}" for year in fiscal_years if year in totals[row])
+                out.append(f"- {LINE_LABELS[row]} — total of the lines above (use this figure): {cells}")
+        return "\n".join(out)
+
+    def remove_ticker(self, ticker):
+        """Forgets every filing of `ticker`; returns False if there were none."""
+        ticker = ticker.upper()
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM statement_lines WHERE ticker = ?", (ticker,))
+            deleted = self._conn.execute("DELETE FROM filings WHERE ticker = ?", (ticker,)).rowcount
+            self._memory.pop(ticker)
+        return deleted > 0
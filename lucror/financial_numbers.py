@@ -0,0 +1,178 @@
+"""Turns the Financial Summary's display strings ("1,200", "(350)", "11.2%", "2.2x", "-") into numbers."""
+
+UNIT_AMOUNT = "amount"
+UNIT_PERCENT = "percent"
+UNIT_MULTIPLE = "multiple"
+UNIT_TEXT = "text"
+# Index = unit code used by the array version
+_UNITS = (UNIT_AMOUNT, UNIT_MULTIPLE, UNIT_PERCENT, UNIT_TEXT)
+
+# Up to this many cells a plain loop beats the Arrow set-up (one report column is ~12)
+SCALAR_MAX_CELLS = 1000
+# What str.strip() removes; Arrow's own whitespace trim also keeps "\x1c".."\x1f"
+_WHITESPACE = "".join(c for c in map(chr, range(0x110000)) if c.isspace())
+# "1,200", "(350)", "11.2%", "(4.5%)", "2.2x": dropping the commas and trimming "()%xX" off the
+# ends cleans these exactly as clean_financial_num does and leaves what float() reads. Anything
+# else ("-", "N/A", "1_000", "(350") goes through clean_financial_num itself
+_NUMBER = r"[+-]?(\d[\d,]*\.?[\d,]*|\.,*\d[\d,]*)([eE][+-]?\d+)?"
+_PLAIN_CELL = rf"^(\({_NUMBER}[%xX]?\)|{_NUMBER})[%xX]?$"
+
+
+def clean_financial_num(val):
+    """Scalar reference implementation; `clean_financial_series` returns the same values."""
+    if not isinstance(val, str): return val
+    val = val.strip()
+    if val == "-": return 0
+
+    # Detect formats
+    is_percent = "%" in val
+
+    # Remove artifacts
+    clean = val.replace(',', '').replace('%', '').replace('x', '').replace('X', '')
+
+    # Handle Parentheses for negatives: (1,200) -> -1200
+    if '(' in clean and ')' in clean:
+        clean = clean.replace('(', '').replace(')', '')
+        sign = -1
+    else:
+        sign = 1
+
+    try:
+        num = float(clean) * sign
+        if is_percent: return num / 100
+        return num
+    except ValueError:
+        return val # Return original text if not a number
+
+
+def _clean_strings(strings):
+    """`clean_financial_num` over a sequence of strings -> (values, unit codes, [(positions, text)])."""
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    text = pc.utf8_trim(pa.array(strings, type=pa.string()), _WHITESPACE)
+    plain = pc.match_substring_regex(text, _PLAIN_CELL)
+
+    # One cast for the plain cells (Arrow rounds exactly as float() does)
+    clean = pc.utf8_trim(pc.replace_substring(text, ",", ""), "()%xX")
+    numbers = pc.cast(pc.if_else(plain, clean, pa.scalar(None, pa.string())), pa.float64())
+    numbers = numbers.to_numpy(zero_copy_only=False)
+    is_percent = pc.match_substring(text, "%").to_numpy(zero_copy_only=False)
+    has_x = pc.or_(pc.match_substring(text, "x"), pc.match_substring(text, "X")).to_numpy(zero_copy_only=False)
+    values = np.where(pc.starts_with(text, "(").to_numpy(zero_copy_only=False), -numbers, numbers)
+    values = np.where(is_percent, values / 100, values)
+    codes = np.where(is_percent, _UNITS.index(UNIT_PERCENT), has_x * _UNITS.index(UNIT_MULTIPLE)).astype(np.int8)
+
+    # The rest once per distinct string; report columns repeat "-", "N/A", "n.m." a lot
+    rest = np.flatnonzero(~plain.to_numpy(zero_copy_only=False))
+    groups = {}
+    for pos, val in zip(rest.tolist(), text.take(rest).to_pylist()):
+        groups.setdefault(val, []).append(pos)
+    texts = []
+    for val, where in groups.items():
+        value = clean_financial_num(val)
+        codes[where] = _UNITS.index(_unit(val, value))
+        if isinstance(value, str):
+            values[where] = np.nan
+            texts.append((where, value))
+        else:
+            values[where] = value
+    return values, codes, texts
+
+
+def _unit(val, value):
+    """Unit label of one cell, given its `clean_financial_num` value."""
+    if isinstance(val, str):
+        if isinstance(value, str):
+            return UNIT_TEXT
+        if "%" in val:
+            return UNIT_PERCENT
+        if "x" in val or "X" in val:
+            return UNIT_MULTIPLE
+        return UNIT_AMOUNT
+    return UNIT_AMOUNT if isinstance(val, (int, float)) and val == val else UNIT_TEXT
+
+
+def _clean_small(series):
+    """`clean_financial_series` for a few cells, one `clean_financial_num` call each."""
+    import numpy as np
+    import pandas as pd
+
+    raw = series.tolist()
+    values = [clean_financial_num(val) for val in raw]
+    units = np.array([_unit(val, value) for val, value in zip(raw, values)], dtype=object)
+    if all(type(val) is str for val in raw) and not any(isinstance(value, str) for value in values):
+        values = np.array(values, dtype=np.float64)
+    else:
+        # "-" is 0.0 here, as in the array version
+        out = np.empty(len(raw), dtype=object)
+        out[:] = [0.0 if type(val) is str and value == 0 and val.strip() == "-" else value
+                  for val, value in zip(raw, values)]
+        values = out
+    return (
+        pd.Series(values, index=series.index, name=series.name, dtype=values.dtype, copy=False),
+        pd.Series(units, index=series.index, name=series.name, dtype=object, copy=False),
+    )
+
+
+def clean_financial_series(series):
+    """Vectorized `clean_financial_num` over a Series.
+
+    Returns `(values, units)`: `values` is float64 when every cell parsed (object
+    dtype, with the stripped original text kept, when some did not), `units`
+    labels each cell as amount / percent / multiple / text. Number-shaped strings
+    are cleaned with Arrow string kernels and parsed with one cast, the others
+    with `clean_financial_num`, so values match the scalar version. Short columns
+    just loop.
+    """
+    import numpy as np
+    import pandas as pd
+
+    if len(series) <= SCALAR_MAX_CELLS:
+        return _clean_small(series)
+
+    raw = series.to_numpy(dtype=object)
+    if pd.api.types.infer_dtype(raw, skipna=False) == "string":
+        values, codes, texts = _clean_strings(raw)
+    else:
+        is_str = np.fromiter((type(v) is str for v in raw), dtype=bool, count=len(raw))
+        values = np.full(len(raw), np.nan)
+        codes = np.full(len(raw), _UNITS.index(UNIT_TEXT), dtype=np.int8)
+        texts = []
+        if is_str.any():
+            positions = np.flatnonzero(is_str)
+            values[positions], codes[positions], texts = _clean_strings(raw[positions])
+            texts = [(positions[where], text) for where, text in texts]
+
+        # Non-string cells are left untouched
+        values = values.astype(object)
+        for pos in np.flatnonzero(~is_str):
+            value = values[pos] = raw[pos]
+            if isinstance(value, (int, float)) and value == value:
+                codes[pos] = _UNITS.index(UNIT_AMOUNT)
+
+    if texts:
+        # Return original text if not a number
+        values = values.astype(object)
+        for where, text in texts:
+            values[where] = text
+
+    units = np.array(_UNITS, dtype=object)[codes]
+    return (
+        pd.Series(values, index=series.index, name=series.name, dtype=values.dtype, copy=False),
+        pd.Series(units, index=series.index, name=series.name, dtype=object, copy=False),
+    )
+
+
+def clean_financial_frame(df, label_columns=1):
+    """Cleans every column after the first `label_columns` (the Item names).
+
+    Returns `(values_df, units_df)` with the same shape, index and columns as `df`;
+    label columns are copied unchanged into both.
+    """
+    values = df.copy()
+    units = df.copy()
+    for col in df.columns[label_columns:]:
+        values[col], units[col] = clean_financial_series(df[col])
+    return values, units
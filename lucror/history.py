@@ -0,0 +1,187 @@
+"""Columnar history of generated Financial Summaries (Parquet, partitioned by ticker and generation date).
+
+Every generated report's table is stored as one row per (item, fiscal year)
+cell, cleaned to numbers once at write time, with the report's Financial
+Summary footnote, currency and model version. Queries ("Net Leverage above
+3x in FY2024") are Arrow filter expressions pushed down to the dataset:
+partitions outside the requested tickers/dates are never opened, and row
+groups are skipped on their column statistics, so no markdown is re-parsed.
+"""
+
+import hashlib
+import os
+import re
+import threading
+import time
+from datetime import datetime, timezone
+
+from lucror.metrics import row_id
+from lucror.report_parser import parse_report
+
+PARTITION_COLUMNS = ["ticker", "generated_on"]
+# Listing the dataset's files is about half of a query; reports written by other
+# processes (the CLI, another app server) show up after at most this long
+DISCOVERY_TTL_SECONDS = 30
+CURRENCY_RE = re.compile(r"^\*?\s*In\s+([A-Za-z]{3})\b[^*]*\*?$", re.IGNORECASE)
+
+
+def history_schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ("ticker", pa.string()),
+        ("generated_on", pa.string()),
+        ("report_id", pa.string()),
+        ("created_at", pa.timestamp("s", tz="UTC")),
+        ("model", pa.string()),
+        ("item", pa.string()),
+        ("row", pa.string()),
+        ("fiscal_year", pa.string()),
+        ("value", pa.float64()),
+        ("unit", pa.string()),
+        ("raw", pa.string()),
+        ("currency", pa.string()),
+        ("source", pa.string()),
+    ])
+
+
+def summary_records(ticker, report_text, model=None, created_at=None):
+    """Columns (dict of lists) for the report's Financial Summary cells; None if it has no table.
+
+    All cells are cleaned in one `clean_financial_series` call (percentages as
+    fractions, multiples as plain numbers; text cells keep `value` empty).
+    """
+    import pandas as pd
+
+    from lucror.financial_numbers import clean_financial_series
+
+    doc = parse_report(report_text)
+    table = doc.table
+    if table is None or not table.rows:
+        return None
+
+    created_at = created_at or time.time()
+    moment = datetime.fromtimestamp(created_at, timezone.utc)
+    footnotes = doc.footnotes.get("Financial Summary") or []
+    currency = next((m.group(1).upper() for line in (doc.pre_table_text or "").splitlines()[-3:]
+                     if (m := CURRENCY_RE.match(line.strip()))), None)
+
+    items, rows, years, cells = [], [], [], []
+    for row in table.rows:
+        for year, cell in zip(table.years, row[1:]):
+            items.append(row[0])
+            rows.append(row_id(row[0]))
+            years.append(year)
+            cells.append(cell)
+    values, units = clean_financial_series(pd.Series(cells, dtype=object))
+    values = pd.to_numeric(pd.Series(values), errors="coerce")
+    count = len(cells)
+    ticker = ticker.upper()
+    return {
+        "ticker": [ticker] * count,
+        "generated_on": [moment.strftime("%Y-%m-%d")] * count,
+        "report_id": [hashlib.sha256(f"{ticker}\x1f{report_text}".encode("utf-8")).hexdigest()[:16]] * count,
+        "created_at": [moment.replace(microsecond=0)] * count,
+        "model": [model] * count,
+        "item": items,
+        "row": rows,
+        "fiscal_year": years,
+        "value": [None if v != v else float(v) for v in values.tolist()],
+        "unit": list(units),
+        "raw": cells,
+        "currency": [currency] * count,
+        "source": [footnotes[0] if footnotes else None] * count,
+    }
+
+
+class ReportHistory:
+    """Append-only Parquet dataset under `root` (hive layout: ticker=F/generated_on=2025-01-31/...).
+
+    `record` writes one file per report (named after the report, so recording
+    the same text twice on a day rewrites the same file). `query` returns a
+    pandas DataFrame for a pyarrow filter expression; `find` covers the usual
+    "which issuers have metric X above/below Y" question.
+    """
+
+    def __init__(self, root, discovery_ttl=DISCOVERY_TTL_SECONDS):
+        self.root = root
+        self.discovery_ttl = discovery_ttl
+        self._lock = threading.Lock()
+        self._dataset = None
+        self._discovered_at = 0.0
+
+    def record(self, ticker, report_text, model=None, created_at=None):
+        """Stores the report's Financial Summary; returns the number of cells written (0 without a table)."""
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+
+        columns = summary_records(ticker, report_text, model=model, created_at=created_at)
+        if columns is None:
+            return 0
+        table = pa.Table.from_pydict(columns, schema=history_schema())
+        with self._lock:
+            ds.write_dataset(
+                table,
+                self.root,
+                format="parquet",
+                partitioning=PARTITION_COLUMNS,
+                partitioning_flavor="hive",
+                basename_template=f"report-{columns['report_id'][0]}-{{i}}.parquet",
+                existing_data_behavior="overwrite_or_ignore",
+            )
+            self._dataset = None
+        return table.num_rows
+
+    def dataset(self):
+        """The pyarrow dataset (None while nothing has been recorded)."""
+        import pyarrow.dataset as ds
+
+        with self._lock:
+            if self._dataset is None or time.monotonic() - self._discovered_at > self.discovery_ttl:
+                if not os.path.isdir(self.root):
+                    return None
+                self._dataset = ds.dataset(self.root, format="parquet", schema=history_schema(), partitioning="hive")
+                self._discovered_at = time.monotonic()
+            return self._dataset
+
+    def query(self, filter=None, columns=None):
+        """Cells matching `filter` (a pyarrow.compute expression, e.g. `pc.field("row") == "net_leverage"`)."""
+        import pandas as pd
+
+        dataset = self.dataset()
+        if dataset is None:
+            return pd.DataFrame(columns=columns or history_schema().names)
+        return dataset.to_table(filter=filter, columns=columns).to_pandas()
+
+    def find(self, row, fiscal_year=None, above=None, below=None, tickers=None, since=None, latest_only=True):
+        """Cells of canonical row `row` (e.g. metrics.NET_LEVERAGE) within the bounds, newest first.
+
+        `since` ("YYYY-MM-DD") and `tickers` prune partitions. With `latest_only`
+        only each ticker's most recent report counts, so an issuer that has been
+        re-run is judged on its current numbers.
+        """
+        import pyarrow.compute as pc
+
+        condition = pc.field("row") == row
+        if fiscal_year is not None:
+            condition &= pc.field("fiscal_year") == fiscal_year
+        if tickers:
+            condition &= pc.field("ticker").isin([t.upper() for t in tickers])
+        if since is not None:
+            condition &= pc.field("generated_on") >= since
+        if not latest_only:
+            # Bounds can go to the scan directly; with latest_only they apply after picking the reports
+            if above is not None:
+                condition &= pc.field("value") > above
+            if below is not None:
+                condition &= pc.field("value") < below
+
+        cells = self.query(condition).sort_values("created_at", ascending=False, kind="stable")
+        if latest_only and not cells.empty:
+            latest = cells.groupby("ticker", observed=True)["report_id"].transform("first")
+            cells = cells[cells["report_id"] == latest]
+            if above is not None:
+                cells = cells[cells["value"] > above]
+            if below is not None:
+                cells = cells[cells["value"] < below]
+        return cells.reset_index(drop=True)
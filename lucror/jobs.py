@@ -0,0 +1,264 @@
+"""Background report jobs: a SQLite-backed queue drained by worker threads.
+
+Submitting returns a job id at once; the paid Gemini call then runs on a
+worker thread, independent of the Streamlit script run (and session) that
+asked for it. Job rows hold the status, the last progress message and the
+finished result, so a browser refresh can pick a job up again by id, and
+finished reports stay retrievable by ticker. Partial (streamed) text is kept
+in memory only.
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+
+from lucror.storage import connect
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+ACTIVE = (QUEUED, RUNNING)
+
+DEFAULT_WORKERS = 2
+# Finished jobs are pruned after this long
+KEEP_FINISHED_SECONDS = 7 * 24 * 60 * 60
+# Idle workers re-check the table this often (jobs are also signalled on submit)
+POLL_SECONDS = 1.0
+# A running job belongs to the process that claimed it while that process keeps renewing
+# its lease (every third of this); jobs whose lease ran out are queued again
+LEASE_SECONDS = 60.0
+
+
+@dataclass
+class Job:
+    job_id: str
+    ticker: str
+    status: str
+    params: dict = field(default_factory=dict)
+    message: str = None
+    result: dict = None
+    error: str = None
+    created_at: float = None
+    started_at: float = None
+    finished_at: float = None
+
+    @property
+    def active(self):
+        return self.status in ACTIVE
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(
+            job_id=row["job_id"],
+            ticker=row["ticker"],
+            status=row["status"],
+            params=json.loads(row["params"]),
+            message=row["message"],
+            result=json.loads(row["result"]) if row["result"] else None,
+            error=row["error"],
+            created_at=row["created_at"],
+            started_at=row["started_at"],
+            finished_at=row["finished_at"],
+        )
+
+
+class JobQueue:
+    """Persistent queue of per-ticker jobs run by `runner(job, set_status, on_text)`.
+
+    The runner returns a JSON-serializable result; raising or returning an
+    "Error: ..." string fails the job. Submitting a ticker that already has an
+    active job with the same parameters returns that job instead of paying for
+    a second call. Several processes (the app, CLI workers) can share one
+    database: a running job is leased to its process, and only jobs whose lease
+    expired (their process stopped) are queued again. Workers are daemon
+    threads started with the queue.
+    """
+
+    def __init__(self, path, runner, workers=DEFAULT_WORKERS, keep_seconds=KEEP_FINISHED_SECONDS,
+                 poll_seconds=POLL_SECONDS, lease_seconds=LEASE_SECONDS):
+        self.runner = runner
+        self.keep_seconds = keep_seconds
+        self.poll_seconds = poll_seconds
+        self.lease_seconds = lease_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition()
+        self._stop = threading.Event()
+        self._partial = {}
+        self._conn = connect(path)
+        with self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    ticker TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    message TEXT,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    owner TEXT,
+                    lease_until REAL
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_ticker ON jobs (ticker, created_at)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)")
+            self._requeue_expired(time.time())
+        self._threads = [
+            threading.Thread(target=self._work, name=f"report-job-{i}", daemon=True)
+            for i in range(max(1, workers))
+        ] + [threading.Thread(target=self._renew_leases, name="report-job-leases", daemon=True)]
+        for thread in self._threads:
+            thread.start()
+
+    # --- SUBMIT / QUERY ---
+    def submit(self, ticker, **params):
+        """Queues a job (or returns the matching active one) and returns its id."""
+        ticker = ticker.upper()
+        params_json = json.dumps(params, sort_keys=True)
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT job_id FROM jobs WHERE ticker = ? AND params = ? AND status IN (?, ?) "
+                "ORDER BY created_at LIMIT 1",
+                (ticker, params_json, *ACTIVE),
+            ).fetchone()
+            if row is not None:
+                return row["job_id"]
+            job_id = uuid.uuid4().hex
+            self._conn.execute(
+                "INSERT INTO jobs (job_id, ticker, params, status, created_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, ticker, params_json, QUEUED, time.time()),
+            )
+        with self._wakeup:
+            self._wakeup.notify()
+        return job_id
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return Job.from_row(row) if row is not None else None
+
+    def partial_text(self, job_id):
+        """Text streamed so far by a running job (None if it is not streaming)."""
+        return self._partial.get(job_id)
+
+    def latest(self, ticker, status=DONE):
+        """Most recent job for `ticker` with `status` (any status if None)."""
+        query = "SELECT * FROM jobs WHERE ticker = ?"
+        args = [ticker.upper()]
+        if status is not None:
+            query += " AND status = ?"
+            args.append(status)
+        with self._lock:
+            row = self._conn.execute(query + " ORDER BY created_at DESC LIMIT 1", args).fetchone()
+        return Job.from_row(row) if row is not None else None
+
+    def recent(self, limit=20, status=None):
+        """Newest first, without results (cheap listing)."""
+        query = "SELECT job_id, ticker, params, status, message, NULL AS result, error, " \
+                "created_at, started_at, finished_at FROM jobs"
+        args = []
+        if status is not None:
+            query += " WHERE status = ?"
+            args.append(status)
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY created_at DESC LIMIT ?", (*args, limit)).fetchall()
+        return [Job.from_row(row) for row in rows]
+
+    def close(self, timeout=1.0):
+        """Stops the workers after their current job; unfinished jobs resume on the next start."""
+        self._stop.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    # --- WORKERS ---
+    def _requeue_expired(self, now):
+        """Queues the running jobs whose process stopped renewing their lease (call inside a transaction)."""
+        self._conn.execute(
+            "UPDATE jobs SET status = ?, message = ?, owner = NULL, lease_until = NULL "
+            "WHERE status = ? AND (lease_until IS NULL OR lease_until < ?)",
+            (QUEUED, "requeued after its worker stopped", RUNNING, now),
+        )
+
+    def _renew_leases(self):
+        while not self._stop.wait(self.lease_seconds / 3):
+            with self._lock, self._conn:
+                self._conn.execute("UPDATE jobs SET lease_until = ? WHERE owner = ? AND status = ?",
+                                   (time.time() + self.lease_seconds, self.owner, RUNNING))
+
+    def _claim(self):
+        now = time.time()
+        with self._lock, self._conn:
+            self._requeue_expired(now)
+            row = self._conn.execute(
+                "SELECT * FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1", (QUEUED,)
+            ).fetchone()
+            if row is None:
+                return None
+            claimed = self._conn.execute(
+                "UPDATE jobs SET status = ?, started_at = ?, message = NULL, owner = ?, lease_until = ? "
+                "WHERE job_id = ? AND status = ?",
+                (RUNNING, now, self.owner, now + self.lease_seconds, row["job_id"], QUEUED),
+            ).rowcount
+        if not claimed:
+            return None
+        job = Job.from_row(row)
+        job.status = RUNNING
+        return job
+
+    def _update(self, job_id, **columns):
+        assignments = ", ".join(f"{name} = ?" for name in columns)
+        # Only while the job is still ours (a lost lease means another process runs it again)
+        with self._lock, self._conn:
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE job_id = ? AND owner = ?",
+                               (*columns.values(), job_id, self.owner))
+
+    def _finish(self, job_id, status, result=None, error=None):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, lease_until = NULL "
+                "WHERE job_id = ? AND owner = ?",
+                (status, json.dumps(result) if result is not None else None, error, now, job_id, self.owner),
+            )
+            # Opportunistic pruning, as in the report cache
+            self._conn.execute("DELETE FROM jobs WHERE status IN (?, ?) AND finished_at <= ?",
+                               (DONE, FAILED, now - self.keep_seconds))
+        self._partial.pop(job_id, None)
+
+    def _run(self, job):
+        def set_status(message):
+            self._update(job.job_id, message=str(message)[:500])
+
+        def on_text(text_so_far):
+            self._partial[job.job_id] = text_so_far
+
+        try:
+            result = self.runner(job, set_status, on_text)
+        except Exception as e:
+            self._finish(job.job_id, FAILED, error=f"Error: {e}")
+            return
+        if isinstance(result, str) and result.startswith("Error"):
+            self._finish(job.job_id, FAILED, error=result)
+        else:
+            self._finish(job.job_id, DONE, result=result)
+
+    def _work(self):
+        while not self._stop.is_set():
+            job = self._claim()
+            if job is None:
+                with self._wakeup:
+                    self._wakeup.wait(self.poll_seconds)
+                continue
+            self._run(job)
@@ -0,0 +1,339 @@
+"""Derived Financial Summary rows, computed locally from the extracted inputs.
+
+The model only reports the raw inputs (Revenue, EBITDA, OCF, Capex, Finance
+debt, Lease liabilities, Adjusted cash); EBITDA Margin, FOCF, Net Debt, Net
+Leverage and Coverage are computed here, so they are exactly reproducible and
+cost no output tokens. Rows are addressed by canonical ids; `row_id` maps the
+labels found in a report (and their usual spellings) onto them.
+"""
+
+from lucror.report_parser import normalize_item_name, parse_report
+
+# --- CANONICAL ROWS ---
+REVENUE = "revenue"
+EBITDA = "ebitda"
+EBITDA_MARGIN = "ebitda_margin"
+OCF = "ocf"
+CAPEX = "capex"
+FOCF = "focf"
+FINANCE_DEBT = "finance_debt"
+LEASE_LIABILITIES = "lease_liabilities"
+ADJUSTED_CASH = "adjusted_cash"
+NET_DEBT = "net_debt"
+NET_LEVERAGE = "net_leverage"
+COVERAGE = "coverage"
+
+# Financial Summary order, with the labels the reports use
+ROW_LABELS = {
+    REVENUE: "Revenue",
+    EBITDA: "EBITDA",
+    EBITDA_MARGIN: "EBITDA Margin",
+    OCF: "Net cash provided by operating activities (OCF)",
+    CAPEX: "(-) Acquisition of PP&E and intangible assets",
+    FOCF: "FOCF",
+    FINANCE_DEBT: "Finance debt",
+    LEASE_LIABILITIES: "Lease liabilities",
+    ADJUSTED_CASH: "Adjusted cash and cash equivalents",
+    NET_DEBT: "Net Debt",
+    NET_LEVERAGE: "Net Leverage (Net Debt/EBITDA)",
+    COVERAGE: "Coverage (FOCF/Net Debt)",
+}
+
+# Asked from the model
+RAW_ROWS = [REVENUE, EBITDA, OCF, CAPEX, FINANCE_DEBT, LEASE_LIABILITIES, ADJUSTED_CASH]
+
+# Computed here: id -> (inputs, unit, formula as shown in the Appendix)
+DERIVED_ROWS = {
+    EBITDA_MARGIN: ((EBITDA, REVENUE), "percent", "EBITDA / Revenue"),
+    FOCF: ((OCF, CAPEX), "amount", "OCF + (-) Acquisition of PP&E and intangible assets"),
+    NET_DEBT: ((FINANCE_DEBT, LEASE_LIABILITIES, ADJUSTED_CASH), "amount",
+               "Finance debt + Lease liabilities - Adjusted cash and cash equivalents"),
+    NET_LEVERAGE: ((NET_DEBT, EBITDA), "multiple", "Net Debt / EBITDA"),
+    COVERAGE: ((FOCF, NET_DEBT), "multiple", "FOCF / Net Debt"),
+}
+
+# normalize_item_name() of the spellings seen in reports -> row id
+_ALIASES = {
+    "sales revenues": REVENUE,
+    "net operating revenues": REVENUE,
+    "adjusted ebitda": EBITDA,
+    "net cash from operations": OCF,
+    "net cash from operating activities": OCF,
+    "capex": CAPEX,
+    "free operating cash flow": FOCF,
+    "lease liabilities": LEASE_LIABILITIES,
+    "adjusted cash & cash equivalents": ADJUSTED_CASH,
+    "adjusted cash": ADJUSTED_CASH,
+}
+_BY_NAME = {normalize_item_name(label): row for row, label in ROW_LABELS.items()}
+_BY_NAME.update(_ALIASES)
+
+MISSING = "N/A"
+
+
+def _dependents_graph():
+    graph = {}
+    for row, (inputs, _unit, _formula) in DERIVED_ROWS.items():
+        for source in inputs:
+            graph.setdefault(source, []).append(row)
+    return graph
+
+
+# Row -> derived rows computed directly from it (DERIVED_ROWS is in evaluation order)
+DEPENDENTS = _dependents_graph()
+
+
+def row_id(item):
+    """Canonical id of a Financial Summary row label ("**Net Debt**" -> "net_debt"), or None."""
+    return _BY_NAME.get(normalize_item_name(item))
+
+
+def _ratio(numerator, denominator):
+    import numpy as np
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(denominator == 0, np.nan, numerator / denominator)
+
+
+def _outflow(values):
+    import numpy as np
+
+    return np.abs(values)
+
+
+# Derived row -> formula over {row id: array across columns}
+_FORMULAS = {
+    EBITDA_MARGIN: lambda v: _ratio(v[EBITDA], v[REVENUE]),
+    # Capex counts as an outflow whatever its sign
+    FOCF: lambda v: v[OCF] - _outflow(v[CAPEX]),
+    NET_DEBT: lambda v: v[FINANCE_DEBT] + v[LEASE_LIABILITIES] - v[ADJUSTED_CASH],
+    NET_LEVERAGE: lambda v: _ratio(v[NET_DEBT], v[EBITDA]),
+    COVERAGE: lambda v: _ratio(v[FOCF], v[NET_DEBT]),
+}
+
+
+def affected_rows(rows):
+    """Derived rows depending, directly or not, on any of `rows` (row ids), in evaluation order."""
+    seen = set()
+    stack = list(rows)
+    while stack:
+        for dependent in DEPENDENTS.get(stack.pop(), []):
+            if dependent not in seen:
+                seen.add(dependent)
+                stack.append(dependent)
+    return [row for row in DERIVED_ROWS if row in seen]
+
+
+def _derive(row, v, given):
+    """`(values, computed)` of a derived row: the formula where all its inputs are known, `given` elsewhere."""
+    import numpy as np
+
+    computed = np.logical_and.reduce([np.isfinite(v[source]) for source in DERIVED_ROWS[row][0]])
+    return np.where(computed, _FORMULAS[row](v), given), computed
+
+
+def compute_derived_rows(raw):
+    """Derived rows for a DataFrame of extracted rows (index: row ids, columns: anything).
+
+    Columns can be years, or (ticker, year) pairs for many reports at once; every
+    formula is one array operation across all of them. Returns `(derived,
+    computed)`: where an input is missing, the derived value the model gave in
+    `raw` (if any) is kept and used by the rows computed from it, and `computed`
+    is False. Divisions by zero give NaN. Capex counts as an outflow whatever its sign.
+    """
+    import numpy as np
+    import pandas as pd
+
+    rows = RAW_ROWS + list(DERIVED_ROWS)
+    v = dict(zip(rows, raw.reindex(rows).to_numpy(dtype=np.float64, na_value=np.nan)))
+    computed = {}
+    for row in DERIVED_ROWS:
+        v[row], computed[row] = _derive(row, v, v[row])
+
+    def frame(data, dtype):
+        return pd.DataFrame(np.vstack([data[row] for row in DERIVED_ROWS]), index=list(DERIVED_ROWS),
+                            columns=raw.columns, dtype=dtype)
+
+    return frame(v, np.float64), frame(computed, bool)
+
+
+def format_value(value, unit):
+    """Display string in the report's conventions: "1,234", "(350)", "11.2%", "1.68x"."""
+    if value != value:
+        return MISSING
+    if unit == "percent":
+        return f"{value * 100:.1f}%"
+    if unit == "multiple":
+        return f"{value:.2f}x"
+    text = f"{abs(value):,.0f}" if abs(value - round(value)) < 0.05 else f"{abs(value):,.1f}"
+    return f"({text})" if value < 0 else text
+
+
+def raw_inputs(tables):
+    """Canonical rows of several FinancialTables as floats (index: row ids, columns: (key, year)).
+
+    Derived rows the model wrote are included; they stand in where their
+    inputs are missing (see `compute_derived_rows`).
+
+    All cells are cleaned in one `clean_financial_series` call, so the cost is
+    per distinct cell string rather than per report.
+    """
+    import pandas as pd
+
+    from lucror.financial_numbers import clean_financial_series
+
+    keys, rows, years, cells = [], [], [], []
+    for key, table in tables.items():
+        seen = set()
+        for row in table.rows:
+            row_key = row_id(row[0])
+            if row_key is None or row_key in seen:
+                continue
+            seen.add(row_key)
+            for year, cell in zip(table.years, row[1:]):
+                keys.append(key)
+                rows.append(row_key)
+                years.append(year)
+                cells.append(cell)
+    values, _units = clean_financial_series(pd.Series(cells, dtype=object))
+    long = pd.DataFrame({"key": keys, "row": rows, "year": years,
+                         "value": pd.to_numeric(values, errors="coerce").astype("float64")})
+    wide = long.pivot(index="row", columns=["key", "year"], values="value")
+    # Keep each table's own year order (pivot sorts the columns)
+    columns = pd.MultiIndex.from_tuples([(key, year) for key, table in tables.items() for year in table.years])
+    return wide.reindex(index=RAW_ROWS + list(DERIVED_ROWS), columns=columns)
+
+
+def _render_table(table, derived, computed):
+    """Financial Summary lines: canonical rows in order, then any other rows as the model wrote them."""
+    by_id = {}
+    extra = []
+    for row in table.rows:
+        row_key = row_id(row[0])
+        if row_key is None:
+            extra.append(row)
+        else:
+            by_id.setdefault(row_key, row[1:])
+
+    lines = [
+        "| " + " | ".join(table.headers) + " |",
+        "| " + " | ".join(":---" for _ in table.headers) + " |",
+    ]
+    for row_key, label in ROW_LABELS.items():
+        if row_key in DERIVED_ROWS:
+            unit = DERIVED_ROWS[row_key][1]
+            given = by_id.get(row_key)
+            # The model's own cell stays where the inputs to recompute it are missing
+            cells = [format_value(value, unit) if ok or given is None else given[i]
+                     for i, (value, ok) in enumerate(zip(derived.loc[row_key].tolist(), computed.loc[row_key].tolist()))]
+        else:
+            cells = by_id.get(row_key, [MISSING] * len(table.years))
+        lines.append(f"| **{label}** | " + " | ".join(cells) + " |")
+    for row in extra:
+        lines.append(f"| **{row[0]}** | " + " | ".join(row[1:]) + " |")
+    return lines
+
+
+def _derivation_entries():
+    return [f"* **{ROW_LABELS[row]}**: Logic: {formula}, computed from the extracted rows."
+            for row, (_inputs, _unit, formula) in DERIVED_ROWS.items()]
+
+
+def complete_financial_summaries(reports):
+    """{ticker: report text} -> the same reports with their derived rows computed.
+
+    Raw inputs of all reports are cleaned and computed in one pass. The
+    table is rewritten in canonical order (derived cells the model wrote anyway
+    are replaced where their inputs are all there), and the formulas are added to the Data Source Dictionary so
+    the audit trail covers every row. Reports without a Financial Summary, or
+    without any raw input row, are returned unchanged.
+    """
+    tables = {}
+    for ticker, text in reports.items():
+        table = parse_report(text).table
+        # Repeated year headers cannot be told apart, so such tables are left as they are
+        if (table is not None and len(set(table.years)) == len(table.years)
+                and any(row_id(item) in RAW_ROWS for item in table.items)):
+            tables[ticker] = table
+    if not tables:
+        return dict(reports)
+
+    derived, computed = compute_derived_rows(raw_inputs(tables))
+
+    completed = dict(reports)
+    for ticker, table in tables.items():
+        lines = reports[ticker].split("\n")
+        last_line = max(table.line_numbers, default=table.header_line + 1)
+        lines[table.header_line:last_line + 1] = _render_table(table, derived[ticker], computed[ticker])
+        text = "\n".join(lines)
+        entries = _derivation_entries()
+        marker = text.find("**Data Source Dictionary**")
+        if marker != -1 and entries[0] not in text:
+            end = text.find("\n", marker)
+            end = len(text) if end == -1 else end
+            text = text[:end] + "\n" + "\n".join(entries) + text[end:]
+        completed[ticker] = text
+    return completed
+
+
+def complete_financial_summary(markdown_content):
+    """`complete_financial_summaries` for a single report."""
+    return complete_financial_summaries({"": markdown_content})[""]
+
+
+def recompute_dependents(markdown_content, items):
+    """Rewrites the derived cells that depend on the edited rows `items` (labels), nothing else.
+
+    Inputs are read from the table as it is, derived rows included (an edited
+    Net Debt feeds Net Leverage and Coverage), and each affected row is computed
+    across all year columns at once. Edited rows are never overwritten, nor are
+    cells whose inputs are missing from the table. Returns
+    `(text, changed)`, `changed` mapping the label of each rewritten row to its
+    new cells (one per year).
+    """
+    import numpy as np
+    import pandas as pd
+
+    from lucror.financial_numbers import clean_financial_series
+
+    table = parse_report(markdown_content).table
+    edited = {row_id(item) for item in items} - {None}
+    targets = [row for row in affected_rows(edited) if row not in edited]
+    if table is None or not targets:
+        return markdown_content, {}
+
+    positions = {}
+    for i, row in enumerate(table.rows):
+        positions.setdefault(row_id(row[0]), i)
+    if not any(row in positions for row in targets):
+        return markdown_content, {}
+    # Current cells of the targets too: they stay where they cannot be recomputed
+    inputs = list(dict.fromkeys(
+        [source for row in targets for source in DERIVED_ROWS[row][0] if source not in targets and source in positions]
+        + [row for row in targets if row in positions]
+    ))
+
+    # One cleaning call for every input cell
+    cells = [cell for row in inputs for cell in table.rows[positions[row]][1:]]
+    values, _units = clean_financial_series(pd.Series(cells, dtype=object))
+    values = pd.to_numeric(values, errors="coerce").to_numpy(dtype=np.float64).reshape(len(inputs), len(table.years))
+    missing = np.full(len(table.years), np.nan)
+    v = {row: missing for row in RAW_ROWS + list(DERIVED_ROWS)}
+    v.update(zip(inputs, values))
+
+    lines = markdown_content.split("\n")
+    changed = {}
+    for row in targets:
+        v[row], computed = _derive(row, v, v[row])
+        if row not in positions:
+            # Not shown, but still an input of the rows below it
+            continue
+        label = table.rows[positions[row]][0]
+        old_cells = table.rows[positions[row]][1:]
+        new_cells = [format_value(value, DERIVED_ROWS[row][1]) if ok else old
+                     for value, ok, old in zip(v[row].tolist(), computed.tolist(), old_cells)]
+        line_no = table.line_numbers[positions[row]]
+        first_cell = lines[line_no].strip().strip("|").split("|")[0].strip()
+        lines[line_no] = "| " + " | ".join([first_cell] + new_cells) + " |"
+        changed[label] = new_cells
+    return "\n".join(lines), changed
@@ -0,0 +1,113 @@
+"""Cleans up a generated report's markdown before it is rendered to PDF."""
+
+import re
+
+# --- 1. CLEAN THE HEADER ---
+# The whole "Key Management" line (and any junk stars around it) becomes a clean header
+KEY_MANAGEMENT_RE = re.compile(r'(?i)^[\s\*]*Key Management.*?Contact.*?$', re.MULTILINE)
+KEY_MANAGEMENT_HEADER = '\n\n### Key Management & Contact'
+
+# --- 2. CLEAN & STANDARDIZE TITLES (CEO / CFO / President) ---
+# Each title starts on a new line with a clean bullet: the title, preceded by any amount of
+# garbage (stars, spaces, bullets), followed by a colon -> newline + bullet + bold title + colon.
+# "President & CEO" goes first so it doesn't get chopped up by the "CEO" rule. The rules run
+# one after another because later ones see the output of earlier ones ("CEO" re-matches inside
+# the new "* **President & CEO:**" line), and that is what today's PDFs look like.
+TARGET_TITLES = ["President & CEO", "CEO", "CFO", "President"]
+TITLE_RULES = [
+    (
+        re.compile(fr'(?i)(?:\\n|^|[\s\*•-])+\**{re.escape(title)}\**\s*:'),
+        re.compile(fr'(?i){re.escape(title)}'),
+        f'\n* **{title}:**',
+    )
+    for title in TARGET_TITLES
+]
+
+# --- 3. FIX INVESTOR RELATIONS (The Merge Logic) ---
+# Step A: Standardize the "Investor Relations" label
+INVESTOR_RELATIONS_RE = re.compile(r'(?i)(?:\\n|^|[\s\*•-])+\**Investor\s*Relations\**\s*:')
+INVESTOR_RELATIONS_ANCHOR_RE = re.compile(r'(?i)Investor\s*Relations')
+INVESTOR_RELATIONS_LABEL = '\n* **Investor Relations:**'
+# Step B: "**Investor Relations:**" followed by a newline and an email address pulls the email up
+INVESTOR_RELATIONS_MERGE_RE = re.compile(r'(?i)(\*\*Investor Relations:\*\*)\s*\n+[\s\*•-]*([^\n]*@)')
+
+# --- 4. CLEANUP ARTIFACTS ---
+EMPTY_BULLET_LINE_RE = re.compile(r'(?m)^\s*\*\s*\*\s*$') # Empty "* *" lines
+
+# --- 5. STRENGTHS & WEAKNESSES FORMATTING ---
+# These headers always get a blank line above them so they don't look like a wall of text
+STRENGTHS_RE = re.compile(r'(?i)(?<!\n)\s*\*?\s*\*\*?Strengths:?\**')
+STRENGTHS_ANCHOR_RE = re.compile(r'(?i)Strengths')
+WEAKNESSES_RE = re.compile(r'(?i)(?<!\n)\s*\*?\s*\*\*?Weaknesses:?\**')
+WEAKNESSES_ANCHOR_RE = re.compile(r'(?i)Weaknesses')
+
+# Characters the rules above may consume around a keyword ("\\n" is the literal two-character escape)
+_LEADING_JUNK = frozenset("*•-")
+_TRAILING_JUNK = frozenset("*:")
+
+
+def _sub_around(pattern, anchor, replacement, text):
+    """`pattern.sub(replacement, text)` that only scans the stretch of text that can match.
+
+    Every match contains an `anchor` match (the keyword) plus the junk around it, so
+    the scan starts at the junk before the first keyword and stops after the junk
+    following the last one. Without a keyword the text is returned untouched.
+    """
+    found = anchor.search(text)
+    if found is None:
+        return text
+
+    start = found.start()
+    while start > 0:
+        ch = text[start - 1]
+        if ch in _LEADING_JUNK or ch.isspace():
+            start -= 1
+        elif ch == "n" and start > 1 and text[start - 2] == "\\":
+            start -= 2
+        else:
+            break
+
+    end = found.end()
+    while found is not None:
+        end = max(end, found.end())
+        # Step one character at a time, keywords like "strengths" can overlap themselves
+        found = anchor.search(text, found.start() + 1)
+    while end < len(text) and (text[end] in _TRAILING_JUNK or text[end].isspace()):
+        end += 1
+
+    # Matching from `start` (not slicing) keeps "^" and look-behinds seeing the real text
+    pieces = [text[:start]]
+    last = start
+    for match in pattern.finditer(text, start, end):
+        pieces.append(text[last:match.start()])
+        pieces.append(replacement)
+        last = match.end()
+    pieces.append(text[last:])
+    return "".join(pieces)
+
+
+def normalize_pdf_markdown(markdown_content):
+    """Applies the PDF clean-up rules, in the order `create_pdf` always has.
+
+    Patterns are compiled once at import, and the expensive rules (whose leading
+    junk class lets them start at every space) only scan the text around their
+    keyword, skipping the pass entirely when it is absent. The output is identical
+    to running every `re.sub` over the whole report.
+    """
+    markdown_content = KEY_MANAGEMENT_RE.sub(KEY_MANAGEMENT_HEADER, markdown_content)
+
+    for pattern, anchor, replacement in TITLE_RULES:
+        markdown_content = _sub_around(pattern, anchor, replacement, markdown_content)
+
+    markdown_content = _sub_around(INVESTOR_RELATIONS_RE, INVESTOR_RELATIONS_ANCHOR_RE,
+                                   INVESTOR_RELATIONS_LABEL, markdown_content)
+    markdown_content = INVESTOR_RELATIONS_MERGE_RE.sub(r'\1 \2', markdown_content)
+
+    # Removes the accidental double stars or weird space-star combos (like "* *")
+    markdown_content = markdown_content.replace("****", "**")
+    markdown_content = EMPTY_BULLET_LINE_RE.sub('', markdown_content)
+
+    markdown_content = _sub_around(STRENGTHS_RE, STRENGTHS_ANCHOR_RE, '\n\n**Strengths:**\n', markdown_content)
+    markdown_content = _sub_around(WEAKNESSES_RE, WEAKNESSES_ANCHOR_RE, '\n\n**Weaknesses:**\n', markdown_content)
+
+    return markdown_content
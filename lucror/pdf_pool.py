@@ -0,0 +1,216 @@
+"""Renders report HTML to PDF in a bounded pool of worker processes.
+
+`pisa.CreatePDF` is CPU-bound; running it inline holds the GIL and freezes the
+Streamlit session that asked for it (and slows every other session's render).
+Workers are spawned once, load the static assets once, and are reused.
+"""
+
+import base64
+import io
+import multiprocessing
+import threading
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+DEFAULT_MAX_WORKERS = 2
+DEFAULT_TIMEOUT_SECONDS = 120
+
+
+class PdfRenderError(Exception):
+    """The render did not produce a result (worker crashed, pool shut down or render cancelled)."""
+
+
+class PdfRenderTimeout(PdfRenderError):
+    """The render took longer than its timeout and was cancelled."""
+
+
+def load_logo_src(path):
+    """Base64 data URI for the Lucror logo, or "" if the file is missing."""
+    try:
+        with open(path, "rb") as f:
+            return f"data:image/png;base64,{base64.b64encode(f.read()).decode()}"
+    except FileNotFoundError:
+        return "" # Fallback if file missing
+
+
+def build_pdf_html(html_text, lucror_img_src, company_img_src):
+    """Wraps the converted report in the PDF page template (logos header + CSS)."""
+    lucror_logo_html = f'<img class="logo-img" src="{lucror_img_src}">' if lucror_img_src else ""
+    company_logo_html = f'<img class="logo-img" src="{company_img_src}">' if company_img_src else ""
+    
+    styled_html = f"""
+    <html>
+    <head>
+        <meta charset="UTF-8">
+
+        <style>
+            
+            @page {{ margin: 0.7in; }}
+
+            body {{ font-family: Helvetica, sans-serif; font-size: 11px; line-height: 1.4; color: #333; }}
+
+            .header-table {{ width: 100%; border: none; margin-bottom: 20px; }}
+
+            .header-table td {{ border: none; vertical-align: middle; }}
+
+            .logo-left {{ text-align: left; width: 50%; }}
+
+            .logo-right {{ text-align: right; width: 50%; }}
+
+            .logo-img {{ height: 45px; object-fit: contain; }}
+          
+            h1 {{ color: #2c3e50; font-size: 18px; margin-bottom: 10px; border-bottom: 2px solid #2c3e50; padding-bottom: 5px; }}
+            h2 {{ color: #2c3e50; font-size: 16px; margin-top: 25px; margin-bottom: 10px; border-bottom: 1px solid #ddd; padding-bottom: 3px; }}
+            h3 {{ color: #2c3e50; font-size: 14px; margin-top: 20px; margin-bottom: 8px; font-weight: bold; }}
+            
+            /* Clean Table Styling */
+            table {{ width: 100%; border-collapse: collapse; margin-top: 10px; margin-bottom: 20px; }}
+            th, td {{ border: 1px solid #ddd; padding: 10px; text-align: left; vertical-align: top; }}
+            th {{ background-color: #f8f9fa; font-weight: bold; color: #2c3e50; }}
+            
+            /* Specific List Styling */
+            ul {{ margin-top: 5px; margin-bottom: 15px; padding-left: 20px; }}
+            li {{ margin-bottom: 6px; }}
+            
+            /* Source Footnote Styling */
+            em {{ font-size: 10px; color: #666; display: block; margin-top: 5px; }}
+        </style>
+    </head>
+    <body>
+        <table class="header-table">
+            <tr>
+                <td class="logo-left">{lucror_logo_html}</td>
+                <td class="logo-right">{company_logo_html}</td>
+            </tr>
+        </table>
+        {html_text}
+    </body>
+    </html>
+    """
+    return styled_html
+
+
+# --- WORKER PROCESS SIDE ---
+# Filled once per worker by `_init_worker`
+_worker_assets = {}
+
+
+def _init_worker(logo_path):
+    from xhtml2pdf import pisa # Heavy import, paid once per worker instead of on the first render
+
+    _worker_assets["pisa"] = pisa
+    _worker_assets["lucror_img_src"] = load_logo_src(logo_path)
+
+
+def _render(html_text, company_img_src):
+    styled_html = build_pdf_html(html_text, _worker_assets["lucror_img_src"], company_img_src)
+    pdf_buffer = io.BytesIO()
+    pisa_status = _worker_assets["pisa"].CreatePDF(
+        io.BytesIO(styled_html.encode("utf-8")),
+        dest=pdf_buffer,
+        encoding='utf-8'
+    )
+    if pisa_status.err:
+        return None
+    return pdf_buffer.getvalue()
+
+
+# --- CALLER SIDE ---
+class PdfRenderPool:
+    """Submit/await front end for a `ProcessPoolExecutor` of PDF workers.
+
+    `submit` returns a `concurrent.futures.Future`; `render` waits for it with a
+    timeout and `render_async` awaits it from asyncio code. A render that times out
+    or is interrupted is cancelled: if it is still queued it is simply dropped, if
+    a worker is already busy with it the pool's processes are terminated and a
+    fresh pool is started on the next submit (renders running for other callers at
+    that moment fail with `PdfRenderError`). A render returns the PDF bytes, or
+    None when xhtml2pdf reports an error, as `create_pdf` always has.
+    """
+
+    def __init__(self, logo_path, max_workers=DEFAULT_MAX_WORKERS, timeout_seconds=DEFAULT_TIMEOUT_SECONDS):
+        self.logo_path = logo_path
+        self.max_workers = max_workers
+        self.timeout_seconds = timeout_seconds
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # spawn, not fork: the Streamlit server process is full of threads
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.logo_path,),
+                )
+            return self._executor
+
+    def submit(self, html_text, company_img_src=""):
+        try:
+            return self._get_executor().submit(_render, html_text, company_img_src)
+        except (BrokenProcessPool, RuntimeError):
+            # A worker died (or the pool was reset) since the last submit: start over once
+            self.reset()
+            return self._get_executor().submit(_render, html_text, company_img_src)
+
+    def render(self, html_text, company_img_src="", timeout=None):
+        """Blocking render; raises `PdfRenderTimeout` / `PdfRenderError`."""
+        future = self.submit(html_text, company_img_src)
+        timeout = self.timeout_seconds if timeout is None else timeout
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            self.cancel(future)
+            raise PdfRenderTimeout(f"PDF rendering took longer than {timeout}s") from None
+        except (BrokenProcessPool, CancelledError) as e:
+            raise PdfRenderError(f"PDF rendering failed: {e or type(e).__name__}") from None
+        except BaseException:
+            # Script stopped or rerun while waiting: don't leave the render running
+            self.cancel(future)
+            raise
+
+    async def render_async(self, html_text, company_img_src="", timeout=None):
+        """`render` for asyncio callers; cancelling the awaiting task cancels the render."""
+        import asyncio
+
+        future = self.submit(html_text, company_img_src)
+        timeout = self.timeout_seconds if timeout is None else timeout
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            self.cancel(future)
+            raise PdfRenderTimeout(f"PDF rendering took longer than {timeout}s") from None
+        except BrokenProcessPool as e:
+            raise PdfRenderError(f"PDF rendering failed: {e}") from None
+        except asyncio.CancelledError:
+            self.cancel(future)
+            raise
+
+    def cancel(self, future):
+        """Cancels one render; a render already running takes the worker processes down with it."""
+        if future.cancel() or future.done():
+            return
+        self.reset()
+
+    def reset(self):
+        """Terminates the worker processes; the next submit starts a fresh pool."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is None:
+            return
+        terminate = getattr(executor, "terminate_workers", None)
+        if terminate is not None:
+            terminate()
+        else:
+            for process in list((executor._processes or {}).values()):
+                process.terminate()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,174 @@
+"""Keeps the static report instructions as Gemini cached content, one cache per model.
+
+Requests then send only the per-ticker suffix and reference the cache, so the
+~3k-token prefix is neither re-uploaded nor billed at the full input rate on
+every report. Caches are named after the prompt version: a new version gets a
+new cache and the old one simply expires. Expiring caches are extended, caches
+left by an earlier process are reused, and when the API refuses to cache the
+model is served uncached for a while before trying again.
+
+The prefix is counted (`count_tokens`) once per model and logged. Models whose
+explicit-cache minimum it does not reach (gemini-2.5-pro needs 4,096 tokens)
+are served uncached: the prefix still leads every prompt, so Gemini's implicit
+caching can reuse it.
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = 60 * 60
+# Extend (rather than race) a cache this close to its expiry
+REFRESH_BEFORE_SECONDS = 5 * 60
+# After a failed create, call the model without the cache for this long
+RETRY_AFTER_SECONDS = 30 * 60
+DISPLAY_NAME_PREFIX = "lucror-report-"
+# Smallest cached content each model accepts for explicit caching
+MIN_CACHE_TOKENS = {
+    "gemini-2.5-pro": 4096,
+    "gemini-2.5-flash": 1024,
+}
+
+
+def is_cache_miss(error):
+    """True for the API error of a request whose cached content is gone (expired, deleted)."""
+    from google.genai import errors
+
+    if not isinstance(error, errors.APIError):
+        return False
+    return error.code == 404 or (error.code in (400, 403) and "cache" in str(error).lower())
+
+
+def _expires_at(cached, now, ttl_seconds):
+    expire_time = cached.expire_time
+    return expire_time.timestamp() if expire_time is not None else now + ttl_seconds
+
+
+@dataclass
+class _Entry:
+    name: str
+    expires_at: float
+
+
+class PromptCache:
+    """Model -> name of the cached content holding `text` (plus the request tools).
+
+    `cache_name(client, model)` is blocking and thread-safe (one creation per
+    model even with many batch workers); `cache_name_async` runs it in a thread.
+    Returns None when the prefix should be sent inline instead.
+    """
+
+    def __init__(self, text, version, tools=None, ttl_seconds=DEFAULT_TTL_SECONDS,
+                 refresh_before_seconds=REFRESH_BEFORE_SECONDS, retry_after_seconds=RETRY_AFTER_SECONDS,
+                 clock=time.time):
+        self.text = text
+        self.display_name = DISPLAY_NAME_PREFIX + version
+        self.tools = tools
+        self.ttl_seconds = ttl_seconds
+        self.refresh_before_seconds = refresh_before_seconds
+        self.retry_after_seconds = retry_after_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._disabled_until = {}
+        self._tokens = {}
+
+    def _large_enough(self, client, model):
+        """False when the prefix is under the model's explicit-cache minimum (counted once per model)."""
+        from google.genai import errors
+
+        if model not in self._tokens:
+            try:
+                self._tokens[model] = client.models.count_tokens(model=model, contents=self.text).total_tokens
+            except errors.APIError:
+                # Unknown size: let the create call decide
+                self._tokens[model] = None
+            minimum = MIN_CACHE_TOKENS.get(model, 0)
+            if self._tokens[model] is not None:
+                fits = self._tokens[model] >= minimum
+                logger.log(logging.INFO if fits else logging.WARNING,
+                           "Report prompt prefix: %d tokens on %s (explicit cache minimum %d)%s",
+                           self._tokens[model], model, minimum, "" if fits else "; sent uncached")
+        tokens = self._tokens[model]
+        return tokens is None or tokens >= MIN_CACHE_TOKENS.get(model, 0)
+
+    def _ttl(self):
+        return f"{int(self.ttl_seconds)}s"
+
+    def _find_existing(self, client, model):
+        for cached in client.caches.list():
+            if cached.display_name == self.display_name and (cached.model or "").endswith(model):
+                return cached
+        return None
+
+    def _create(self, client, model):
+        from google.genai import types
+
+        return client.caches.create(
+            model=model,
+            config=types.CreateCachedContentConfig(
+                display_name=self.display_name,
+                contents=[types.Content(role="user", parts=[types.Part(text=self.text)])],
+                # Requests using a cache may not pass their own tools, so they live here
+                tools=self.tools,
+                ttl=self._ttl(),
+            ),
+        )
+
+    def _extend(self, client, name):
+        from google.genai import types
+
+        return client.caches.update(name=name, config=types.UpdateCachedContentConfig(ttl=self._ttl()))
+
+    def cache_name(self, client, model):
+        from google.genai import errors
+
+        with self._lock:
+            now = self._clock()
+            if self._disabled_until.get(model, 0) > now:
+                return None
+            entry = self._entries.get(model)
+            if entry is not None and entry.expires_at - now > self.refresh_before_seconds:
+                return entry.name
+            if entry is None and not self._large_enough(client, model):
+                return None
+
+            try:
+                if entry is None:
+                    cached = self._find_existing(client, model)
+                    expires_at = _expires_at(cached, now, self.ttl_seconds) if cached is not None else 0
+                    if expires_at - now > self.refresh_before_seconds:
+                        self._entries[model] = _Entry(cached.name, expires_at)
+                        return cached.name
+                    name = cached.name if cached is not None else None
+                else:
+                    name = entry.name
+                try:
+                    cached = self._extend(client, name) if name else self._create(client, model)
+                except errors.APIError as e:
+                    if not name or not is_cache_miss(e):
+                        raise
+                    cached = self._create(client, model) # expired between list/lookup and update
+            except errors.APIError as e:
+                from lucror.tracing import annotate
+
+                annotate(prompt_cache_error=str(e)[:300])
+                self._entries.pop(model, None)
+                self._disabled_until[model] = now + self.retry_after_seconds
+                return None
+
+            self._entries[model] = _Entry(cached.name, _expires_at(cached, now, self.ttl_seconds))
+            return cached.name
+
+    async def cache_name_async(self, client, model):
+        import asyncio
+
+        return await asyncio.to_thread(self.cache_name, client, model)
+
+    def invalidate(self, model):
+        """Forgets the model's cache (a request reported it missing); the next call creates a new one."""
+        with self._lock:
+            self._entries.pop(model, None)
@@ -0,0 +1,111 @@
+"""Two-tier (memory + SQLite) cache for generated company reports."""
+
+import hashlib
+import json
+import threading
+import time
+
+from lucror.storage import LRUCache, connect
+
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+
+
+def make_cache_key(ticker, prompt_template, corrections=None):
+    """Builds the cache key from the ticker, the prompt template and (optionally) corrections.
+
+    Any edit to the prompt produces a new key, so a stale report is never served
+    after it changes. The backend leaves corrections out: it applies them to
+    cached reports when serving them, so a new correction needs no new report.
+    """
+    template_hash = hashlib.sha256(prompt_template.encode("utf-8")).hexdigest()
+    corrections_blob = json.dumps(corrections or {}, sort_keys=True)
+    raw = "\x1f".join([ticker.upper(), template_hash, corrections_blob])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ReportCache:
+    """Report store with an in-process LRU in front of a TTL-evicted SQLite table."""
+
+    def __init__(self, path, ttl_seconds=DEFAULT_TTL_SECONDS, memory_size=64):
+        self.ttl_seconds = ttl_seconds
+        self._memory = LRUCache(memory_size)
+        self._lock = threading.Lock()
+        self._conn = connect(path)
+        with self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS reports (
+                    cache_key TEXT PRIMARY KEY,
+                    ticker TEXT NOT NULL,
+                    report_text TEXT NOT NULL,
+                    grounding_metadata TEXT,
+                    created_at REAL NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_reports_ticker ON reports (ticker)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_reports_expires ON reports (expires_at)")
+
+    def get(self, key):
+        """Returns {"ticker", "report_text", "grounding_metadata", "created_at"} or None."""
+        now = time.time()
+        entry = self._memory.get(key)
+        if entry is not None:
+            if entry["expires_at"] > now:
+                return entry
+            self._memory.pop(key)
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM reports WHERE cache_key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+        if row is None:
+            return None
+
+        entry = {
+            "ticker": row["ticker"],
+            "report_text": row["report_text"],
+            "grounding_metadata": json.loads(row["grounding_metadata"]) if row["grounding_metadata"] else None,
+            "created_at": row["created_at"],
+            "expires_at": row["expires_at"],
+        }
+        self._memory.put(key, entry)
+        return entry
+
+    def put(self, key, ticker, report_text, grounding_metadata=None):
+        """Stores a report; `grounding_metadata` must be JSON-serializable."""
+        now = time.time()
+        entry = {
+            "ticker": ticker.upper(),
+            "report_text": report_text,
+            "grounding_metadata": grounding_metadata,
+            "created_at": now,
+            "expires_at": now + self.ttl_seconds,
+        }
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO reports VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    entry["ticker"],
+                    report_text,
+                    json.dumps(grounding_metadata) if grounding_metadata is not None else None,
+                    entry["created_at"],
+                    entry["expires_at"],
+                ),
+            )
+            # Opportunistic eviction keeps the file from growing without a cron job
+            self._conn.execute("DELETE FROM reports WHERE expires_at <= ?", (now,))
+        self._memory.put(key, entry)
+
+    def invalidate(self, key):
+        self._memory.pop(key)
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM reports WHERE cache_key = ?", (key,))
+
+    def invalidate_ticker(self, ticker):
+        ticker = ticker.upper()
+        self._memory.discard_where(lambda entry: entry["ticker"] == ticker)
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM reports WHERE ticker = ?", (ticker,))
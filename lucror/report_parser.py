@@ -0,0 +1,255 @@
+"""Parsing helpers for the markdown credit reports produced by the model."""
+
+import re
+from collections import namedtuple
+from dataclasses import dataclass, field
+from functools import cached_property, lru_cache
+
+# Section headers as the prompt asks for them ("### Description", "### **Appendix**", ...)
+SECTION_HEADER_RE = re.compile(
+    r"^[ \t]*#{1,3}[ \t]+\**[ \t]*(Description|Financial Summary|Key Credit Drivers|Appendix)\b.*$",
+    re.IGNORECASE | re.MULTILINE
+)
+# Where the internal rationale starts; everything after it is kept out of the main report
+APPENDIX_SPLIT_RE = re.compile(r"(?i)\n#{1,3}\s+\**Appendix\**.*")
+# "* **Revenue**: Source Document: ..." entries of the Data Source Dictionary
+APPENDIX_ENTRY_RE = re.compile(r"^\s*[\*\-]\s+\*\*\[?(.+?)\]?\*\*")
+
+# "(-) Acquisition of PP&E ..." -> "Acquisition of PP&E ..."
+LEADING_SIGN_RE = re.compile(r"^\(\s*[-+]\s*\)\s*")
+
+FINANCIAL_SUMMARY_MARKER = "### Financial Summary"
+
+# Everything above "### Description" (company name, ratings table and its footnote)
+RATINGS_SECTION = "Ratings"
+REPORT_SECTIONS = [RATINGS_SECTION, "Description", "Financial Summary", "Key Credit Drivers"]
+_SECTION_NAMES = {name.lower(): name for name in REPORT_SECTIONS + ["Appendix"]}
+
+
+def section_spans(markdown_content):
+    """(start, end) offsets of each main section in the text, keyed by the names in REPORT_SECTIONS.
+
+    A section runs from its header to the next section header; Ratings is
+    everything before the first one. Text from the Appendix onwards belongs to
+    no section. Only sections seen so far are present.
+    """
+    spans = {}
+    current = RATINGS_SECTION
+    start = 0
+    for match in SECTION_HEADER_RE.finditer(markdown_content):
+        spans[current] = (start, match.start())
+        current = _SECTION_NAMES[match.group(1).lower()]
+        start = match.start()
+        if current == "Appendix":
+            break
+    else:
+        spans[current] = (start, len(markdown_content))
+    spans.pop("Appendix", None)
+    return spans
+
+
+def split_sections(markdown_content):
+    """Splits a (possibly partial) report into its main sections.
+
+    Returns a dict keyed by the names in REPORT_SECTIONS, holding only the sections
+    seen so far. Text from the Appendix onwards is dropped. Works on incomplete
+    text, so it can be called on every chunk of a streamed response.
+    """
+    sections = {name: markdown_content[start:end] for name, (start, end) in section_spans(markdown_content).items()}
+    return {name: text for name, text in sections.items() if text.strip()}
+
+
+def normalize_item_name(item):
+    """Search term for a Financial Summary row.
+
+    "**Revenue**" -> "revenue", "Net cash provided by operating activities (OCF)"
+    -> "net cash provided by operating activities", "(-) Acquisition of PP&E and
+    intangible assets" -> "acquisition of pp&e and intangible assets".
+    """
+    name = LEADING_SIGN_RE.sub("", item.replace("**", "").strip())
+    return name.split("(")[0].strip().lower()
+
+
+AuditTrail = namedtuple("AuditTrail", ["term", "entries", "mentions"])
+
+
+class AuditIndex:
+    """Per-report index from normalized row names to their Appendix lines.
+
+    `entries` are citation bullets (list items mentioning "source" or "document"),
+    `mentions` every Appendix line containing the term, shown when there is no
+    citation. Lines are lower-cased and classified once; each term is resolved
+    once, so a row click is a dictionary lookup.
+    """
+
+    def __init__(self, rationale_text, items=()):
+        self._lines = []
+        for line in rationale_text.split("\n"):
+            stripped = line.strip()
+            lower = line.lower()
+            is_citation = ("source" in lower or "document" in lower) and (stripped.startswith("*") or stripped.startswith("-"))
+            self._lines.append((stripped, lower, is_citation))
+        self._by_term = {}
+        for item in items:
+            self.lookup(item)
+
+    def lookup(self, item):
+        term = normalize_item_name(item)
+        trail = self._by_term.get(term)
+        if trail is None:
+            entries, mentions = [], []
+            if term:
+                for stripped, lower, is_citation in self._lines:
+                    if term in lower:
+                        mentions.append(stripped)
+                        if is_citation:
+                            entries.append(stripped)
+            trail = AuditTrail(term, entries, mentions)
+            self._by_term[term] = trail
+        return trail
+
+
+@dataclass
+class FinancialTable:
+    """The Financial Summary table.
+
+    `rows` hold the cleaned cell strings (no "**"), `row_index` maps an item name
+    to its row, and `line_numbers[i]` is the line of row i in the source text
+    (`text.split("\\n")`), so single cells can be rewritten in place.
+    """
+
+    headers: list
+    rows: list
+    row_index: dict
+    header_line: int
+    line_numbers: list
+
+    @property
+    def items(self):
+        return [row[0] for row in self.rows]
+
+    @property
+    def years(self):
+        return self.headers[1:]
+
+    def to_dataframe(self):
+        """A fresh DataFrame (callers may edit it without touching the cached document)."""
+        import pandas as pd
+
+        return pd.DataFrame([list(row) for row in self.rows], columns=list(self.headers))
+
+
+@dataclass
+class ReportDocument:
+    """Structured view of one generated report, built in a single pass by `parse_report`."""
+
+    text: str
+    main_report: str
+    rationale_text: str
+    sections: dict = field(default_factory=dict)
+    footnotes: dict = field(default_factory=dict)
+    table: FinancialTable = None
+    pre_table_text: str = None
+    post_table_text: str = None
+    appendix: dict = field(default_factory=dict)
+
+    @cached_property
+    def audit_index(self):
+        """Built on first use (row clicks only), then kept with the cached document."""
+        return AuditIndex(self.rationale_text, self.table.items if self.table else ())
+
+
+@lru_cache(maxsize=32)
+def parse_report(markdown_content):
+    """Parses a report once; repeated calls with the same text reuse the cached document.
+
+    The returned document is shared between callers and must be treated as read-only.
+    """
+    # 1. Main report vs. Appendix (same split the UI has always used)
+    split = APPENDIX_SPLIT_RE.search(markdown_content)
+    if split:
+        head = markdown_content[:split.start()]
+        main_report = head.strip()
+        rationale_text = markdown_content[split.end():].strip()
+        # Lines dropped by the strip, to map main_report lines back onto the full text
+        line_offset = head[:len(head) - len(head.lstrip())].count("\n")
+    else:
+        main_report = markdown_content
+        rationale_text = ""
+        line_offset = 0
+
+    doc = ReportDocument(text=markdown_content, main_report=main_report, rationale_text=rationale_text)
+
+    # 2. One walk over the main report lines: sections, footnotes and the Financial Summary table
+    marker_pos = main_report.find(FINANCIAL_SUMMARY_MARKER)
+    marker_line = main_report.count("\n", 0, marker_pos) if marker_pos != -1 else -1
+    if marker_pos != -1:
+        pre_table_text = main_report[:marker_pos + len(FINANCIAL_SUMMARY_MARKER)]
+    post_table_lines = []
+    table_lines = []
+    capture_table = False
+    table_finished = False
+
+    section = RATINGS_SECTION
+    section_lines = {RATINGS_SECTION: []}
+
+    for idx, line in enumerate(main_report.split("\n")):
+        header = SECTION_HEADER_RE.match(line)
+        if header:
+            section = _SECTION_NAMES[header.group(1).lower()]
+            section_lines.setdefault(section, [])
+        section_lines[section].append(line)
+
+        stripped = line.strip()
+        if stripped.lstrip("*_ ").lower().startswith("source"):
+            doc.footnotes.setdefault(section, []).append(stripped)
+
+        if marker_pos == -1 or idx < marker_line:
+            continue
+        if idx == marker_line:
+            # Only what follows the marker on its own line belongs to the table scan
+            line = line[line.find(FINANCIAL_SUMMARY_MARKER) + len(FINANCIAL_SUMMARY_MARKER):]
+            stripped = line.strip()
+
+        # Detect Table Start
+        if "| Item" in stripped or "| **Item" in stripped:
+            capture_table = True
+
+        if capture_table and not table_finished:
+            if stripped.startswith("|"):
+                table_lines.append((line_offset + idx, stripped))
+            elif stripped == "" and len(table_lines) > 0:
+                table_finished = True
+            elif not stripped.startswith("|") and len(table_lines) > 0:
+                table_finished = True
+                post_table_lines.append(line)
+        elif table_finished:
+            post_table_lines.append(line)
+        else:
+            pre_table_text += "\n" + line
+
+    doc.sections = {name: "\n".join(lines) for name, lines in section_lines.items() if "".join(lines).strip()}
+
+    # 3. Financial Summary table (rows whose cell count does not match the header are skipped)
+    table_lines = [(line_no, line) for line_no, line in table_lines if "---" not in line]
+    if table_lines:
+        header_line, header_text = table_lines[0]
+        headers = [h.strip().replace('*', '') for h in header_text.strip('|').split('|')]
+        rows, line_numbers, row_index = [], [], {}
+        for line_no, line in table_lines[1:]:
+            row_vals = [c.strip().replace('**', '') for c in line.strip('|').split('|')]
+            if len(row_vals) == len(headers):
+                row_index.setdefault(row_vals[0], len(rows))
+                rows.append(row_vals)
+                line_numbers.append(line_no)
+        doc.table = FinancialTable(headers, rows, row_index, header_line, line_numbers)
+        doc.pre_table_text = pre_table_text
+        doc.post_table_text = "\n".join(post_table_lines)
+
+    # 4. Appendix entries keyed by row name
+    for line in rationale_text.split("\n"):
+        entry = APPENDIX_ENTRY_RE.match(line)
+        if entry:
+            doc.appendix.setdefault(entry.group(1).strip().rstrip(":").strip(), []).append(line.strip())
+
+    return doc
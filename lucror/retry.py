@@ -0,0 +1,254 @@
+"""Retry policy for Gemini calls: error classification, full-jitter backoff, a latency
+budget, a circuit breaker shared by every session, and fallback to a faster model.
+
+The retry loop is async, so waiting between attempts never blocks a thread that
+could be doing other work (`run_sync` drives it from synchronous code). asyncio
+is imported on first use to keep `import lucror.core` fast.
+"""
+
+import random
+import threading
+import time
+
+# Error classes
+OVERLOADED = "overloaded" # 500/502/503/504: the service is struggling, back off
+RATE_LIMITED = "rate_limited" # 429: quota exhausted, back off (longer) and honour Retry-After
+TIMEOUT = "timeout" # no answer in time (client, network or our own per-attempt limit)
+FATAL = "fatal" # bad request, auth, safety block...: retrying cannot help
+
+RETRYABLE = (OVERLOADED, RATE_LIMITED, TIMEOUT)
+
+PRIMARY_MODEL = 'gemini-2.5-pro'
+FALLBACK_MODEL = 'gemini-2.5-flash'
+
+
+def classify_error(error):
+    """Maps an exception from the Gemini SDK (or its HTTP client) to an error class."""
+    import asyncio
+
+    import httpx
+    from google.genai import errors
+
+    if isinstance(error, errors.APIError):
+        if error.code == 429:
+            return RATE_LIMITED
+        if error.code in (408, 504):
+            return TIMEOUT
+        if error.code is not None and error.code >= 500:
+            return OVERLOADED
+        return FATAL
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, httpx.TimeoutException)):
+        return TIMEOUT
+    if isinstance(error, (httpx.NetworkError, httpx.RemoteProtocolError)):
+        return OVERLOADED
+    return FATAL
+
+
+def retry_after_seconds(error):
+    """The server's Retry-After hint (seconds) on a 429, if it sent one."""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    try:
+        return float(headers.get("retry-after")) if headers is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class CircuitOpenError(Exception):
+    """The endpoint failed too often recently; calls are refused until the cool-down ends."""
+
+    def __init__(self, model, retry_in):
+        super().__init__(f"{model} is overloaded; not calling it for another {retry_in:.0f}s")
+        self.model = model
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """Closed -> open after `failure_threshold` consecutive overload/rate-limit/timeout failures.
+
+    While open every call is refused at once, for `reset_timeout` seconds; then one
+    trial call is let through (half-open) and its outcome closes or re-opens the
+    circuit. One breaker per model, shared by all sessions, so a struggling endpoint
+    sees one probe instead of every user's retries.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return "closed"
+        if self._clock() - self._opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def before_call(self, model="endpoint"):
+        """Raises CircuitOpenError unless a call may go ahead."""
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return
+            if state == "half-open" and not self._trial_running:
+                self._trial_running = True
+                return
+            retry_in = max(0.0, self.reset_timeout - (self._clock() - self._opened_at))
+        raise CircuitOpenError(model, retry_in)
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures >= self.failure_threshold:
+                self._opened_at = self._clock()
+            self._trial_running = False
+
+    def release(self):
+        """The call ended without telling us anything about the endpoint (e.g. a fatal error)."""
+        with self._lock:
+            self._trial_running = False
+
+
+class RetryPolicy:
+    """How hard to try: attempts, backoff, total budget and when to switch models.
+
+    Backoff uses "full jitter": the wait before retry n is uniform in
+    [0, min(max_delay, base_delay * 2**n)], so clients that failed together do not
+    come back together. Rate limits use `rate_limit_base_delay` and never wait less
+    than the server's Retry-After. Nothing is started (or waited for) that would
+    end past `budget_seconds`; once less than `fallback_below_seconds` of the
+    budget is left, or the primary model's circuit is open, attempts go to
+    `fallback_model` instead.
+    """
+
+    def __init__(self, max_attempts=5, base_delay=1.0, rate_limit_base_delay=4.0, max_delay=20.0,
+                 budget_seconds=240.0, attempt_timeout=180.0, fallback_model=FALLBACK_MODEL,
+                 fallback_below_seconds=90.0, min_attempt_seconds=20.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.rate_limit_base_delay = rate_limit_base_delay
+        self.max_delay = max_delay
+        self.budget_seconds = budget_seconds
+        self.attempt_timeout = attempt_timeout
+        self.fallback_model = fallback_model
+        self.fallback_below_seconds = fallback_below_seconds
+        self.min_attempt_seconds = min_attempt_seconds
+
+    def backoff(self, attempt, error_class, error=None, rng=random):
+        base = self.rate_limit_base_delay if error_class == RATE_LIMITED else self.base_delay
+        delay = rng.uniform(0, min(self.max_delay, base * 2 ** attempt))
+        hint = retry_after_seconds(error) if error_class == RATE_LIMITED else None
+        return max(delay, hint or 0.0)
+
+
+class RetryBudgetExceeded(Exception):
+    """Gave up: attempts or latency budget used up. `last_error` is the final failure."""
+
+    def __init__(self, message, last_error=None):
+        super().__init__(message)
+        self.last_error = last_error
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(model, **kwargs):
+    """The process-wide breaker for `model` (created on first use)."""
+    with _breakers_lock:
+        if model not in _breakers:
+            _breakers[model] = CircuitBreaker(**kwargs)
+        return _breakers[model]
+
+
+async def call_with_retry(call, policy, primary_model=PRIMARY_MODEL, on_retry=None, breakers=None,
+                          clock=time.monotonic, sleep=None):
+    """Runs `await call(model)` until it succeeds, fails fatally, or the budget is spent.
+
+    `on_retry(message, info)` is told about every retry; `info` has attempt, model,
+    error_class and delay. Returns `(result, model)`. Raises the original exception
+    on a fatal error, CircuitOpenError when no model may be called right now, and
+    RetryBudgetExceeded when attempts or time ran out.
+    """
+    import asyncio
+
+    sleep = sleep or asyncio.sleep
+    # `breakers` (model -> CircuitBreaker) replaces the process-wide ones, e.g. in tests
+    breaker_for = (lambda m: breakers.setdefault(m, CircuitBreaker())) if breakers is not None else get_breaker
+    deadline = clock() + policy.budget_seconds
+    last_error = None
+
+    for attempt in range(policy.max_attempts):
+        remaining = deadline - clock()
+        model = primary_model
+        if policy.fallback_model and remaining < policy.fallback_below_seconds:
+            model = policy.fallback_model
+        try:
+            breaker_for(model).before_call(model)
+        except CircuitOpenError:
+            if not policy.fallback_model or model == policy.fallback_model:
+                raise
+            model = policy.fallback_model
+            breaker_for(model).before_call(model)
+        breaker = breaker_for(model)
+
+        try:
+            result = await asyncio.wait_for(call(model), timeout=min(policy.attempt_timeout, remaining))
+        except Exception as e:
+            error_class = classify_error(e)
+            if error_class not in RETRYABLE:
+                breaker.release()
+                raise
+            breaker.record_failure()
+            last_error = e
+        except BaseException:
+            # Cancelled or interrupted: says nothing about the endpoint, but a trial call must end
+            breaker.release()
+            raise
+        else:
+            breaker.record_success()
+            return result, model
+
+        if attempt == policy.max_attempts - 1:
+            break
+        delay = policy.backoff(attempt, error_class, last_error)
+        # No point waiting for an attempt that could not finish inside the budget
+        if deadline - (clock() + delay) < policy.min_attempt_seconds:
+            break
+        if on_retry:
+            on_retry(
+                f"⚠️ {'Rate limited' if error_class == RATE_LIMITED else 'Servers busy'}. "
+                f"Retrying in {delay:.1f}s... (Attempt {attempt + 1}/{policy.max_attempts})",
+                {"attempt": attempt + 1, "model": model, "error_class": error_class, "delay": delay},
+            )
+        await sleep(delay)
+
+    raise RetryBudgetExceeded(
+        f"Gave up after {attempt + 1} attempt(s) in {policy.budget_seconds - (deadline - clock()):.0f}s: {last_error}",
+        last_error,
+    )
+
+
+def run_sync(coro):
+    """Runs a coroutine from synchronous code (Streamlit script thread, batch worker, CLI)."""
+    import asyncio
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    raise RuntimeError("run_sync() called from a running event loop; await the coroutine instead")
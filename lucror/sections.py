@@ -0,0 +1,96 @@
+"""Splicing a regenerated section back into a report without touching the rest of it."""
+
+import re
+
+from lucror.metrics import DERIVED_ROWS, row_id
+from lucror.report_parser import (
+    APPENDIX_ENTRY_RE,
+    APPENDIX_SPLIT_RE,
+    FINANCIAL_SUMMARY_MARKER,
+    RATINGS_SECTION,
+    REPORT_SECTIONS,
+    normalize_item_name,
+    section_spans,
+)
+
+FINANCIAL_SUMMARY = "Financial Summary"
+DATA_SOURCE_DICTIONARY = "**Data Source Dictionary**"
+
+# ```markdown ... ``` wrappers the model sometimes adds around the whole answer
+CODE_FENCE_RE = re.compile(r"^\s*```[a-zA-Z]*\s*\n|\n\s*```\s*$")
+
+
+def without_derived_rows(section_text):
+    """The section with the locally computed Financial Summary rows left out (they are not asked for)."""
+    lines = []
+    for line in section_text.split("\n"):
+        cells = line.strip().strip("|").split("|")
+        if line.strip().startswith("|") and row_id(cells[0].replace("**", "")) in DERIVED_ROWS:
+            continue
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def parse_section_response(section, text):
+    """Splits a focused answer into `(section_text, appendix_entries)`.
+
+    Raises ValueError when the answer does not contain the requested section
+    (a section header, or the ratings table for the Ratings section).
+    """
+    text = CODE_FENCE_RE.sub("", text.strip())
+    split = APPENDIX_SPLIT_RE.search(text)
+    head, appendix = (text[:split.start()], text[split.end():]) if split else (text, "")
+
+    span = section_spans(head).get(section)
+    section_text = head[span[0]:span[1]].strip() if span else ""
+    if section == RATINGS_SECTION:
+        if "|" not in section_text:
+            raise ValueError("the answer has no ratings table")
+    elif not section_text:
+        raise ValueError(f"the answer has no '### {section}' section")
+    if section == FINANCIAL_SUMMARY and FINANCIAL_SUMMARY_MARKER not in section_text:
+        raise ValueError("the answer has no Financial Summary table")
+
+    entries = [line.strip() for line in appendix.split("\n") if APPENDIX_ENTRY_RE.match(line)]
+    return section_text, entries
+
+
+def splice_section(report_text, section, section_text):
+    """Replaces one main section of the report; everything else is kept byte for byte."""
+    if section not in REPORT_SECTIONS:
+        raise ValueError(f"unknown section: {section}")
+    spans = section_spans(report_text)
+    if section not in spans:
+        raise ValueError(f"the report has no {section} section")
+    start, end = spans[section]
+    return report_text[:start] + section_text.strip() + "\n\n" + report_text[end:].lstrip("\n")
+
+
+def _entry_name(line):
+    entry = APPENDIX_ENTRY_RE.match(line)
+    return normalize_item_name(entry.group(1).strip().rstrip(":")) if entry else None
+
+
+def replace_appendix_entries(report_text, entries):
+    """Swaps the Data Source Dictionary bullets of the rows in `entries` for the new ones.
+
+    Bullets of other rows and the rest of the Appendix are kept. New entries go
+    right below the "Data Source Dictionary" title (an Appendix is added if the
+    report has none).
+    """
+    if not entries:
+        return report_text
+    names = {_entry_name(entry) for entry in entries}
+    split = APPENDIX_SPLIT_RE.search(report_text)
+    if split is None:
+        return report_text.rstrip("\n") + "\n\n### Appendix\n" + DATA_SOURCE_DICTIONARY + "\n" + "\n".join(entries) + "\n"
+
+    head, header, appendix = report_text[:split.start()], report_text[split.start():split.end()], report_text[split.end():]
+    lines = [line for line in appendix.split("\n") if _entry_name(line) not in names]
+    title = next((i for i, line in enumerate(lines) if DATA_SOURCE_DICTIONARY in line), None)
+    if title is None:
+        # Directly below the Appendix header (lines[0] is what is left of the header line)
+        lines[1:1] = [DATA_SOURCE_DICTIONARY] + entries
+    else:
+        lines[title + 1:title + 1] = entries
+    return head + header + "\n".join(lines)
@@ -0,0 +1,64 @@
+"""Coalesces identical in-flight calls: one runs, concurrent callers with the same key share its outcome."""
+
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Per-key call de-duplication across threads (sessions, batch workers, background jobs).
+
+    `do(key, fn)` runs `fn()` unless a call with the same key is already in
+    flight, in which case it waits for that call and returns (or raises) its
+    outcome. Only concurrent callers share: once a call has finished, the next
+    `do` with its key runs `fn` again. `stats()` counts executed and saved calls.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._executed = 0
+        self._coalesced = 0
+
+    def do(self, key, fn, on_wait=None):
+        """Returns `(result, shared)`; `shared` is True for callers that waited on another's call.
+
+        `on_wait()` is called (before blocking) when this caller joins a call in flight.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._executed += 1
+            else:
+                self._coalesced += 1
+
+        if not leader:
+            if on_wait:
+                on_wait()
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def stats(self):
+        """{"executed": calls run, "coalesced": calls saved by waiting, "in_flight": calls running now}."""
+        with self._lock:
+            return {"executed": self._executed, "coalesced": self._coalesced, "in_flight": len(self._calls)}
@@ -0,0 +1,154 @@
+"""Per-request timing and token accounting.
+
+A request (one report, one export) runs inside `trace(...)`; the code it calls
+marks its stages with `stage(...)` and reports Gemini token usage with
+`record_usage(...)`. Both are no-ops outside a trace, so library code can be
+instrumented unconditionally. The current trace lives in a context variable, so
+concurrent batch workers each get their own. A finished trace becomes one
+JSON-serializable record handed to the trace's sink (e.g. a `TraceLog`).
+"""
+
+import json
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+# usage_metadata fields worth keeping (all token counts)
+USAGE_FIELDS = (
+    "prompt_token_count",
+    "cached_content_token_count",
+    "candidates_token_count",
+    "thoughts_token_count",
+    "tool_use_prompt_token_count",
+    "total_token_count",
+)
+
+_current = ContextVar("lucror_trace", default=None)
+
+
+class Trace:
+    def __init__(self, kind, attrs):
+        self.trace_id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.attrs = dict(attrs)
+        self.started_at = datetime.now(timezone.utc).isoformat(timespec="milliseconds")
+        self.stages = []
+        self.usage = []
+        self.error = None
+        self.seconds = None
+        self._t0 = time.perf_counter()
+
+    def to_record(self):
+        totals = {}
+        for call in self.usage:
+            for name in USAGE_FIELDS:
+                if call.get(name):
+                    totals[name] = totals.get(name, 0) + call[name]
+        return {
+            "trace_id": self.trace_id,
+            "kind": self.kind,
+            "started_at": self.started_at,
+            "seconds": self.seconds,
+            **self.attrs,
+            "error": self.error,
+            "stages": sorted(self.stages, key=lambda s: s["offset"]),
+            "usage": self.usage,
+            "tokens": totals,
+        }
+
+
+def current_trace():
+    return _current.get()
+
+
+@contextmanager
+def trace(kind, sink=None, **attrs):
+    """Traces a request; inside another trace it is recorded as a stage of that one."""
+    if _current.get() is not None:
+        with stage(kind, **attrs) as stage_attrs:
+            yield stage_attrs
+        return
+
+    current = Trace(kind, attrs)
+    token = _current.set(current)
+    try:
+        yield current.attrs
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current.reset(token)
+        current.seconds = round(time.perf_counter() - current._t0, 6)
+        if sink is not None:
+            sink(current.to_record())
+
+
+@contextmanager
+def stage(name, **attrs):
+    """Times a block as a stage of the current trace; yields a dict for extra attributes."""
+    current = _current.get()
+    if current is None:
+        yield attrs
+        return
+
+    start = time.perf_counter()
+    try:
+        yield attrs
+    except BaseException as e:
+        attrs["error"] = type(e).__name__
+        raise
+    finally:
+        entry = {"name": name, "offset": round(start - current._t0, 6), "seconds": round(time.perf_counter() - start, 6)}
+        if attrs:
+            entry["attrs"] = attrs
+        current.stages.append(entry)
+
+
+def annotate(**attrs):
+    """Adds attributes (from_cache, attempts, error, ...) to the current trace."""
+    current = _current.get()
+    if current is not None:
+        current.attrs.update(attrs)
+
+
+def record_usage(response, **attrs):
+    """Keeps the token counts of one Gemini response (its `usage_metadata`)."""
+    current = _current.get()
+    usage = getattr(response, "usage_metadata", None)
+    if current is None or usage is None:
+        return
+    call = {name: getattr(usage, name, None) for name in USAGE_FIELDS}
+    call = {name: value for name, value in call.items() if value is not None}
+    call.update(attrs)
+    current.usage.append(call)
+
+
+class TraceLog:
+    """Trace sink: appends each record as a JSON line to `path` and keeps the latest in memory."""
+
+    def __init__(self, path=None, keep=200):
+        self.path = path
+        self._recent = deque(maxlen=keep)
+        self._lock = threading.Lock()
+
+    def __call__(self, record):
+        with self._lock:
+            self._recent.append(record)
+            if self.path:
+                try:
+                    with open(self.path, "a", encoding="utf-8") as f:
+                        f.write(json.dumps(record, default=str) + "\n")
+                except OSError:
+                    pass # Tracing must never break a report
+
+    def recent(self, ticker=None, limit=20):
+        """Newest first, optionally only records for `ticker`."""
+        with self._lock:
+            records = list(self._recent)
+        if ticker is not None:
+            records = [r for r in records if r.get("ticker") == ticker]
+        return records[::-1][:limit]
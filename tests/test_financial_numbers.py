@@ -0,0 +1,79 @@
+import math
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from lucror.financial_numbers import (
+    SCALAR_MAX_CELLS, UNIT_AMOUNT, UNIT_MULTIPLE, UNIT_PERCENT, UNIT_TEXT, clean_financial_num, clean_financial_series,
+)
+
+EDGE_CASES = [
+    "-", " - ", "", "  ", "N/A", "n.m.", "nan", "NaN", "inf", "-inf", "Infinity", "1_000", "1e5", "1e", "--1", "1-2",
+    "+3", ".5", "5.", "(1,200)", "(350", "1,200)", "11.2%", "(4.5%)", "2.2x", "2.2X", "x", "%", "()", "1 000",
+    "١٢٣", "0", "-0", "(0)", " 12 ", "1.68x (est.)", "1,2,3", "0.0%", "e5", "12e-3%",
+    "\xa012\x1c", "\u2009(5)\u3000", "( 12 )", "\t1,0\n",
+]
+
+
+def random_cell(rng):
+    r = rng.random()
+    value = rng.uniform(-1e7, 1e7)
+    if r < 0.35:
+        return f"{value:,.{rng.randint(0, 3)}f}" if value >= 0 else f"({-value:,.{rng.randint(0, 3)}f})"
+    if r < 0.5:
+        return f"{value / 1e5:.{rng.randint(0, 2)}f}%"
+    if r < 0.6:
+        return f"{abs(value) / 1e6:.2f}{rng.choice('xX')}"
+    if r < 0.7:
+        return repr(value)
+    if r < 0.8:
+        return rng.choice(EDGE_CASES)
+    if r < 0.9:
+        return "".join(rng.choice("0123456789.,-+()%xXeE ") for _ in range(rng.randint(1, 8)))
+    return rng.choice([None, 1.5, 7, float("nan"), True])
+
+
+def same(expected, actual):
+    if isinstance(expected, float) and math.isnan(expected):
+        return isinstance(actual, float) and math.isnan(actual)
+    return expected == actual and type(expected) is type(actual) or (
+        isinstance(expected, (int, float)) and not isinstance(expected, bool)
+        and isinstance(actual, (float, np.floating)) and float(expected) == actual
+    )
+
+
+def expected_unit(val):
+    value = clean_financial_num(val)
+    if isinstance(val, str):
+        if isinstance(value, str):
+            return UNIT_TEXT
+        return UNIT_PERCENT if "%" in val else UNIT_MULTIPLE if "x" in val.lower() else UNIT_AMOUNT
+    return UNIT_AMOUNT if isinstance(val, (int, float)) and val == val else UNIT_TEXT
+
+
+@pytest.mark.parametrize("size", [12, SCALAR_MAX_CELLS + 1, 3000])
+def test_matches_scalar_reference(size):
+    rng = random.Random(size)
+    cells = [random_cell(rng) for _ in range(size)]
+    values, units = clean_financial_series(pd.Series(cells, dtype=object))
+    for cell, value, unit in zip(cells, values.tolist(), units.tolist()):
+        assert same(clean_financial_num(cell), value), cell
+        assert unit == expected_unit(cell), cell
+
+
+@pytest.mark.parametrize("size", [12, 3000])
+def test_numeric_column_is_float64(size):
+    rng = random.Random(0)
+    cells = [f"{rng.uniform(-1e6, 1e6):,.1f}" for _ in range(size)] + ["-", "12.5%", "(3.0x)"]
+    values, units = clean_financial_series(pd.Series(cells, dtype=object))
+    assert values.dtype == np.float64
+    assert values.tolist()[-3:] == [0.0, 0.125, -3.0]
+    assert units.tolist()[-3:] == [UNIT_AMOUNT, UNIT_PERCENT, UNIT_MULTIPLE]
+
+
+def test_edge_cases():
+    values, _units = clean_financial_series(pd.Series(EDGE_CASES * 3, dtype=object))
+    for cell, value in zip(EDGE_CASES * 3, values.tolist()):
+        assert same(clean_financial_num(cell), value), cell
@@ -0,0 +1,74 @@
+import threading
+import time
+
+import pytest
+
+from lucror.jobs import DONE, RUNNING, JobQueue
+
+LEASE = 0.3
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.02)
+
+
+@pytest.fixture
+def queues(tmp_path):
+    opened = []
+
+    def open_queue(runner):
+        queue = JobQueue(str(tmp_path / "jobs.db"), runner, workers=1, poll_seconds=0.05, lease_seconds=LEASE)
+        opened.append(queue)
+        return queue
+
+    yield open_queue
+    for queue in opened:
+        queue.close()
+
+
+def blocking_runner(name, started, release):
+    def run(job, set_status, on_text):
+        started.set()
+        release.wait(5)
+        set_status(f"{name} finishing")
+        return {"by": name}
+    return run
+
+
+def test_live_lease_is_not_taken_over(queues):
+    started, release = threading.Event(), threading.Event()
+    a = queues(blocking_runner("a", started, release))
+    b_runs = []
+    b = queues(lambda job, set_status, on_text: b_runs.append(job.job_id) or {"by": "b"})
+
+    job_id = a.submit("ACME")
+    assert started.wait(2)
+    # Several lease lengths: a keeps renewing, so b never requeues the job
+    time.sleep(LEASE * 3)
+    assert b.get(job_id).status == RUNNING and b_runs == []
+
+    release.set()
+    wait_until(lambda: b.get(job_id).status == DONE)
+    assert b.get(job_id).result == {"by": "a"} and b_runs == []
+
+
+def test_expired_lease_is_run_again_and_the_stale_result_ignored(queues):
+    started, release = threading.Event(), threading.Event()
+    a = queues(blocking_runner("a", started, release))
+    job_id = a.submit("ACME")
+    assert started.wait(2)
+    # a's process "stops": no more renewals, its runner is still busy
+    a._stop.set()
+
+    b = queues(lambda job, set_status, on_text: {"by": "b"})
+    wait_until(lambda: b.get(job_id).status == DONE)
+
+    release.set()
+    for thread in a._threads:
+        thread.join(2)
+    job = b.get(job_id)
+    assert job.result == {"by": "b"}
+    assert job.message != "a finishing"
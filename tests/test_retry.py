@@ -0,0 +1,125 @@
+import asyncio
+
+import pytest
+
+from lucror.retry import CircuitBreaker, CircuitOpenError, RetryPolicy, call_with_retry, run_sync
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def open_breaker(clock, threshold=2):
+    breaker = CircuitBreaker(failure_threshold=threshold, reset_timeout=30.0, clock=clock)
+    for _ in range(threshold):
+        breaker.before_call()
+        breaker.record_failure()
+    return breaker
+
+
+def test_opens_after_threshold_and_refuses_until_reset():
+    clock = FakeClock()
+    breaker = open_breaker(clock)
+    assert breaker.state == "open"
+    clock.now += 10
+    with pytest.raises(CircuitOpenError) as refused:
+        breaker.before_call("m")
+    assert refused.value.retry_in == pytest.approx(20.0)
+    clock.now += 20
+    assert breaker.state == "half-open"
+
+
+def test_half_open_lets_one_trial_through():
+    clock = FakeClock()
+    breaker = open_breaker(clock)
+    clock.now += 30
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    breaker.before_call()
+
+
+def test_failed_trial_reopens_for_a_full_timeout():
+    clock = FakeClock()
+    breaker = open_breaker(clock)
+    clock.now += 30
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    clock.now += 29
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    clock.now += 1
+    breaker.before_call()
+
+
+def test_released_trial_lets_the_next_one_through():
+    clock = FakeClock()
+    breaker = open_breaker(clock)
+    clock.now += 30
+    breaker.before_call()
+    breaker.release()
+    assert breaker.state == "half-open"
+    breaker.before_call()
+
+
+def call_once(breakers, clock, call, fallback_model=None):
+    policy = RetryPolicy(max_attempts=1, fallback_model=fallback_model)
+    return run_sync(call_with_retry(call, policy, primary_model="m", breakers=breakers, clock=clock))
+
+
+@pytest.mark.parametrize("interrupt", [KeyboardInterrupt, asyncio.CancelledError])
+def test_interrupted_trial_does_not_wedge_the_breaker(interrupt):
+    clock = FakeClock()
+    breakers = {"m": open_breaker(clock)}
+    clock.now += 30
+
+    async def interrupted(model):
+        raise interrupt()
+
+    with pytest.raises(interrupt):
+        call_once(breakers, clock, interrupted)
+    assert breakers["m"].state == "half-open"
+
+    async def ok(model):
+        return "report"
+
+    assert call_once(breakers, clock, ok) == ("report", "m")
+    assert breakers["m"].state == "closed"
+
+
+def test_open_primary_falls_back():
+    clock = FakeClock()
+    breakers = {"m": open_breaker(clock)}
+    models = []
+
+    async def call(model):
+        models.append(model)
+        return model
+
+    assert call_once(breakers, clock, call, fallback_model="f") == ("f", "f")
+    assert models == ["f"]
+
+
+def test_retryable_failures_open_the_breaker():
+    clock = FakeClock()
+    breakers = {"m": CircuitBreaker(failure_threshold=3, clock=clock)}
+    attempts = []
+
+    async def call(model):
+        attempts.append(model)
+        raise TimeoutError()
+
+    async def no_sleep(delay):
+        pass
+
+    policy = RetryPolicy(max_attempts=5, fallback_model=None, min_attempt_seconds=0)
+    with pytest.raises(CircuitOpenError):
+        run_sync(call_with_retry(call, policy, primary_model="m", breakers=breakers, clock=clock, sleep=no_sleep))
+    assert len(attempts) == 3
@@ -0,0 +1,79 @@
+import threading
+
+import pytest
+
+from lucror.singleflight import SingleFlight
+
+
+def run_concurrently(flight, key, fn, callers):
+    """Starts `callers` threads on `flight.do(key, fn)` once the first is inside `fn`."""
+    outcomes = [None] * callers
+    joined = threading.Semaphore(0)
+
+    def call(i):
+        try:
+            outcomes[i] = flight.do(key, fn, on_wait=joined.release)
+        except Exception as e:
+            outcomes[i] = e
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(callers)]
+    threads[0].start()
+    return threads, outcomes, joined
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    entered, release = threading.Event(), threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        entered.set()
+        release.wait(5)
+        return "report"
+
+    threads, outcomes, joined = run_concurrently(flight, "ACME", fn, 4)
+    assert entered.wait(2)
+    for thread in threads[1:]:
+        thread.start()
+    for _ in threads[1:]:
+        assert joined.acquire(timeout=2)
+    release.set()
+    for thread in threads:
+        thread.join(2)
+
+    assert calls == [1]
+    assert sorted(outcomes, key=lambda o: o[1]) == [("report", False)] + [("report", True)] * 3
+    assert flight.stats() == {"executed": 1, "coalesced": 3, "in_flight": 0}
+
+
+def test_error_is_shared_then_the_next_call_runs_again():
+    flight = SingleFlight()
+    entered, release = threading.Event(), threading.Event()
+
+    def fn():
+        entered.set()
+        release.wait(5)
+        raise ValueError("boom")
+
+    threads, outcomes, joined = run_concurrently(flight, "ACME", fn, 2)
+    assert entered.wait(2)
+    threads[1].start()
+    assert joined.acquire(timeout=2)
+    release.set()
+    for thread in threads:
+        thread.join(2)
+    assert all(isinstance(o, ValueError) for o in outcomes)
+    assert outcomes[0] is outcomes[1]
+
+    assert flight.do("ACME", lambda: "fresh") == ("fresh", False)
+    assert flight.stats()["executed"] == 2
+
+
+def test_different_keys_do_not_wait():
+    flight = SingleFlight()
+    assert flight.do("A", lambda: 1) == (1, False)
+    assert flight.do("B", lambda: 2) == (2, False)
+    with pytest.raises(KeyError):
+        flight.do("C", lambda: {}["missing"])
+    assert flight.stats() == {"executed": 3, "coalesced": 0, "in_flight": 0}
@@ -1,17 +1,16 @@
 import streamlit as st
-from google import genai
-from google.genai import types
-import time
-import markdown
-from xhtml2pdf import pisa
-import io
 import re
-import base64
-import yfinance as yf
+import hashlib
 import pandas as pd
-import json
 from datetime import datetime
-# <--- ADDED for Excel handling
+from lucror import core
+from lucror.core import MODEL_NAME, ReportBackend, parse_markdown_table, update_markdown_table_value
+from lucror.batch import DEFAULT_MAX_WORKERS, parse_ticker_list, run_batch, tickers_from_csv
+from lucror.jobs import DONE
+from lucror.metrics import recompute_dependents
+from lucror.report_parser import REPORT_SECTIONS, parse_report, split_sections
+from lucror.pdf_pool import PdfRenderError
+from lucror.retry import FALLBACK_MODEL
 
 
 # --- CONFIGURATION ---
@@ -26,730 +25,89 @@ st.set_page_config(
 # Change this line in your code:
 MY_API_KEY = st.secrets["GENAI_API_KEY"]
 
+# --- BACKEND (lucror.core, shared with the command line) ---
 @st.cache_resource
-def get_client():
-    return genai.Client(api_key=MY_API_KEY)
-    # --- HELPER: PARSE MARKDOWN TABLE (FOR INTERACTIVE DISPLAY) ---
-import json
-from datetime import datetime
-
-FEEDBACK_FILE = "feedback_store.json"
-
-def load_feedback():
-    try:
-        with open(FEEDBACK_FILE, "r") as f:
-            return json.load(f)
-    except:
-        return {}
+def get_backend():
+    # One backend per server: Gemini client, SQLite stores and PDF workers are shared by all sessions
+    return ReportBackend(api_key=MY_API_KEY)
 
-def save_feedback(data):
-    with open(FEEDBACK_FILE, "w") as f:
-        json.dump(data, f, indent=4)
+def get_corrections_store():
+    return get_backend().corrections
 
 def store_feedback(ticker, item, year, value, comment):
-    data = load_feedback()
-    if ticker not in data:
-        data[ticker] = {}
-    key = f"{item}_{year}"
-    data[ticker][key] = {
-        "correct_value": value,
-        "comment": comment,
-        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M")
-    }
-    save_feedback(data)
-
-def get_feedback_prompt_injection(ticker):
-    data = load_feedback()
-    if ticker not in data:
-        return ""
-    lines = ["\n### USER CORRECTIONS (MANDATORY TO APPLY):"]
-    for k, v in data[ticker].items():
-        lines.append(
-            f"- {k} must equal {v['correct_value']} "
-            f"(Corrected by analyst on {v['timestamp']}. Reason: {v['comment']})"
-        )
-    return "\n".join(lines)
-
-def parse_markdown_table(markdown_content):
-
-    """Parses the Financial Summary markdown table into a Pandas DataFrame."""
-
-    try:
-
-        start_marker = "### Financial Summary"
-
-        start_pos = markdown_content.find(start_marker)
-
-        if start_pos == -1: return None, None, None
-
-
-        
-
-
-        # Split content into Pre-Table and Table Section
-
-        pre_table_text = markdown_content[:start_pos + len(start_marker)]
-
-        remaining_text = markdown_content[start_pos + len(start_marker):]
-
-
-
-        lines = remaining_text.split('\n')
-
-        table_lines = []
-
-        post_table_lines = []
-
-        capture_table = False
-
-        table_finished = False
-
-
-
-        for line in lines:
-
-            stripped = line.strip()
-
-            # Detect Table Start
-
-            if "| Item" in stripped or "| **Item" in stripped:
-
-                capture_table = True
-
-            
-
-            if capture_table and not table_finished:
-
-                if stripped.startswith("|"):
-
-                    table_lines.append(stripped)
-
-                elif stripped == "" and len(table_lines) > 0:
-
-                    table_finished = True
-
-                elif not stripped.startswith("|") and len(table_lines) > 0:
-
-                    table_finished = True
-
-                    post_table_lines.append(line)
-
-            elif table_finished:
-
-                post_table_lines.append(line)
-
-            else:
-
-                pre_table_text += "\n" + line
-
-
-
-        if not table_lines: return None, None, None
-
-
-
-        # Process Table Data
-
-        table_lines = [line for line in table_lines if "---" not in line]
-
-        headers = [h.strip().replace('*', '') for h in table_lines[0].strip('|').split('|')]
-
-        
-
-        data = []
-
-        for line in table_lines[1:]:
-
-            row_vals = [c.strip().replace('**', '') for c in line.strip('|').split('|')]
-
-            if len(row_vals) == len(headers):
-
-                data.append(row_vals)
-
-        
-
-        df = pd.DataFrame(data, columns=headers)
-
-        post_table_text = "\n".join(post_table_lines)
-
-        return df, pre_table_text, post_table_text
-
-    except Exception as e:
-
-        return None, None, None
-def update_markdown_table_value(markdown_text, item, year, new_value):
-    lines = markdown_text.split("\n")
-
-    # Find header row
-    header_index = None
-    for i, line in enumerate(lines):
-        if "| Item" in line:
-            header_index = i
-            break
+    get_backend().store_feedback(ticker, item, year, value, comment)
 
-    if header_index is None:
-        return markdown_text
+def get_feedback_corrections(ticker):
+    return get_backend().get_feedback_corrections(ticker)
 
-    # Parse headers properly
-    raw_headers = lines[header_index].strip().split("|")
-    headers = [h.strip().replace("*", "") for h in raw_headers if h.strip()]
+def store_filing(file_name, data, ticker=None):
+    return get_backend().store_filing(file_name, data, ticker=ticker)
 
-    if year not in headers:
-        return markdown_text
+def get_company_logo_src(ticker):
+    """Cached company logo as a base64 data URI ("" if there is none)."""
+    return get_backend().get_company_logo_src(ticker)
 
-    # Determine real column index in raw split (account for empty first cell)
-    year_position = headers.index(year)
-
-    # Now locate the correct row
-    for i, line in enumerate(lines):
-        if f"**{item}**" in line:
-            raw_cells = line.split("|")
-
-            # Remove first and last empty cell
-            cells = raw_cells[1:-1]
+def get_company_report(ticker, force_refresh=False, on_retry=None, on_text=None):
+    """Cached or freshly generated report (see ReportBackend.get_company_report)."""
+    return get_backend().get_company_report(
+        ticker, force_refresh=force_refresh, on_retry=on_retry or st.warning, on_text=on_text
+    )
 
-            if year_position < len(cells):
-                cells[year_position] = f" {new_value} "
+# Reports run as background jobs, so a rerun or a closed tab does not abandon the Gemini call
+def submit_report(ticker, force_refresh=False, stream=False):
+    return get_backend().submit_report(ticker, force_refresh=force_refresh, stream=stream)
 
-                # Reconstruct correctly with pipes
-                new_line = "| " + " | ".join(cells) + " |"
-                lines[i] = new_line
+def submit_section_refresh(ticker, report_text, section):
+    return get_backend().submit_section_refresh(ticker, report_text, section)
 
-            break
+def get_report_job(job_id):
+    return get_backend().get_report_job(job_id)
 
-    return "\n".join(lines)
+def latest_report_job(ticker):
+    return get_backend().latest_report_job(ticker)
 
-    # --- EXCEL GENERATION FUNCTION (NEW) ---
+# --- EXCEL / PDF GENERATION ---
 def create_excel(markdown_content, ticker):
     """Extracts Financial Summary table and converts to formatted Excel."""
     try:
-        # 1. LOCATE AND PARSE THE TABLE
-        start_marker = "### Financial Summary"
-        start_pos = markdown_content.find(start_marker)
-        
-        if start_pos == -1: return None
-            
-        # Extract text from that point onwards
-        section_text = markdown_content[start_pos:]
-        lines = section_text.split('\n')
-        table_lines = []
-        capture = False
-        
-        for line in lines:
-            stripped = line.strip()
-            # Start capturing at the header row (contains | Item or | **Item)
-            if "| Item" in stripped or "| **Item" in stripped:
-                capture = True
-            
-            if capture:
-                if stripped.startswith("|"):
-                    table_lines.append(stripped)
-                # Stop if we hit a blank line after starting capture (end of table)
-                elif stripped == "" and len(table_lines) > 0:
-                    break
-        
-        if not table_lines: return None
-
-        # 2. PROCESS MARKDOWN INTO DATAFRAME
-        # Remove the separator line (---|---|---)
-        table_lines = [line for line in table_lines if "---" not in line]
-        
-        # Extract headers (clean * and spaces)
-        headers = [h.strip().replace('*', '') for h in table_lines[0].strip('|').split('|')]
-        
-        data = []
-        for line in table_lines[1:]:
-            # Split by pipe, clean bolding (**), strip whitespace
-            row_vals = [c.strip().replace('**', '') for c in line.strip('|').split('|')]
-            if len(row_vals) == len(headers):
-                data.append(row_vals)
-        
-        df = pd.DataFrame(data, columns=headers)
-        
-        # 3. CLEAN DATA (String -> Number)
-        def clean_financial_num(val):
-            if not isinstance(val, str): return val
-            val = val.strip()
-            if val == "-": return 0
-            
-            # Detect formats
-            is_percent = "%" in val
-            
-            # Remove artifacts
-            clean = val.replace(',', '').replace('%', '').replace('x', '').replace('X', '')
-            
-            # Handle Parentheses for negatives: (1,200) -> -1200
-            if '(' in clean and ')' in clean:
-                clean = clean.replace('(', '').replace(')', '')
-                sign = -1
-            else:
-                sign = 1
-                
-            try:
-                num = float(clean) * sign
-                if is_percent: return num / 100
-                return num
-            except ValueError:
-                return val # Return original text if not a number
-
-        # Apply cleaning to all columns except the first (Item names)
-        for col in df.columns[1:]:
-            df[col] = df[col].apply(clean_financial_num)
-
-        # 4. WRITE TO EXCEL WITH FORMATTING
-        output = io.BytesIO()
-        # Use xlsxwriter engine for rich formatting
-        with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-            df.to_excel(writer, sheet_name='Financial Summary', index=False)
-            workbook = writer.book
-            worksheet = writer.sheets['Financial Summary']
-            
-            # Define Formats
-            header_fmt = workbook.add_format({'bold': True, 'bottom': 2, 'bg_color': '#F2F2F2', 'font_name': 'Arial', 'font_size': 10})
-            item_fmt = workbook.add_format({'bold': True, 'font_name': 'Arial', 'font_size': 10})
-            # Number formats
-            num_fmt = workbook.add_format({'num_format': '#,##0;(#,##0)', 'font_name': 'Arial', 'font_size': 10}) 
-            pct_fmt = workbook.add_format({'num_format': '0.0%', 'font_name': 'Arial', 'font_size': 10})
-            x_fmt = workbook.add_format({'num_format': '0.00"x"', 'font_name': 'Arial', 'font_size': 10})
-            text_fmt = workbook.add_format({'font_name': 'Arial', 'font_size': 10})
-
-            # Apply Column Widths
-            worksheet.set_column(0, 0, 30) # Item Column
-            worksheet.set_column(1, len(df.columns)-1, 15) # Data Columns
-
-            # Apply Header Format
-            for col_num, value in enumerate(df.columns.values):
-                worksheet.write(0, col_num, value, header_fmt)
-
-            # Row-by-Row Conditional Formatting
-            for i, row in df.iterrows():
-                row_idx = i + 1
-                item_name = str(row[df.columns[0]]).lower()
-                
-                # Write Item Name (First Column)
-                worksheet.write(row_idx, 0, row[df.columns[0]], item_fmt)
-                
-                # Write Data Columns
-                for j, col in enumerate(df.columns[1:]):
-                    col_idx = j + 1
-                    val = row[col]
-                    
-                    if isinstance(val, (int, float)):
-                        if "margin" in item_name or "%" in item_name:
-                            worksheet.write(row_idx, col_idx, val, pct_fmt)
-                        elif "leverage" in item_name or "coverage" in item_name:
-                            worksheet.write(row_idx, col_idx, val, x_fmt)
-                        else:
-                            worksheet.write(row_idx, col_idx, val, num_fmt)
-                    else:
-                        worksheet.write(row_idx, col_idx, val, text_fmt)
-                        
-        return output.getvalue()
+        return get_backend().create_excel(markdown_content, ticker)
     except Exception as e:
         st.error(f"Excel Conversion Error: {e}")
         return None
 
-
-
-# --- HELPER: GET COMPANY DOMAIN FOR LOGO ---
-def get_company_domain(ticker):
-    """Fetches the official website to ensure the logo is accurate."""
-    try:
-        dat = yf.Ticker(ticker)
-        url = dat.info.get('website')
-        if url:
-            # Clean URL to get just the domain (e.g., tesla.com)
-            domain = url.replace("https://", "").replace("http://", "").replace("www.", "").split('/')[0]
-            return domain
-    except:
-        pass
-    return f"{ticker.lower()}.com"
-
-
-
-
-# --- PDF GENERATION FUNCTION ---
-def create_pdf(markdown_content, ticker):
-
-    import re
-
-        # 1. Base64 Encode Lucror Logo for PDF (Universal Support)
+def create_portfolio_excel(reports):
+    """One Financial Summary sheet per ticker."""
     try:
-        with open("lucror_logo.png", "rb") as f:
-            lucror_base64 = base64.b64encode(f.read()).decode()
-            lucror_img_src = f"data:image/png;base64,{lucror_base64}"
-    except FileNotFoundError:
-        lucror_img_src = "" # Fallback if file missing
-
-        # 2. Get Company Logo
-
-    domain = get_company_domain(ticker)
-
-    company_logo_url = f"https://logo.clearbit.com/{domain}"  
-    
-    # --- 1. CLEAN THE HEADER ---
-    # Replace the whole "Key Management" line (and any junk stars around it) with a clean header
-    markdown_content = re.sub(
-        r'(?i)^[\s\*]*Key Management.*?Contact.*?$', 
-        '\n\n### Key Management & Contact', 
-        markdown_content, 
-        flags=re.MULTILINE
-    )
-
-    # --- 2. CLEAN & STANDARDIZE TITLES (CEO / CFO / President) ---
-    # This loop ensures that specific titles start on a new line with a clean bullet.
-    # We put "President & CEO" first so it doesn't get chopped up by the "CEO" rule.
-    target_titles = ["President & CEO", "CEO", "CFO", "President"]
-    
-    for title in target_titles:
-        # Regex: Find the title, preceded by any amount of garbage (stars, spaces, bullets), followed by a colon
-        # Replace it with: Newline + Bullet + Bold Title + Colon
-        pattern = fr'(?i)(?:\\n|^|[\s\*•-])+\**{re.escape(title)}\**\s*:'
-        replacement = f'\n* **{title}:**'
-        markdown_content = re.sub(pattern, replacement, markdown_content)
-
-    # --- 3. FIX INVESTOR RELATIONS (The Merge Logic) ---
-    
-    # Step A: Standardize the "Investor Relations" label first
-    markdown_content = re.sub(
-        r'(?i)(?:\\n|^|[\s\*•-])+\**Investor\s*Relations\**\s*:', 
-        '\n* **Investor Relations:**', 
-        markdown_content
-    )
-
-    # Step B: The Merge. 
-    # Look for "**Investor Relations:**" followed by a newline and an email address.
-    # This grabs the email from the next line and pulls it up.
-    markdown_content = re.sub(
-        r'(?i)(\*\*Investor Relations:\*\*)\s*\n+[\s\*•-]*([^\n]*@)', 
-        r'\1 \2', 
-        markdown_content
-    )
-
-    # --- 4. CLEANUP ARTIFACTS ---
-    # Removes the accidental double stars or weird space-star combos (like "* *")
-    markdown_content = markdown_content.replace("****", "**")
-    markdown_content = re.sub(r'(?m)^\s*\*\s*\*\s*$', '', markdown_content) # Deletes empty "* *" lines
-
-    # --- 5. STRENGTHS & WEAKNESSES FORMATTING ---
-    # Ensures these headers always have a blank line above them so they don't look like a wall of text.
-    markdown_content = re.sub(r'(?i)(?<!\n)\s*\*?\s*\*\*?Strengths:?\**', '\n\n**Strengths:**\n', markdown_content)
-    markdown_content = re.sub(r'(?i)(?<!\n)\s*\*?\s*\*\*?Weaknesses:?\**', '\n\n**Weaknesses:**\n', markdown_content)
-    
-    # --- CONVERSION TO HTML/PDF ---
-    html_text = markdown.markdown(markdown_content, extensions=['tables'])
-    
-    styled_html = f"""
-    <html>
-    <head>
-        <meta charset="UTF-8">
-
-        <style>
-            
-            @page {{ margin: 0.7in; }}
-
-            body {{ font-family: Helvetica, sans-serif; font-size: 11px; line-height: 1.4; color: #333; }}
-
-            .header-table {{ width: 100%; border: none; margin-bottom: 20px; }}
-
-            .header-table td {{ border: none; vertical-align: middle; }}
-
-            .logo-left {{ text-align: left; width: 50%; }}
-
-            .logo-right {{ text-align: right; width: 50%; }}
-
-            .logo-img {{ height: 45px; object-fit: contain; }}
-          
-            h1 {{ color: #2c3e50; font-size: 18px; margin-bottom: 10px; border-bottom: 2px solid #2c3e50; padding-bottom: 5px; }}
-            h2 {{ color: #2c3e50; font-size: 16px; margin-top: 25px; margin-bottom: 10px; border-bottom: 1px solid #ddd; padding-bottom: 3px; }}
-            h3 {{ color: #2c3e50; font-size: 14px; margin-top: 20px; margin-bottom: 8px; font-weight: bold; }}
-            
-            /* Clean Table Styling */
-            table {{ width: 100%; border-collapse: collapse; margin-top: 10px; margin-bottom: 20px; }}
-            th, td {{ border: 1px solid #ddd; padding: 10px; text-align: left; vertical-align: top; }}
-            th {{ background-color: #f8f9fa; font-weight: bold; color: #2c3e50; }}
-            
-            /* Specific List Styling */
-            ul {{ margin-top: 5px; margin-bottom: 15px; padding-left: 20px; }}
-            li {{ margin-bottom: 6px; }}
-            
-            /* Source Footnote Styling */
-            em {{ font-size: 10px; color: #666; display: block; margin-top: 5px; }}
-        </style>
-    </head>
-    <body>
-        {html_text}
-    </body>
-    </html>
-    """
-    
-    pdf_buffer = io.BytesIO()
-    
-    pisa_status = pisa.CreatePDF(
-
-        io.BytesIO(styled_html.encode("utf-8")), 
-
-        dest=pdf_buffer,
-
-        encoding='utf-8' 
-
-    )
-    
-    if pisa_status.err:
+        return core.create_portfolio_excel(reports)
+    except Exception as e:
+        st.error(f"Excel Conversion Error: {e}")
         return None
-    return pdf_buffer.getvalue()
-
-# --- BACKEND LOGIC ---
-def generate_company_report(ticker):
-    client = get_client()
-
-    feedback_injection = get_feedback_prompt_injection(ticker)
-    
-    # UPDATED PROMPT: Updated with specific boss requirements for Financial Summary
-    prompt = f"""
-    {feedback_injection}
-    You are a professional Financial Credit Analyst.
-    Your goal is to produce a deep-dive company credit report that matches the EXACT format below.
-
-    ### INSTRUCTIONS:
-    1. **Search Strategy (CRITICAL):**
-        
-        - **Primary Source (Boss’s Orders):**
-          Search specifically for **"{ticker} Investor Relations"** to locate the company’s official investor relations website.
-          Use this site as the anchor for all financial documents.
-        
-        - **Regulatory Filings (MANDATORY – DO NOT SKIP):**
-          Identify the company’s primary annual regulatory filing.
-          - U.S. issuers: **Form 10-K**
-          - Foreign private issuers / ADRs: **Form 20-F**
-          Use ONLY these filings for audited financial statement data.
-        
-        - **Historical Financial Data (CRUCIAL):**
-          - Search for **"{ticker} Form 10-K (FY2022)" OR "{ticker} Form 20-F (FY2022)"**
-          - Search for **"{ticker} Form 10-K (FY2023)" OR "{ticker} Form 20-F (FY2023)"**
-          - Search for **"{ticker} Form 10-K (FY2024)" OR "{ticker} Form 20-F (FY2024)"**
-          Use the company’s primary annual filing for each fiscal year.
-          Do NOT rely on documents labeled only as “Annual Report” unless they explicitly contain the audited financial statements.
-        
-        - **Fiscal Year Verification (NON-NEGOTIABLE):**
-          First, identify the company’s fiscal year end from the filing.
-          Assign data to FY2022 / FY2023 / FY2024 strictly based on the stated fiscal year,
-          NOT the calendar year or publication date.
-        
-       - **EBITDA Source Rule (NON-NEGOTIABLE):**
-          For each year (FY2022/FY2023/FY2024), you MUST extract EBITDA/Adjusted EBITDA from the SAME annual filing
-          (Form 10-K or Form 20-F) that you used for Revenue for that year.
-          Search WITHIN that filing for: "Adjusted EBITDA", "EBITDA", "Performance measures", "Non-GAAP measures".
-        
-          ONLY if the annual filing does NOT disclose an explicit EBITDA/Adjusted EBITDA figure,
-          then use an OFFICIAL company IR earnings release / investor presentation as a fallback.
-        
-          DO NOT use third-party aggregators (Macrotrends, Yahoo Finance, StockAnalysis, etc.) for EBITDA.
-          If you cannot find it in official sources, output "N/A".
-
-        
-        - **Cash Flow & Capex (STATEMENT-LEVEL DATA ONLY):**
-          Extract the following strictly from the **Consolidated Statement of Cash Flows**:
-        - **Net cash provided by operating activities (OCF):** Extract the value strictly from the detailed **"Consolidated Statement of Cash Flows"** (usually near the end of the report).
-      
-          *ANTI-HALLUCINATION RULES:*
-          1. **Anchor Check:** The correct table MUST contain rows for **"Depreciation, depletion and amortization"** and **"Foreign exchange, indexation and finance charges"**. If the table does not list these specific adjustments, IT IS THE WRONG TABLE.
-          2. **Ignore Highlights:** Do NOT use data from "Financial Highlights", "Selected Financial Data", "Key Figures", or "MD&A" sections. These are often adjusted/non-GAAP.
-          3. **Value Match:** The value you extract must be the bottom-line total labeled "Net cash provided by operating activities".
-          - **Capex**, defined as **"Acquisition of PP&E and intangible assets"** Search for this in the same table as **Net cash provided by operating activities (OCF):**
-
-        
-        - **Credit Ratings:**
-          Search for **"{ticker} Moody’s credit rating"**, **"{ticker} S&P credit rating"**, and **"{ticker} Fitch credit rating"**.
-          Use the most recent rating action press releases (2024–2025).
-        
-        - **Management & Investor Relations Contact:**
-          Search for:
-          - **"{ticker} CEO"**
-          - **"{ticker} CFO"**
-          - **"{ticker} Investor Relations contact"**
-          Prefer the official company or investor relations website.
-
-
-    2.  **Calculations & Definitions (STRICT):**
-        -   **Revenue:** Extract the exact **"Sales revenues"** or **"Net operating revenues"** line strictly from the **Consolidated Statement of Income** table.
-            * **CRITICAL:** Do NOT use numbers from the "Financial Highlights", "Key Figures", or "Gross Revenue" sections. Use the GAAP/IFRS table value only.
-        - **EBITDA (STRICT DOCUMENT CONSISTENCY RULE):**
-          First, search for **"Adjusted EBITDA" explicitly within the SAME annual regulatory filing
-          (Form 10-K or Form 20-F) used to extract Revenue for that fiscal year.**
-        
-          If an "Adjusted EBITDA" or "EBITDA" table exists in that filing (including notes,
-          segment information, or performance measures sections),
-          you MUST use that value.
-        
-          ONLY if the annual filing does NOT contain an explicit Adjusted EBITDA figure,
-          then search for a separate "Adjusted EBITDA reconciliation" in earnings releases
-          or investor presentations.
-        
-          DO NOT calculate EBITDA manually if an explicit value exists in the annual filing.
-
-        -   **EBITDA Margin:** Adjusted EBITDA / Revenue.
-
-        
-        -   **Net cash provided by operating activities (OCF):** Extract the exact **"Net cash provided by operating activities"** (or "Net cash from operations") line directly from the **Consolidated Statement of Cash Flows**. 
-            *DO NOT adjust for interest. Use the raw figure from the statement.*
-
-        -   **(-) Acquisition of PP&E and intangible assets:** Extract the cash used for **"Purchase of property, plant and equipment"** (Capex) AND **"Purchase of intangible assets"** from the Investing section of the Cash Flow Statement.
-            *Sum these values if reported separately.*
-
-        -   **FOCF (Free Operating Cash Flow):** FOCF = (Net cash provided by operating activities) + (Acquisition of PP&E and intangible assets).
-            *Note: Since Acquisition of PP&E is a negative outflow, you simply sum the two numbers (e.g., 2000 + (-1500) = 500).*
-        -   **Net Debt (STRICT – Petrobras / screenshot definition):**
-            You MUST compute Net Debt using this exact Petrobras definition from the FY2024 20-F:
-            1) Gross Debt = Finance debt + Lease liabilities (IFRS 16)
-            2) Net Debt = Gross Debt - Adjusted Cash and Cash Equivalents
-        
-            CRITICAL:
-            - Do NOT use other “net debt” KPIs found in notes (e.g., Note 25) if they do NOT reconcile to Gross Debt - Adjusted Cash.
-            - You MUST show the reconciliation math in the Appendix:
-            Finance debt (value) + Lease liabilities (value) = Gross Debt (value)
-            Gross Debt (value) - Adjusted Cash & Cash Equivalents (value) = Net Debt (value)
-        
-            For FY2022 and FY2023: use the SAME definition and compute from the filing using:
-            Finance debt + Lease liabilities - Adjusted Cash & Cash Equivalents (if provided).
-            If Adjusted Cash is not provided for a year, then use the filing’s explicitly reported Net Debt ONLY IF it is part of the same Gross Debt - Adjusted Cash reconciliation section.
-
-
-
-        -   **Net Leverage:** Net Debt / Adjusted EBITDA.
-        -   **Coverage:** FOCF / Net Debt.
-    
-    
-    2.  **Calculations (MANDATORY):**
-        -   $EBITDA Margin = EBITDA / Revenue$
-        -   $FOCF = Net Cash from Ops + (Acquisition of PP&E and Intangibles)$
-        -   $Net Debt = (Finance debt + Lease liabilities) - (Adjusted Cash & Cash Equivalents)$
-        -   $Net Leverage = Net Debt / EBITDA$
-        -   $Coverage = FOCF / Net Debt$
-        **IMPORTANT:** EBITDA must be taken from an explicitly reported "EBITDA" or "Adjusted EBITDA" figure in an official filing.
-        Do NOT compute EBITDA as Operating Income + D&A unless you explicitly label it as an estimate and only if no reported EBITDA exists.
-
-        
-    
-    3.  **Format:** Output strictly in Markdown. Follow the One-Shot Example structure exactly.
-        
-    4.  **Audit Trail (CRITICAL):** -   AFTER the main report, output a section header called `### Appendix`.
-        -   Inside the Appendix, you MUST generate a structured list titled **"Data Source Dictionary"**.
-        -   **CRITICAL:** You must generate a bullet point for **EVERY SINGLE ROW** in the table, including **Calculated Metrics**, **Margins**, **Ratios**, and **Growth Rates**. Do not skip *any* row.
-        -   Format:
-            * **[Exact Row Name]**: Source: [Document Name/Page] OR Logic: [Formula used]. Raw Value: [Value].
-            * **[Item Name]**: Source Document: [Name], Page: [Page #], Raw Value: [Value], Logic: [Explanation].
 
-        -   Example:
-
-            * **Revenue**: Source Document: Ford 2024 10-K, Page: 45, Raw Value: 158,000, Logic: Sum of Automotive and Credit revenue.
-
-            * **FFO**: Source Document: Q3 Earnings Release, Page: 8, Raw Value: Calculated, Logic: Net Income (200) + D&A (150).
-    
-    5.  **Rationale (Internal):** AFTER the main report, output a section header called `Appendix`. INCLUDE IT IN THE NEXT PAGE. In this section, detail your thought process, reasoning for credit drivers, and how you located each data point (with URLs). This is for internal use and should NOT appear in the main report.
-        -   In this section, you must provide a **"Financial Data Audit"**.
-        -   For every year (FY23, FY24, LTM) in the Financial Summary, you must state:
-            * **Exact Document Name:** (e.g., "Ford 2024 10-K" - https://investor.ford.com/...)
-            * **Page Number/Table Name:** (e.g., "Consolidated Statement of Operations, Page 45")
-            * **Raw Figure Used:** (e.g., "I saw Revenue = 158,000 in the PDF, so I used 158,000")
-            * **Reasoning:** Explain why you assigned it to that specific column (e.g., "The report says 'Fiscal Year Ended Dec 31, 2024', so this goes in the FY2024 column").
-        -   **This is to prevent year-shifting errors.**
-
-    6.  **Transparency & Footnotes (NEW REQUIREMENT):**
-        -   **After EVERY section** (Ratings, Description, Financial Summary, Key Credit Drivers), you MUST include a small footnote  starting with "*Source:*" briefly describing where that specific data was found. (Leave one line, for tables of Ratings and Financial Summary, do NOT include "Source" in the table)
-        -   **Financial Summary Specificity:** The footnote directly below the Financial Summary table (LEAVE ONE LINE JUST AFTER THE TABLE, DO NOT INCLUDE "Source" (the footnote) IN THE TABLE,) MUST clarify if the figures are from **Audited Financial Statements**, an **Earnings Release**, or **Management Accounts**. This is crucial for replication.
-        -   **Ratings Specificity:** The footnote below the Ratings table MUST specify the exact document and date where the ratings were sourced. LEAVE ONE LINE AFTER THE TABLE, BEFORE THE SOURCE DESCRIPTION
-    7. **Data Freshness:** Use ONLY the most recent data available (2024/2025). Do NOT use outdated financials or ratings.
-    8. **Clean Format:** In the section of "Key Credit Drivers", use bullet points for clarity.
-    9. **No Citation Tags:** DO NOT include any text like "" or "[previous search]" or "cite" or "(previous search)" in your output.
-    10. USE BULLET POINTS IN THE "KEY MANAGEMENTS AND CONTACT" SECTION
-    
-
-    ### ONE-SHOT EXAMPLE (STRICTLY FOLLOW THIS TABLE STRUCTURE):
-    Input: JLR
-    Output:
-    # **Jaguar Land Rover Automotive plc**
-
-    | Agency | Rating |
-    | :--- | :--- |
-    | **Moody's:** | Ba1 (stable) |
-    | **S&P:** | BBB- (positive) |
-    | **Fitch:** | BB- (stable) |
-
-    *Source: Latest Rating Action Commentaries from Moody's and S&P (Oct 2025).*
-
-    ### Description
-    Jaguar Land Rover (JLR) is a luxury automaker...
-
-    *Source: Company Profile, FY2024 Annual Report.*
-
-    **Key Management & Contact:**
-    * **CEO:** Adrian Mardell
-    * **CFO:** Richard Molyneux
-    * **Investor Relations:** Email : investor@jaguarlandrover.com
-
-
-
-    ### Financial Summary
-    *In GBP mn*
-
-    | Item | FY2022 | FY2023 | FY2024 |
-    | :--- | :--- | :--- | :--- |
-    | **Revenue** | 18,320 | 22,809 | 28,995 |
-    | **EBITDA** | 2,050 | 2,500 | 3,400 |
-    | **EBITDA Margin** | 11.2% | 11.0% | 11.7% |
-    | **Net cash provided by operating activities (OCF)** | 1,100 | 1,500 | 2,000 |
-    | **(-) Acquisition of PP&E and intangible assets** | (1,000) | (1,200) | (1,300) |
-    | **FOCF** | 100 | 300 | 700 |
-    | **Net Debt** | 4,500 | 4,200 | 3,800 |
-    | **Net Leverage (Net Debt/EBITDA)** | 2.2x | 1.68x | 1.12x |
-    | **Coverage (FOCF/Net Debt)** | 0.02x | 0.07x | 0.18x |
-
-    *Source: Figures for FY23/24 derived from Audited Financial Statements; LTM figures derived from Q3 2025 Earnings Release (Management Accounts).*
+def create_pdf(markdown_content, ticker):
+    # Rendered in a worker process; raises PdfRenderError on timeout or worker failure so the result is not cached
+    return get_backend().create_pdf(markdown_content, ticker)
 
-    ### Key Credit Drivers
-    **Premium brand positioning:** ...
-    *Source: Market analysis and JLR November 2025 Debt Investor Presentation.*
+# --- EXPORTS (BUILT ON DEMAND, MEMOIZED BY CONTENT) ---
+def export_content_hash(markdown_content, ticker):
+    """Identifies an export; any correction to the text changes the hash."""
+    return hashlib.sha256(f"{ticker}\x1f{markdown_content}".encode("utf-8")).hexdigest()
 
-    ### Appendix
-    **Data Source Dictionary**
-    * **Revenue**: Source Document: FY2024 Annual Report, Page 88, Raw Value: 28,995, Logic: Extracted directly from Consolidated Income Statement.
-    * **EBITDA**: Source Document: Investor Presentation Slide 12, Raw Value: 3,400, Logic: Reported Adjusted EBITDA.
-    * **FFO**: Source Document: 10-K Cash Flow Stmt, Raw Value: Calculated, Logic: Net Income (1,200) + D&A (1,000).
+# The leading underscore keeps Streamlit from re-hashing the full report text,
+# the explicit content hash is the cache key.
+@st.cache_data(show_spinner=False, max_entries=32)
+def build_pdf_export(content_hash, _markdown_content, ticker):
+    return create_pdf(_markdown_content, ticker)
 
-    ### YOUR TASK:
-    Now, generate the report for the following ticker using the latest available live data.
-    Input: {ticker}
-    Output:
-    """
+@st.cache_data(show_spinner=False, max_entries=32)
+def build_excel_export(content_hash, _markdown_content, ticker):
+    return create_excel(_markdown_content, ticker)
 
-    # --- RETRY LOGIC (Maintained) ---
-    max_retries = 5
-    for attempt in range(max_retries):
-        try:
-            response = client.models.generate_content(
-                model='gemini-2.5-pro', # Updated to latest stable available
-                contents=prompt,
-                config=types.GenerateContentConfig(
-                    tools=[types.Tool(google_search=types.GoogleSearch())]
-                )
-            )
-            return response
-            
-        except Exception as e:
-            error_msg = str(e)
-            if "503" in error_msg or "overloaded" in error_msg:
-                if attempt < max_retries - 1:
-                    wait_time = 2 ** attempt
-                    st.warning(f"⚠️ Servers busy. Retrying in {wait_time}s... (Attempt {attempt+1}/{max_retries})")
-                    time.sleep(wait_time)
-                    continue
-            return f"Error: {e}"
-        
 # --- FRONTEND USER INTERFACE ---
 st.title("📊 Financial Analyst")
 st.markdown("Enter a ticker (e.g., `TSLA`, `F`, `HOG`) to generate a credit report.")
 
+show_debug_panel = st.sidebar.checkbox("🛠 Show debug panel", value=False)
+
 # --- SESSION STATE INITIALIZATION ---
 if "report_text" not in st.session_state:
     st.session_state["report_text"] = None
@@ -759,46 +117,243 @@ if "grounding_metadata" not in st.session_state:
     st.session_state["grounding_metadata"] = None
 if "feedback_mode" not in st.session_state:
     st.session_state["feedback_mode"] = False
+if "report_cached_at" not in st.session_state:
+    st.session_state["report_cached_at"] = None
+if "batch_results" not in st.session_state:
+    st.session_state["batch_results"] = {}
+if "exports_requested" not in st.session_state:
+    st.session_state["exports_requested"] = set()
+if "report_model" not in st.session_state:
+    st.session_state["report_model"] = None
+if "report_corrections" not in st.session_state:
+    st.session_state["report_corrections"] = []
+if "active_job" not in st.session_state:
+    # The job id is also kept in the URL, so a browser refresh picks the job up again
+    st.session_state["active_job"] = st.query_params.get("job")
+
+
+
+def load_report_into_session(ticker, report):
+    """Makes `report` (from get_company_report) the report shown below."""
+    st.session_state["report_text"] = report["report_text"]
+    st.session_state["report_ticker"] = ticker
+    st.session_state["grounding_metadata"] = report["grounding_metadata"]
+    st.session_state["report_cached_at"] = report["created_at"] if report["from_cache"] else None
+    st.session_state["report_model"] = report["model"]
+    st.session_state["report_corrections"] = report.get("corrections_applied", [])
+    st.session_state["exports_requested"] = set()
+
+
+def finish_active_job():
+    st.session_state["active_job"] = None
+    st.query_params.pop("job", None)
+
+
+@st.fragment(run_every=1.0)
+def show_report_job(job_id):
+    """Polls a background report job; loads the report (full rerun) once it has finished."""
+    job = get_report_job(job_id)
+    if job is None:
+        finish_active_job()
+        st.rerun()
+    section = job.params.get("section")
+    if job.active:
+        elapsed = int(datetime.now().timestamp() - (job.started_at or job.created_at))
+        st.info(f"🔎 Researching {job.ticker} ({section or 'Financials + Credit Drivers'})... "
+                f"{'queued' if job.started_at is None else f'{elapsed}s'}"
+                + (f" — {job.message}" if job.message else ""))
+        # Live preview, section by section, while the report is being written
+        partial_text = get_backend().jobs.partial_text(job_id)
+        if partial_text:
+            for section_text in split_sections(partial_text).values():
+                st.markdown(section_text)
+        return
+
+    finish_active_job()
+    if job.status == DONE and section:
+        # Only the text changes; ticker, sources and cache info stay those of the full report
+        st.session_state["report_text"] = job.result["report_text"]
+        st.session_state["report_corrections"] = job.result.get("corrections_applied", [])
+        st.session_state["exports_requested"] = set()
+    elif job.status == DONE:
+        load_report_into_session(job.ticker, job.result)
+    else:
+        st.session_state["job_error"] = job.error
+    st.rerun()
 
 
+# --- LOCAL FILINGS (statement lines are passed to the model instead of searching for them) ---
+with st.sidebar.expander("📂 Local filings (10-K / 20-F)"):
+    uploaded_filing = st.file_uploader("Filing (HTML, XBRL or text)", type=["htm", "html", "xml", "txt"])
+    filing_ticker = st.text_input("Ticker (optional for EDGAR names like f-20241231.htm)").upper()
+    if uploaded_filing is not None and st.button("📥 Index filing"):
+        try:
+            indexed_ticker, line_count = store_filing(uploaded_filing.name, uploaded_filing.getvalue(),
+                                                      ticker=filing_ticker or None)
+        except ValueError as e:
+            st.error(str(e))
+        else:
+            if line_count:
+                st.success(f"{line_count} statement lines indexed for {indexed_ticker}.")
+            else:
+                st.warning("No consolidated statement lines found in this file.")
+
+# --- FINISHED REPORTS (kept by the job store across sessions, newest per ticker) ---
+finished_tickers = list(dict.fromkeys(job.ticker for job in get_backend().jobs.recent(limit=50, status=DONE)))
+if finished_tickers:
+    reopen_ticker = st.sidebar.selectbox("🗂 Finished reports", options=finished_tickers)
+    if st.sidebar.button("📖 Open latest"):
+        finished_job = latest_report_job(reopen_ticker)
+        if finished_job is not None:
+            load_report_into_session(finished_job.ticker, finished_job.result)
+
+
+mode = st.radio("Mode", ["Single Ticker", "Batch / Portfolio"], horizontal=True)
+submitted = False
+ticker_input = ""
+
+if mode == "Single Ticker":
+    with st.form("ticker_form"):
+        ticker_input = st.text_input("Company Ticker:", placeholder="e.g. F").upper()
+        force_refresh = st.checkbox("🔄 Force refresh (ignore cached report)", value=False)
+        stream_output = st.checkbox("⚡ Show the report while it is being written", value=True)
+        submitted = st.form_submit_button("Generate Report")
+
+    if submitted and ticker_input:
+        # Served from the report cache unless missing, expired or force-refreshed
+        job_id = submit_report(ticker_input, force_refresh=force_refresh, stream=stream_output)
+        st.session_state["active_job"] = job_id
+        st.query_params["job"] = job_id
+
+else:
+    # --- BATCH / PORTFOLIO MODE ---
+    with st.form("batch_form"):
+        tickers_text = st.text_area("Tickers (comma, space or newline separated):", placeholder="F, TSLA, HOG")
+        tickers_csv = st.file_uploader("...or upload a CSV (\"ticker\" column or first column)", type=["csv"])
+        max_workers = st.slider("Max concurrent requests", min_value=1, max_value=16, value=DEFAULT_MAX_WORKERS)
+        batch_force_refresh = st.checkbox("🔄 Force refresh (ignore cached reports)", value=False)
+        batch_submitted = st.form_submit_button("Generate Batch")
+
+    if batch_submitted:
+        tickers = parse_ticker_list(tickers_text)
+        if tickers_csv is not None:
+            tickers += [t for t in tickers_from_csv(tickers_csv.getvalue()) if t not in tickers]
+
+        if not tickers:
+            st.warning("Please enter or upload at least one ticker.")
+        else:
+            # Workers call the (thread-safe) backend directly; st.cache_resource is only touched here
+            backend = get_backend()
+
+            progress_bar = st.progress(0.0, text=f"0/{len(tickers)} reports finished")
+            status_box = st.empty()
+            results = {}
+
+            def show_statuses(statuses):
+                status_box.dataframe(
+                    pd.DataFrame({"Ticker": list(statuses), "Status": list(statuses.values())}),
+                    hide_index=True,
+                    use_container_width=True
+                )
+
+            for outcome in run_batch(
+                tickers,
+                lambda t, set_status: backend.get_company_report(t, force_refresh=batch_force_refresh, on_retry=set_status),
+                max_workers=max_workers,
+                on_status=show_statuses
+            ):
+                results[outcome.ticker] = outcome
+                progress_bar.progress(
+                    len(results) / len(tickers),
+                    text=f"{len(results)}/{len(tickers)} reports finished (latest: {outcome.ticker})"
+                )
+                if not outcome.ok:
+                    st.error(f"{outcome.ticker}: {outcome.error}")
+
+            st.session_state["batch_results"] = {t: results[t] for t in tickers if t in results}
+            st.session_state["portfolio_excel"] = None
+
+    if st.session_state["batch_results"]:
+        batch_results = st.session_state["batch_results"]
+        st.markdown("### 📚 Batch Results")
+        st.dataframe(
+            pd.DataFrame([
+                {
+                    "Ticker": t,
+                    "Status": "✅ Done" if r.ok else "❌ Failed",
+                    "Source": ("Cache" if r.result["from_cache"] else "Generated") if r.ok else "",
+                    "Seconds": round(r.seconds, 1),
+                    "Error": r.error or "",
+                }
+                for t, r in batch_results.items()
+            ]),
+            hide_index=True,
+            use_container_width=True
+        )
 
-with st.form("ticker_form"):
-    ticker_input = st.text_input("Company Ticker:", placeholder="e.g. F").upper()
-    submitted = st.form_submit_button("Generate Report")
+        ready = [t for t, r in batch_results.items() if r.ok]
+        if ready:
+            open_col1, open_col2 = st.columns([3, 1])
+            with open_col1:
+                open_ticker = st.selectbox("Open report", options=ready)
+            with open_col2:
+                st.write("")
+                if st.button("📖 Open"):
+                    load_report_into_session(open_ticker, batch_results[open_ticker].result)
+
+            if st.button("📊 Prepare Portfolio Excel"):
+                with st.spinner(f"Building workbook for {len(ready)} tickers..."):
+                    st.session_state["portfolio_excel"] = create_portfolio_excel(
+                        {t: batch_results[t].result["report_text"] for t in ready}
+                    )
+            if st.session_state.get("portfolio_excel"):
+                st.download_button(
+                    label="📊 Download Portfolio Excel",
+                    data=st.session_state["portfolio_excel"],
+                    file_name="Portfolio_Financials.xlsx",
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                )
 
-if submitted and ticker_input:
-    with st.spinner(f"🔎 Researching {ticker_input} (Financials + Credit Drivers)..."):
-        # Get the full response object
-        response_obj = generate_company_report(ticker_input)
-        
-        if isinstance(response_obj, str) and "Error" in response_obj:
-            st.error(response_obj)
-        else:
-            # SAVE TO SESSION STATE (Crucial for interactivity)
-            st.session_state["report_text"] = response_obj.text
-            st.session_state["report_ticker"] = ticker_input
-            try:
-                st.session_state["grounding_metadata"] = response_obj.candidates[0].grounding_metadata
-            except:
-                st.session_state["grounding_metadata"] = None
+# Report and section-refresh jobs (section refreshes can start from a report opened in either mode)
+if st.session_state.get("job_error"):
+    st.error(st.session_state.pop("job_error"))
+if st.session_state["active_job"]:
+    show_report_job(st.session_state["active_job"])
 
 # --- DISPLAY LOGIC (OUTSIDE THE FORM, HANDLES CLICKS) ---
 if st.session_state["report_text"]:
     full_text = st.session_state["report_text"]
     current_ticker = st.session_state["report_ticker"]
     
-    # Split Main Report and Appendix
-    pattern = r"(?i)\n#{1,3}\s+\**Appendix\**.*" 
-    parts = re.split(pattern, full_text, maxsplit=1)
-    
-    if len(parts) > 1:
-        main_report = parts[0].strip()
-        rationale_text = parts[1].strip()
-    else:
-        main_report = full_text
-        rationale_text = ""
+    # Parsed once per report text and reused on every rerun (row clicks, edits, downloads)
+    report_doc = parse_report(full_text)
+    main_report = report_doc.main_report
+    rationale_text = report_doc.rationale_text
 
     st.success("Analysis Complete")
+    report_model = st.session_state["report_model"]
+    if report_model and FALLBACK_MODEL in report_model:
+        st.info(f"ℹ️ {MODEL_NAME} was overloaded, so this report was written by the faster {report_model}. "
+                "It was not cached, so the next request tries the full model again.")
+    if st.session_state["report_cached_at"]:
+        cached_at = datetime.fromtimestamp(st.session_state["report_cached_at"]).strftime("%Y-%m-%d %H:%M")
+        st.caption(f"⚡ Served from cache (generated {cached_at}). Tick \"Force refresh\" to regenerate.")
+    if st.session_state["report_corrections"]:
+        overridden = ", ".join(
+            f"{c['item']} {c['year']} ({c['previous']} → {c['value']})" if c["previous"] != c["value"]
+            else f"{c['item']} {c['year']}"
+            for c in st.session_state["report_corrections"]
+        )
+        st.caption(f"✏️ Stored analyst corrections applied: {overridden}")
+
+    # Targeted refresh: one focused prompt for a stale section instead of the whole report
+    with st.expander("🔁 Regenerate one section"):
+        refresh_section = st.selectbox("Section", options=REPORT_SECTIONS)
+        if st.button("🔁 Regenerate section", disabled=bool(st.session_state["active_job"])):
+            job_id = submit_section_refresh(current_ticker, full_text, refresh_section)
+            st.session_state["active_job"] = job_id
+            st.query_params["job"] = job_id
+            st.rerun()
     
     # 1. Logos
     col1, col2 = st.columns([1, 1])
@@ -808,13 +363,14 @@ if st.session_state["report_text"]:
         except:
             st.write("**Lucror Analytics**")
     with col2:
-        domain = get_company_domain(current_ticker)
-        st.markdown(f'<div style="text-align: right;"><img src="https://logo.clearbit.com/{domain}" width="80"></div>', unsafe_allow_html=True)
+        company_img_src = get_company_logo_src(current_ticker)
+        if company_img_src:
+            st.markdown(f'<div style="text-align: right;"><img src="{company_img_src}" width="80"></div>', unsafe_allow_html=True)
 
     st.markdown("---")
 
     # 2. PARSE AND DISPLAY FINANCIAL SUMMARY WITH TRACING
-    df_financials, pre_table_text, post_table_text = parse_markdown_table(main_report)
+    df_financials, pre_table_text, post_table_text = parse_markdown_table(full_text)
 
     if df_financials is not None:
         # Display everything before the table
@@ -838,44 +394,28 @@ if st.session_state["report_text"]:
 # CHECK SELECTION & SHOW AUDIT TRAIL
         if len(selection.selection.rows) > 0:
             selected_row_idx = selection.selection.rows[0]
-            selected_item = df_financials.iloc[selected_row_idx][0] # First column is "Item"
+            selected_item = df_financials.iloc[selected_row_idx, 0] # First column is "Item"
             
-            # 1. Clean the clicked item name (e.g. "**Revenue**" -> "revenue")
-            # We also split by "(" to handle "EBITDA (adj.)" -> just search for "ebitda"
-            clean_search_term = selected_item.replace("**", "").split("(")[0].strip().lower()
+            # 1. Look up the clicked item in the report's audit index (built once per report)
+            # e.g. "**Revenue**" -> "revenue", "EBITDA (adj.)" -> "ebitda", "(-) Capex" -> "capex"
+            audit_trail = report_doc.audit_index.lookup(selected_item)
+            clean_search_term = audit_trail.term
             
             st.markdown(f"### 🔍 Audit Trail for: **{selected_item}**")
-            
-            # 2. Scan the AI's thought process (Appendix)
-            appendix_lines = rationale_text.split('\n')
-            found_entries = []
-            
-            for line in appendix_lines:
-                line_lower = line.lower()
-                
-                # ROBUST MATCHING LOGIC:
-                # 1. Does the line contain the item name? (e.g. "revenue")
-                # 2. Does the line contain "source" or "document"? (To ensure it's a citation)
-                # 3. Does it look like a list item? (Starts with * or -)
-                if clean_search_term in line_lower and ("source" in line_lower or "document" in line_lower) and (line.strip().startswith("*") or line.strip().startswith("-")):
-                    found_entries.append(line.strip())
-
-            # 3. Display Results
-            if found_entries:
-                for entry in found_entries:
+
+            # 2. Display Results
+            if audit_trail.entries:
+                for entry in audit_trail.entries:
                     # formatting: highlight the search term for visibility
                     formatted_entry = re.sub(f"(?i)({re.escape(clean_search_term)})", r"**:blue[\1]**", entry)
                     st.info(formatted_entry)
             else:
                 st.warning(f"Could not trace exact source for '{clean_search_term}'. Showing raw references found:")
                 # Fallback: Show ANY line with the word, even if it doesn't look like a source
-                fallback_found = False
-                for line in appendix_lines:
-                    if clean_search_term in line.lower():
-                        st.markdown(f"- {line.strip()}")
-                        fallback_found = True
+                for line in audit_trail.mentions:
+                    st.markdown(f"- {line}")
                 
-                if not fallback_found:
+                if not audit_trail.mentions:
                     st.error("No mention of this item found in the AI's audit trail.")
         
         # Display everything after the table
@@ -888,7 +428,7 @@ if st.session_state["report_text"]:
             row_idx = st.selectbox(
                 "Select Metric",
                 options=df_financials.index,
-                format_func=lambda x: df_financials.iloc[x][0]
+                format_func=lambda x: df_financials.iloc[x, 0]
             )
     
             year = st.selectbox(
@@ -912,7 +452,7 @@ if st.session_state["report_text"]:
     
 
             if st.button("Save Correction"):
-                item_name = df_financials.iloc[row_idx][0].replace("**", "")
+                item_name = df_financials.iloc[row_idx, 0].replace("**", "")
             
                 # Update dataframe immediately
                 df_financials.at[row_idx, year] = new_val
@@ -924,6 +464,14 @@ if st.session_state["report_text"]:
                     year,
                     new_val
                 )
+
+                # Recompute the derived rows fed by this one (e.g. Revenue -> EBITDA Margin), no model call
+                st.session_state["report_text"], recomputed = recompute_dependents(
+                    st.session_state["report_text"], [item_name]
+                )
+                item_labels = df_financials.iloc[:, 0].str.replace("**", "", regex=False)
+                for label, cells in recomputed.items():
+                    df_financials.loc[item_labels == label, df_financials.columns[1:]] = cells
             
                 # Save permanently ONLY if selected
                 if save_mode == "Permanent (future runs)":
@@ -941,41 +489,54 @@ if st.session_state["report_text"]:
     st.markdown("### 📥 Download Report")
     dl_col1, dl_col2, dl_col3, dl_col4 = st.columns([1, 1, 1, 1])
 
-    
-    
-    pdf_data = create_pdf(st.session_state["report_text"], current_ticker)
+    # Exports are only rendered once requested, then reused until the text changes
+    exports_requested = st.session_state["exports_requested"]
+    content_hash = export_content_hash(st.session_state["report_text"], current_ticker)
+
     with dl_col1:
-        if pdf_data:
-            st.download_button(
-                label="📄 Download Report (PDF)",
-                data=pdf_data,
-                file_name=f"{current_ticker}_Credit_Report.pdf",
-                mime="application/pdf"
-            )
-        else:
-            st.warning("⚠️ Could not generate PDF.")
+        if "pdf" in exports_requested:
+            with st.spinner("Rendering PDF..."):
+                try:
+                    pdf_data = build_pdf_export(content_hash, st.session_state["report_text"], current_ticker)
+                except PdfRenderError as e:
+                    st.error(f"PDF Rendering Error: {e}")
+                    exports_requested.discard("pdf")
+                    pdf_data = None
+            if pdf_data:
+                st.download_button(
+                    label="📄 Download Report (PDF)",
+                    data=pdf_data,
+                    file_name=f"{current_ticker}_Credit_Report.pdf",
+                    mime="application/pdf"
+                )
+            else:
+                st.warning("⚠️ Could not generate PDF.")
+        elif st.button("📄 Prepare PDF"):
+            exports_requested.add("pdf")
+            st.rerun()
     
-    xls_data = create_excel(st.session_state["report_text"], current_ticker)
     with dl_col2:
-        if xls_data:
-            st.download_button(
-                label="📊 Download as Excel",
-                data=xls_data,
-                file_name=f"{current_ticker}_Financials.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-            )
-        else:
-            st.info("⚠️ Financial table not found for Excel.")
+        if "xlsx" in exports_requested:
+            xls_data = build_excel_export(content_hash, st.session_state["report_text"], current_ticker)
+            if xls_data:
+                st.download_button(
+                    label="📊 Download as Excel",
+                    data=xls_data,
+                    file_name=f"{current_ticker}_Financials.xlsx",
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                )
+            else:
+                st.info("⚠️ Financial table not found for Excel.")
+        elif st.button("📊 Prepare Excel"):
+            exports_requested.add("xlsx")
+            st.rerun()
     with dl_col3:
         if st.button("📝 Give Feedback"):
             st.session_state["feedback_mode"] = True
 
     with dl_col4:
         if st.button("🗑 Clear Permanent Corrections"):
-            data = load_feedback()
-            if current_ticker in data:
-                del data[current_ticker]
-                save_feedback(data)
+            if get_corrections_store().clear_ticker(current_ticker):
                 st.success("Permanent corrections cleared.")
             else:
                 st.info("No permanent corrections stored for this ticker.")
@@ -1005,6 +566,37 @@ if st.session_state["report_text"]:
                     st.markdown(url_md)
         else:
              st.info("No detailed grounding metadata available.")
+
+    # 5. Debug Panel (per-stage timings and token counts of this ticker's recent requests)
+    if show_debug_panel:
+        with st.expander("🛠 Debug: Timings & Tokens", expanded=True):
+            inflight = get_backend().inflight.stats()
+            st.caption(f"Report generations since the server started: {inflight['executed']} run, "
+                       f"{inflight['coalesced']} saved by joining an identical request already in flight.")
+            traces = get_backend().trace_log.recent(current_ticker)
+            if not traces:
+                st.info("No traced requests for this ticker since the server started.")
+            for record in traces:
+                tokens = record["tokens"]
+                st.markdown(
+                    f"**{record['kind']}** · {record['started_at'][11:19]} UTC · {record['seconds']:.2f}s"
+                    + (" · from cache" if record.get("from_cache") else "")
+                    + (f" · {tokens.get('total_token_count', 0):,} tokens "
+                       f"(prompt {tokens.get('prompt_token_count', 0):,}, output {tokens.get('candidates_token_count', 0):,}, "
+                       f"thinking {tokens.get('thoughts_token_count', 0):,})" if tokens else "")
+                )
+                if record.get("error"):
+                    st.error(record["error"])
+                if record["stages"]:
+                    st.dataframe(
+                        pd.DataFrame([
+                            {"Stage": s["name"], "Start (s)": s["offset"], "Duration (s)": s["seconds"],
+                             "Details": ", ".join(f"{k}={v}" for k, v in s.get("attrs", {}).items())}
+                            for s in record["stages"]
+                        ]),
+                        hide_index=True,
+                        use_container_width=True
+                    )
 elif submitted and not ticker_input:
     st.warning("Please enter a ticker symbol.")
 